@@ -2,11 +2,13 @@ from flask import Flask
 from app.config import Config
 from app.models import db
 from app.routes import api
+from app.services.retention import ensure_job_partitions
 from flasgger import Swagger
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 
 def create_app():
@@ -47,9 +49,13 @@ def create_app():
     # Initialize database
     db.init_app(app)
 
-    # Create tables if they don't exist
+    # Create tables if they don't exist, and partitions for current jobs
     with app.app_context():
         db.create_all()
+        try:
+            ensure_job_partitions()
+        except Exception as e:
+            logger.error("Creating job partitions failed: %s", e)
 
     # Register API routes
     app.register_blueprint(api)
@@ -1,3 +1,4 @@
+import json
 import os
 from dotenv import load_dotenv
 
@@ -10,15 +11,254 @@ class Config:
 
     # Database configuration
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL")
+    ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or (
+        (SQLALCHEMY_DATABASE_URI or "").replace(
+            "postgresql://", "postgresql+asyncpg://", 1
+        )
+    )
+    ASYNC_DB_POOL_SIZE = int(os.getenv("ASYNC_DB_POOL_SIZE", "10"))
 
     # Redis configuration
     REDIS_URL = os.getenv("REDIS_URL")
 
+    # Seconds a job's hot status entry is kept in Redis after its last update
+    JOB_STATUS_TTL_SECONDS = int(os.getenv("JOB_STATUS_TTL_SECONDS", "86400"))
+
+    # Terminal job states are buffered in Redis and written to Postgres in
+    # batches by each worker every flush interval
+    JOB_WRITE_FLUSH_INTERVAL_MS = int(os.getenv("JOB_WRITE_FLUSH_INTERVAL_MS", "500"))
+    JOB_WRITE_BATCH_SIZE = int(os.getenv("JOB_WRITE_BATCH_SIZE", "500"))
+    # Seconds before a batch claimed by a flusher that died is written again
+    JOB_WRITE_CLAIM_TIMEOUT_SECONDS = int(
+        os.getenv("JOB_WRITE_CLAIM_TIMEOUT_SECONDS", "60")
+    )
+
+    # Job retention: the jobs table is partitioned by created_at into
+    # partitions of JOB_PARTITION_DAYS days, created JOB_PARTITIONS_AHEAD
+    # partitions ahead. Partitions that ended more than JOB_RETENTION_DAYS
+    # ago are archived to JOB_ARCHIVE_DIR and dropped by a Celery beat task
+    # every JOB_RETENTION_INTERVAL_SECONDS
+    JOB_PARTITION_DAYS = int(os.getenv("JOB_PARTITION_DAYS", "7"))
+    JOB_PARTITIONS_AHEAD = int(os.getenv("JOB_PARTITIONS_AHEAD", "2"))
+    JOB_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", "90"))
+    JOB_ARCHIVE_DIR = os.getenv("JOB_ARCHIVE_DIR", "archive/jobs")
+    JOB_RETENTION_INTERVAL_SECONDS = int(
+        os.getenv("JOB_RETENTION_INTERVAL_SECONDS", "3600")
+    )
+
+    # Admission control: submissions are refused with 429 once the estimated
+    # queue wait of their priority exceeds its SLO (0 disables the check)
+    ADMISSION_INTERACTIVE_SLO_SECONDS = float(
+        os.getenv("ADMISSION_INTERACTIVE_SLO_SECONDS", "30")
+    )
+    ADMISSION_BULK_SLO_SECONDS = float(os.getenv("ADMISSION_BULK_SLO_SECONDS", "600"))
+    # Window the completion rate and mean service time are measured over
+    ADMISSION_RATE_WINDOW_SECONDS = int(
+        os.getenv("ADMISSION_RATE_WINDOW_SECONDS", "60")
+    )
+    # How often each API process re-reads queue depths and rates
+    ADMISSION_REFRESH_MS = int(os.getenv("ADMISSION_REFRESH_MS", "1000"))
+    # Service time assumed before any job has finished, and the lowest
+    # throughput in jobs per second assumed while queues are not moving
+    ADMISSION_DEFAULT_SERVICE_SECONDS = float(
+        os.getenv("ADMISSION_DEFAULT_SERVICE_SECONDS", "10")
+    )
+    ADMISSION_MIN_SERVICE_RATE = float(os.getenv("ADMISSION_MIN_SERVICE_RATE", "1"))
+    ADMISSION_MAX_RETRY_AFTER_SECONDS = int(
+        os.getenv("ADMISSION_MAX_RETRY_AFTER_SECONDS", "300")
+    )
+    # Seconds after which a started job that never finished stops counting
+    ADMISSION_INFLIGHT_MAX_SECONDS = int(
+        os.getenv("ADMISSION_INFLIGHT_MAX_SECONDS", "1800")
+    )
+
+    # Pub/sub channel announcing jobs that reached a terminal state
+    JOB_EVENTS_CHANNEL = os.getenv("JOB_EVENTS_CHANNEL", "job-events")
+
+    # Long-poll and server-sent event limits for clients waiting on a job
+    WAIT_DEFAULT_SECONDS = float(os.getenv("WAIT_DEFAULT_SECONDS", "30"))
+    WAIT_MAX_SECONDS = float(os.getenv("WAIT_MAX_SECONDS", "60"))
+    EVENTS_MAX_SECONDS = float(os.getenv("EVENTS_MAX_SECONDS", "300"))
+    EVENTS_KEEPALIVE_SECONDS = float(os.getenv("EVENTS_KEEPALIVE_SECONDS", "15"))
+
+    # Most items accepted by /submit/batch and /status/batch in one request
+    BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+
+    # Seconds an in-flight marker lives before identical jobs stop waiting on it
+    INFLIGHT_TTL_SECONDS = int(os.getenv("INFLIGHT_TTL_SECONDS", "300"))
+    # Seconds between checks for waiters left behind by an expired marker;
+    # keep it below INFLIGHT_TTL_SECONDS
+    INFLIGHT_RECOVERY_INTERVAL_SECONDS = int(
+        os.getenv("INFLIGHT_RECOVERY_INTERVAL_SECONDS", "60")
+    )
+
     # Celery configuration
     CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL")
     CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND")
 
+    # Queues for each pipeline stage, so each can be sized independently
+    CELERY_FETCH_QUEUE = os.getenv("CELERY_FETCH_QUEUE", "fetch")
+    CELERY_EXTRACT_QUEUE = os.getenv("CELERY_EXTRACT_QUEUE", "extract")
+    CELERY_SUMMARIZE_QUEUE = os.getenv("CELERY_SUMMARIZE_QUEUE", "summarize")
+
+    # Queue that process_job is dispatched on; bulk jobs use the same names
+    # with this suffix so they can be served by separate workers
+    CELERY_DISPATCH_QUEUE = os.getenv("CELERY_DISPATCH_QUEUE", "celery")
+    CELERY_BULK_QUEUE_SUFFIX = os.getenv("CELERY_BULK_QUEUE_SUFFIX", "-bulk")
+
+    # Worker engine: "celery" (prefork stages) or "asyncio" (event loop)
+    WORKER_ENGINE = os.getenv("WORKER_ENGINE", "celery")
+
+    # Asyncio worker engine settings
+    ASYNC_JOB_QUEUE = os.getenv("ASYNC_JOB_QUEUE", "async:jobs")
+    ASYNC_WORKER_CONCURRENCY = int(os.getenv("ASYNC_WORKER_CONCURRENCY", "200"))
+    ASYNC_HTTP_MAX_CONNECTIONS = int(os.getenv("ASYNC_HTTP_MAX_CONNECTIONS", "100"))
+
+    # Seconds intermediate stage output is kept in Redis
+    STAGE_PAYLOAD_TTL_SECONDS = int(os.getenv("STAGE_PAYLOAD_TTL_SECONDS", "3600"))
+
+    # Retry policy: exponential backoff with jitter. Sync code only sleeps
+    # inline for short waits; Celery tasks reschedule themselves for longer
+    RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.5"))
+    RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "60"))
+    RETRY_INLINE_MAX_SECONDS = float(os.getenv("RETRY_INLINE_MAX_SECONDS", "2"))
+    TASK_MAX_RETRIES = int(os.getenv("TASK_MAX_RETRIES", "5"))
+
     # LLM configuration
     LLM_TOKEN = os.getenv("LLM_TOKEN")
     LLM_ENDPOINT = os.getenv("LLM_ENDPOINT")
     LLM_MODEL = os.getenv("LLM_MODEL")
+    LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))
+
+    # Optional list of endpoints to route across, as JSON:
+    # [{"name": "...", "endpoint": "...", "model": "...", "token": "..."}]
+    # Missing fields fall back to the LLM_* settings above
+    LLM_ENDPOINTS = json.loads(os.getenv("LLM_ENDPOINTS") or "[]")
+
+    # Circuit breaker per endpoint, shared by all workers through Redis
+    LLM_BREAKER_WINDOW_SECONDS = int(os.getenv("LLM_BREAKER_WINDOW_SECONDS", "30"))
+    LLM_BREAKER_MIN_REQUESTS = int(os.getenv("LLM_BREAKER_MIN_REQUESTS", "10"))
+    LLM_BREAKER_ERROR_RATE = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+    LLM_BREAKER_SLOW_SECONDS = float(os.getenv("LLM_BREAKER_SLOW_SECONDS", "15"))
+    LLM_BREAKER_SLOW_RATE = float(os.getenv("LLM_BREAKER_SLOW_RATE", "0.5"))
+    LLM_BREAKER_OPEN_SECONDS = int(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30"))
+
+    # Hedged requests: sent to the next endpoint once the first passes its p95
+    LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() == "true"
+    LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "10"))
+    LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "1"))
+    LLM_HEDGE_THREADS = int(os.getenv("LLM_HEDGE_THREADS", "32"))
+    LLM_STATS_REFRESH_SECONDS = float(os.getenv("LLM_STATS_REFRESH_SECONDS", "5"))
+
+    # Provider limits shared by all workers (0 disables a limit). Bulk jobs
+    # leave the reserve fraction of each budget to interactive jobs
+    LLM_RPM_LIMIT = int(os.getenv("LLM_RPM_LIMIT", "0"))
+    LLM_TPM_LIMIT = int(os.getenv("LLM_TPM_LIMIT", "0"))
+    LLM_BUDGET_BURST_SECONDS = float(os.getenv("LLM_BUDGET_BURST_SECONDS", "10"))
+    LLM_BULK_RESERVE_FRACTION = float(os.getenv("LLM_BULK_RESERVE_FRACTION", "0.3"))
+    LLM_OUTPUT_TOKENS_ESTIMATE = int(os.getenv("LLM_OUTPUT_TOKENS_ESTIMATE", "300"))
+    LLM_BUDGET_INLINE_WAIT_SECONDS = float(
+        os.getenv("LLM_BUDGET_INLINE_WAIT_SECONDS", "2")
+    )
+
+    # Micro-batching: short inputs from concurrent jobs share one request.
+    # The first waits up to the window for others, within the size budgets
+    LLM_BATCH_ENABLED = os.getenv("LLM_BATCH_ENABLED", "true").lower() == "true"
+    LLM_BATCH_WINDOW_MS = float(os.getenv("LLM_BATCH_WINDOW_MS", "20"))
+    LLM_BATCH_MAX_ITEMS = int(os.getenv("LLM_BATCH_MAX_ITEMS", "16"))
+    LLM_BATCH_MAX_TOKENS = int(os.getenv("LLM_BATCH_MAX_TOKENS", "4000"))
+    LLM_BATCH_ITEM_MAX_TOKENS = int(os.getenv("LLM_BATCH_ITEM_MAX_TOKENS", "500"))
+
+    # Stream summary tokens into a Redis stream per job as they are generated
+    STREAM_SUMMARIES = os.getenv("STREAM_SUMMARIES", "true").lower() == "true"
+    TOKEN_FLUSH_SECONDS = float(os.getenv("TOKEN_FLUSH_SECONDS", "0.05"))
+    TOKEN_STREAM_TTL_SECONDS = int(os.getenv("TOKEN_STREAM_TTL_SECONDS", "600"))
+    TOKEN_RELAY_BLOCK_SECONDS = float(os.getenv("TOKEN_RELAY_BLOCK_SECONDS", "1"))
+
+    # Cached summaries are keyed by model and prompt version. Bump
+    # SUMMARY_PROMPT_VERSION whenever the prompts in summarizer.py change;
+    # entries under a previous version expire after the TTL
+    SUMMARY_PROMPT_VERSION = os.getenv("SUMMARY_PROMPT_VERSION", "2")
+    SUMMARY_CACHE_TTL_SECONDS = int(
+        os.getenv("SUMMARY_CACHE_TTL_SECONDS", str(30 * 24 * 3600))
+    )
+
+    # Two-tier summary cache: a per-process LRU (L1) in front of Redis (L2).
+    # Redis values above the size threshold are compressed with "zlib", or
+    # "zstd" when the zstandard package is installed. Writes are broadcast
+    # so other processes drop their stale L1 copies
+    CACHE_L1_MAX_BYTES = int(os.getenv("CACHE_L1_MAX_BYTES", str(64 * 1024 * 1024)))
+    CACHE_L1_TTL_SECONDS = float(os.getenv("CACHE_L1_TTL_SECONDS", "300"))
+    CACHE_COMPRESS_MIN_BYTES = int(os.getenv("CACHE_COMPRESS_MIN_BYTES", "1024"))
+    CACHE_COMPRESSION = os.getenv("CACHE_COMPRESSION", "zlib")
+    CACHE_INVALIDATION_ENABLED = (
+        os.getenv("CACHE_INVALIDATION_ENABLED", "true").lower() == "true"
+    )
+    CACHE_INVALIDATION_CHANNEL = os.getenv(
+        "CACHE_INVALIDATION_CHANNEL", "cache:invalidate"
+    )
+
+    # Submitted texts and summaries in Postgres are zlib-compressed at this
+    # level when at least CONTENT_COMPRESS_MIN_BYTES long
+    CONTENT_COMPRESS_MIN_BYTES = int(os.getenv("CONTENT_COMPRESS_MIN_BYTES", "256"))
+    CONTENT_COMPRESSION_LEVEL = int(os.getenv("CONTENT_COMPRESSION_LEVEL", "6"))
+
+    # Query parameters ignored when identifying a URL ("*" matches a prefix)
+    URL_TRACKING_PARAMS = [
+        name.strip().lower()
+        for name in os.getenv(
+            "URL_TRACKING_PARAMS",
+            "utm_*,gclid,dclid,fbclid,msclkid,yclid,mc_cid,mc_eid,igshid,_ga,_gl",
+        ).split(",")
+        if name.strip()
+    ]
+
+    # Near-duplicate reuse: texts whose estimated Jaccard similarity to a
+    # summarized text reaches the threshold reuse its summary. Signatures
+    # have NUM_PERM values split into BANDS bands for LSH lookups
+    SIMILARITY_ENABLED = os.getenv("SIMILARITY_ENABLED", "true").lower() == "true"
+    SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", "0.9"))
+    SIMILARITY_SHINGLE_SIZE = int(os.getenv("SIMILARITY_SHINGLE_SIZE", "5"))
+    SIMILARITY_NUM_PERM = int(os.getenv("SIMILARITY_NUM_PERM", "128"))
+    SIMILARITY_BANDS = int(os.getenv("SIMILARITY_BANDS", "16"))
+    SIMILARITY_MIN_SHINGLES = int(os.getenv("SIMILARITY_MIN_SHINGLES", "50"))
+    SIMILARITY_MAX_CANDIDATES = int(os.getenv("SIMILARITY_MAX_CANDIDATES", "20"))
+    SIMILARITY_BAND_MAX_MEMBERS = int(os.getenv("SIMILARITY_BAND_MAX_MEMBERS", "200"))
+    SIMILARITY_TTL_SECONDS = int(
+        os.getenv("SIMILARITY_TTL_SECONDS", str(7 * 24 * 3600))
+    )
+
+    # LLM calls tracked as in flight for longer than this are assumed lost
+    METRICS_LLM_CALL_MAX_SECONDS = int(os.getenv("METRICS_LLM_CALL_MAX_SECONDS", "600"))
+
+    # Fetch connection pools and per-host limits shared by all workers; a
+    # rate or concurrency of 0 disables that limit. Only the asyncio engine
+    # waits up to FETCH_SLOT_WAIT_SECONDS for a host; Celery tasks wait up to
+    # RETRY_INLINE_MAX_SECONDS and are then rescheduled
+    FETCH_POOL_HOSTS = int(os.getenv("FETCH_POOL_HOSTS", "100"))
+    FETCH_POOL_SIZE_PER_HOST = int(os.getenv("FETCH_POOL_SIZE_PER_HOST", "10"))
+    FETCH_HOST_CONCURRENCY = int(os.getenv("FETCH_HOST_CONCURRENCY", "4"))
+    FETCH_HOST_RATE = float(os.getenv("FETCH_HOST_RATE", "5"))
+    FETCH_HOST_BURST = int(os.getenv("FETCH_HOST_BURST", "10"))
+    FETCH_SLOT_LEASE_SECONDS = int(os.getenv("FETCH_SLOT_LEASE_SECONDS", "30"))
+    FETCH_SLOT_WAIT_SECONDS = int(os.getenv("FETCH_SLOT_WAIT_SECONDS", "30"))
+
+    # Fetched URL content: served without revalidation for the TTL, then
+    # kept (with its ETag / Last-Modified) for conditional GETs until retention
+    URL_CONTENT_TTL_SECONDS = int(os.getenv("URL_CONTENT_TTL_SECONDS", "3600"))
+    URL_CONTENT_RETENTION_SECONDS = int(
+        os.getenv("URL_CONTENT_RETENTION_SECONDS", str(7 * 24 * 3600))
+    )
+
+    # Content extraction: byte cap per response and parser back end
+    # ("html.parser", or "lxml" when installed)
+    MAX_FETCH_BYTES = int(os.getenv("MAX_FETCH_BYTES", str(2 * 1024 * 1024)))
+    HTML_PARSER = os.getenv("HTML_PARSER", "html.parser")
+
+    # Long-document summarization
+    MAX_CONTENT_LENGTH = int(os.getenv("MAX_CONTENT_LENGTH", "200000"))
+    SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "3000"))
+    SUMMARY_MAX_PARALLEL = int(os.getenv("SUMMARY_MAX_PARALLEL", "8"))
+    CHUNK_SUMMARY_TTL_SECONDS = int(
+        os.getenv("CHUNK_SUMMARY_TTL_SECONDS", str(7 * 24 * 3600))
+    )
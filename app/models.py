@@ -1,7 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import and_, or_
+import os
 import uuid
 from enum import Enum
-from datetime import datetime
+from datetime import datetime, timedelta
 
 # Initialize database
 db = SQLAlchemy()
@@ -23,20 +25,144 @@ class ContentType(str, Enum):
     URL = "url"
 
 
+class JobPriority(str, Enum):
+    """Scheduling classes for LLM capacity and worker queues"""
+
+    INTERACTIVE = "interactive"
+    BULK = "bulk"
+
+
+class Content(db.Model):
+    """Submitted text or URL, stored once however many jobs submit it.
+
+    Keyed by the SHA256 of the exact text; data may be compressed (see
+    app.services.content_store).
+    """
+
+    __tablename__ = "contents"
+
+    hash = db.Column(db.String, primary_key=True)
+    data = db.Column(db.LargeBinary, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class Summary(db.Model):
+    """Summary text, stored once however many jobs share it"""
+
+    __tablename__ = "summaries"
+
+    hash = db.Column(db.String, primary_key=True)
+    data = db.Column(db.LargeBinary, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def new_job_key(now=None):
+    """Id and created_at for a new job.
+
+    The id is a UUID in the version 7 layout, whose first 48 bits are
+    created_at in milliseconds, so job_created_at can recover it.
+    """
+    now = now or datetime.utcnow()
+    millis = (now - EPOCH) // timedelta(milliseconds=1)
+    rand = int.from_bytes(os.urandom(10), "big")
+    # 48-bit timestamp, version 7, 12 random bits, variant 0b10, 62 random bits
+    value = (
+        millis << 80
+        | 0x7 << 76
+        | (rand & 0xFFF) << 64
+        | 0b10 << 62
+        | (rand >> 12) & ((1 << 62) - 1)
+    )
+    return str(uuid.UUID(int=value)), EPOCH + timedelta(milliseconds=millis)
+
+
+def job_created_at(job_id):
+    """created_at carried by a job id, or None for ids without one"""
+    try:
+        value = uuid.UUID(job_id)
+    except (TypeError, ValueError):
+        return None
+    if value.version != 7:
+        return None
+    return EPOCH + timedelta(milliseconds=value.int >> 80)
+
+
+def jobs_filter(job_ids):
+    """WHERE clause selecting jobs by id.
+
+    Also filters on the created_at carried by the ids, so Postgres only
+    probes the partitions holding the jobs. Ids without one (jobs created
+    before ids carried it) are matched on id alone.
+    """
+    columns = Job.__table__.c
+    dated = {}
+    legacy = []
+    for job_id in job_ids:
+        created_at = job_created_at(job_id)
+        if created_at is None:
+            legacy.append(job_id)
+        else:
+            dated[job_id] = created_at
+
+    clauses = []
+    if dated:
+        clauses.append(
+            and_(
+                columns.id.in_(list(dated)),
+                columns.created_at.in_(sorted(set(dated.values()))),
+            )
+        )
+    if legacy:
+        clauses.append(columns.id.in_(legacy))
+    return or_(*clauses)
+
+
+def find_job(job_id):
+    """The job with an id, or None"""
+    return Job.query.filter(jobs_filter([job_id])).first()
+
+
 class Job(db.Model):
-    """Database model for summarization jobs"""
+    """Database model for summarization jobs.
+
+    On Postgres the table is partitioned by range of created_at (see
+    app.services.retention), so created_at is part of the table's primary
+    key. Rows are still identified by id alone, and ids carry created_at
+    (see new_job_key) so lookups can name the partition.
+    """
 
     __tablename__ = "jobs"
+    __table_args__ = ({"postgresql_partition_by": "RANGE (created_at)"},)
+
+    def __init__(self, **kwargs):
+        if "id" not in kwargs:
+            kwargs["id"], kwargs["created_at"] = new_job_key(kwargs.get("created_at"))
+        super().__init__(**kwargs)
 
-    id = db.Column(db.String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(db.String, primary_key=True)
     content_hash = db.Column(db.String, index=True, nullable=True)
     content_type = db.Column(db.Enum(ContentType), nullable=False)
-    content = db.Column(db.Text, nullable=False)
-    summary = db.Column(db.Text, nullable=True)
+    content_id = db.Column(db.String, db.ForeignKey("contents.hash"), nullable=False)
+    summary_id = db.Column(db.String, db.ForeignKey("summaries.hash"), nullable=True)
     status = db.Column(db.Enum(JobStatus), nullable=False)
+    priority = db.Column(
+        db.Enum(JobPriority), default=JobPriority.INTERACTIVE, nullable=False
+    )
     cached = db.Column(db.Boolean, default=False, nullable=False)
+    # Estimated similarity when the summary came from a near-duplicate text
+    similarity = db.Column(db.Float, nullable=True)
     processing_time_ms = db.Column(db.Integer, nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Milliseconds per stage: queue_wait, fetch, extract, llm, cache_get,
+    # cache_set, db_commit and total
+    timings = db.Column(db.JSON, nullable=True)
+    created_at = db.Column(
+        db.DateTime, primary_key=True, default=datetime.utcnow, nullable=False
+    )
     updated_at = db.Column(
         db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
     )
+
+    __mapper_args__ = {"primary_key": [id]}
@@ -1,87 +1,487 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from prometheus_client import CONTENT_TYPE_LATEST
 from flasgger import swag_from
-from app.models import Job, JobStatus, ContentType
-from app.services.worker import process_job
-from app.utils.helpers import hash_content, write_to_pgdb
-from app.swagger import submit_spec, status_spec, result_spec
+from app.config import Config
+from app.models import (
+    db,
+    Content,
+    Job,
+    JobStatus,
+    ContentType,
+    JobPriority,
+    Summary,
+    jobs_filter,
+    new_job_key,
+)
+from app.services.worker import enqueue_job, enqueue_jobs
+from app.services.cache_service import (
+    cache_stats,
+    get_cached_summary,
+    get_many_cached_summaries,
+    abandon_inflight,
+    abandon_many_inflight,
+    claim_inflight,
+    claim_many_inflight,
+    add_inflight_waiter,
+    add_many_inflight_waiters,
+)
+from app.services.admission import controller as admission
+from app.services.content_store import (
+    decompress_text,
+    store_content,
+    store_contents,
+    store_summaries,
+    store_summary,
+)
+from app.services.job_events import hub
+from app.services.metrics import flush_stage_timings, observe_job, render_metrics
+from app.services.token_stream import read_tokens
+from app.services.status_store import (
+    backfill_job_status,
+    backfill_many_job_status,
+    get_job_status,
+    get_many_job_status,
+    job_fields,
+    store_job,
+    store_jobs,
+)
+from app.utils.cache_keys import hash_job_content
+from app.utils.helpers import insert_many_pgdb, write_to_pgdb
+from app.utils.timings import recording
+from app.swagger import (
+    submit_spec,
+    status_spec,
+    result_spec,
+    wait_spec,
+    events_spec,
+    stream_spec,
+    submit_batch_spec,
+    status_batch_spec,
+    cache_stats_spec,
+    metrics_spec,
+)
+from datetime import datetime
+from sqlalchemy import and_
 import urllib.parse
+import json
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+# States after which a job's status no longer changes
+TERMINAL_STATUSES = (JobStatus.COMPLETED, JobStatus.FAILED)
+
 # Create API blueprint
 api = Blueprint("api", __name__)
 
 
+def validate_item(data):
+    """Content type and content of a submission, or an error message"""
+    if not isinstance(data, dict):
+        return None, None, "Provide either 'text' or 'url'"
+
+    text = data.get("text")
+    url = data.get("url")
+
+    # Validate input: must provide text OR url, not both
+    if text and url:
+        return None, None, "Provide 'text' or 'url', not both"
+    if not text and not url:
+        return None, None, "Provide either 'text' or 'url'"
+    if not isinstance(text or url, str):
+        return None, None, "'text' and 'url' must be strings"
+
+    if url:
+        # Validate URL format
+        parsed = urllib.parse.urlparse(url)
+        if not parsed.scheme or not parsed.netloc:
+            return None, None, "Invalid URL format"
+        return ContentType.URL, url, None
+
+    return ContentType.TEXT, text, None
+
+
+def overloaded(decision):
+    """429 response for submissions refused by admission control"""
+    response = jsonify(
+        {
+            "error": "Service overloaded, retry later",
+            "retry_after": decision.retry_after,
+            "estimated_wait_seconds": round(decision.wait_seconds, 1),
+        }
+    )
+    return response, 429, {"Retry-After": str(decision.retry_after)}
+
+
+def parse_priority(data, default):
+    """Priority class requested in a submission, or None if invalid"""
+    value = data.get("priority") if isinstance(data, dict) else None
+    if value is None:
+        return default
+    try:
+        return JobPriority(value)
+    except ValueError:
+        return None
+
+
 @api.route("/submit", methods=["POST"])
 @swag_from(submit_spec)
 def submit():
     """Submit content for summarization"""
-    try:
-        data = request.json
-        text = data.get("text")
-        url = data.get("url")
-
-        # Validate input: must provide text OR url, not both
-        if text and url:
-            logger.warning("Invalid request: both 'text' and 'url' provided")
-            return jsonify({"error": "Provide 'text' or 'url', not both"}), 400
-        if not text and not url:
-            logger.warning("Invalid request: neither 'text' nor 'url' " "provided")
-            return jsonify({"error": "Provide either 'text' or 'url'"}), 400
-
-        # Determine content type and validate
-        if url:
-            content_type = ContentType.URL
-            content = url
-
-            # Validate URL format
-            parsed = urllib.parse.urlparse(url)
-            if not parsed.scheme or not parsed.netloc:
-                logger.warning("Invalid URL format: %s", url)
-                return jsonify({"error": "Invalid URL format"}), 400
-        else:
-            content_type = ContentType.TEXT
-            content = text
-
-        # Generate content hash for caching
-        content_hash = hash_content(content)
-        logger.info("Processing content with hash: %s", content_hash)
-
-        # Create job in database
+    with recording() as timings:
+        start_time = time.time()
         try:
-            job = Job(
-                content_hash=content_hash,
-                content_type=content_type,
-                content=content,
-                status=JobStatus.QUEUED,
-            )
-            write_to_pgdb(job)
-            logger.info("Created job with ID: %s", job.id)
+            content_type, content, error = validate_item(request.json)
+            if error:
+                logger.warning("Invalid request: %s", error)
+                return jsonify({"error": error}), 400
+
+            priority = parse_priority(request.json, JobPriority.INTERACTIVE)
+            if priority is None:
+                logger.warning("Invalid priority: %s", request.json.get("priority"))
+                return jsonify({"error": "Invalid priority"}), 400
+
+            # Generate content hash for caching; equivalent URLs and texts share it
+            content_hash = hash_job_content(content_type, content)
+            logger.info("Processing content with hash: %s", content_hash)
+
+            # Serve cache hits inline without a broker round-trip
+            cached = get_cached_summary(content_hash)
+
+            # Only a job that leads its content adds queue load; one joining an
+            # identical in-flight job is admitted, and work that would miss its
+            # SLO is refused before anything is stored
+            job_id, created_at = new_job_key()
+            leader = not cached and claim_inflight(content_hash, job_id)
+            decision = admission.admit(priority) if leader else None
+            if decision and not decision.admitted:
+                abandon_inflight(content_hash, job_id)
+                return overloaded(decision)
+
+            # Create job in database
+            try:
+                job = Job(
+                    id=job_id,
+                    created_at=created_at,
+                    content_hash=content_hash,
+                    content_type=content_type,
+                    content_id=store_content(content),
+                    status=JobStatus.QUEUED,
+                    priority=priority,
+                )
+                summary = None
+                if cached:
+                    summary = cached.decode()
+                    job.summary_id = store_summary(summary)
+                    job.status = JobStatus.COMPLETED
+                    job.cached = True
+                    job.processing_time_ms = int((time.time() - start_time) * 1000)
+                    job.timings = {
+                        **timings.snapshot(),
+                        "total": job.processing_time_ms,
+                    }
+                write_to_pgdb(job)
+                store_job(job, summary, content)
+                logger.info("Created job with ID: %s", job.id)
+            except Exception as e:
+                logger.error("Job creation failed: %s", str(e))
+                if leader:
+                    abandon_inflight(content_hash, job_id)
+                return jsonify({"error": f"Job creation error: {str(e)}"}), 500
+
+            if job.status == JobStatus.COMPLETED:
+                observe_job(job.status, True, timings=job.timings)
+                logger.info("Job %s completed from cache at submit", job.id)
+                return jsonify({"job_id": job.id, "status": job.status}), 200
+
+            # Coalesce with an identical job that is already being summarized
+            if not leader and add_inflight_waiter(content_hash, job.id):
+                logger.info(
+                    "Job %s coalesced with in-flight hash %s", job.id, content_hash
+                )
+                return jsonify({"job_id": job.id, "status": job.status}), 200
+
+            # Queue job for async processing; time spent here counts toward it
+            try:
+                flush_stage_timings(job.id, timings, wait=False)
+                enqueue_job(job.id, priority)
+                logger.info("Queued job %s for processing", job.id)
+            except Exception as e:
+                logger.error(
+                    "Job processing queue failed for job %s: %s", job.id, str(e)
+                )
+                abandon_inflight(content_hash, job.id)
+                return jsonify({"error": f"Job processing error: {str(e)}"}), 500
+
+            response = {"job_id": job.id, "status": job.status}
+            if decision:
+                response["estimated_completion"] = (
+                    decision.estimated_completion.isoformat()
+                )
+            return jsonify(response), 200
         except Exception as e:
-            logger.error("Job creation failed: %s", str(e))
-            return jsonify({"error": f"Job creation error: {str(e)}"}), 500
+            logger.exception("Unexpected error in submit endpoint: %s", str(e))
+            return jsonify({"error": str(e)}), 500
 
-        # Queue job for async processing
+
+@api.route("/submit/batch", methods=["POST"])
+@swag_from(submit_batch_spec)
+def submit_batch():
+    """Submit many items for summarization in one request"""
+    with recording() as timings:
+        start_time = time.time()
         try:
-            process_job.delay(job.id)
-            logger.info("Queued job %s for processing", job.id)
+            data = request.json or {}
+            items = data.get("items")
+            if not isinstance(items, list) or not items:
+                logger.warning("Invalid batch request: no items")
+                return jsonify({"error": "Provide a non-empty 'items' list"}), 400
+            if len(items) > Config.BATCH_MAX_ITEMS:
+                logger.warning("Invalid batch request: %d items", len(items))
+                return (
+                    jsonify(
+                        {"error": f"At most {Config.BATCH_MAX_ITEMS} items per batch"}
+                    ),
+                    400,
+                )
+
+            # Batches default to bulk so they don't crowd out interactive jobs
+            priority = parse_priority(data, JobPriority.BULK)
+            if priority is None:
+                logger.warning("Invalid batch priority: %s", data.get("priority"))
+                return jsonify({"error": "Invalid priority"}), 400
+
+            # Validate and hash in one pass; identical items share one job
+            results = [None] * len(items)
+            jobs_by_hash = {}
+            contents = {}
+            positions = {}
+            now = datetime.utcnow()
+            for i, item in enumerate(items):
+                content_type, content, error = validate_item(item)
+                if error:
+                    results[i] = {"error": error}
+                    continue
+
+                content_hash = hash_job_content(content_type, content)
+                if content_hash not in jobs_by_hash:
+                    contents[content_hash] = content
+                    jobs_by_hash[content_hash] = Job(
+                        content_hash=content_hash,
+                        content_type=content_type,
+                        status=JobStatus.QUEUED,
+                        priority=priority,
+                        cached=False,
+                        created_at=now,
+                        updated_at=now,
+                    )
+                positions.setdefault(content_hash, []).append(i)
+
+            # Serve cache hits inline, as /submit does
+            jobs = list(jobs_by_hash.values())
+            cached = get_many_cached_summaries([job.content_hash for job in jobs])
+            cached = [summary and summary.decode() for summary in cached]
+            elapsed_ms = int((time.time() - start_time) * 1000)
+            cached_timings = {**timings.snapshot(), "total": elapsed_ms}
+            for job, summary in zip(jobs, cached):
+                if summary:
+                    job.status = JobStatus.COMPLETED
+                    job.cached = True
+                    job.processing_time_ms = elapsed_ms
+                    job.timings = cached_timings
+
+            # Claim the uncached contents; jobs joining an identical in-flight
+            # job add no queue load, so only the new leaders are admitted or
+            # refused, as a whole and before anything is stored
+            queued = [job for job in jobs if job.status == JobStatus.QUEUED]
+            claims = [(job.content_hash, job.id) for job in queued]
+            claimed = claim_many_inflight(claims)
+            won = [claim for claim, leader in zip(claims, claimed) if leader]
+            decision = admission.admit(priority, len(won)) if won else None
+            if decision and not decision.admitted:
+                abandon_many_inflight(won)
+                return overloaded(decision)
+
+            # One multi-row INSERT per table for the whole batch
+            try:
+                if jobs:
+                    content_ids = store_contents(
+                        [contents[job.content_hash] for job in jobs]
+                    )
+                    summaries = [summary for summary in cached if summary]
+                    summary_ids = iter(store_summaries(summaries))
+                    for job, content_id, summary in zip(jobs, content_ids, cached):
+                        job.content_id = content_id
+                        if summary:
+                            job.summary_id = next(summary_ids)
+                    insert_many_pgdb(Job, jobs)
+                    store_jobs(
+                        {
+                            job.id: job_fields(job, summary, contents[job.content_hash])
+                            for job, summary in zip(jobs, cached)
+                        }
+                    )
+            except Exception as e:
+                logger.error("Batch job creation failed: %s", str(e))
+                abandon_many_inflight(won)
+                return jsonify({"error": f"Job creation error: {str(e)}"}), 500
+
+            if len(queued) < len(jobs):
+                observe_job(
+                    JobStatus.COMPLETED,
+                    True,
+                    timings=cached_timings,
+                    count=len(jobs) - len(queued),
+                )
+
+            # Coalesce with identical jobs already being summarized
+            losers = [claim for claim, leader in zip(claims, claimed) if not leader]
+            waiting = add_many_inflight_waiters(losers)
+            coalesced = {
+                job_id for (_, job_id), leader in zip(losers, waiting) if leader
+            }
+            to_enqueue = [job.id for job in queued if job.id not in coalesced]
+
+            try:
+                enqueue_jobs(to_enqueue, priority)
+            except Exception as e:
+                logger.error(
+                    "Batch queueing failed for %d jobs: %s", len(to_enqueue), e
+                )
+                abandon_many_inflight(won)
+                return jsonify({"error": f"Job processing error: {str(e)}"}), 500
+
+            estimate = decision and decision.estimated_completion.isoformat()
+            enqueued = set(to_enqueue)
+            for content_hash, job in jobs_by_hash.items():
+                result = {"job_id": job.id, "status": job.status}
+                if estimate and job.id in enqueued:
+                    result["estimated_completion"] = estimate
+                for i in positions[content_hash]:
+                    results[i] = result
+
+            logger.info(
+                "Batch of %d items: %d jobs, %d cached, %d coalesced, %d queued",
+                len(items),
+                len(jobs),
+                len(jobs) - len(queued),
+                len(coalesced),
+                len(to_enqueue),
+            )
+            return jsonify({"jobs": results}), 200
         except Exception as e:
-            logger.error("Job processing queue failed for job %s: %s", job.id, str(e))
-            return jsonify({"error": f"Job processing error: {str(e)}"}), 500
+            logger.exception("Unexpected error in batch submit endpoint: %s", str(e))
+            return jsonify({"error": str(e)}), 500
 
-        return (
-            jsonify(
-                {
-                    "job_id": job.id,
-                    "status": job.status,
-                }
-            ),
-            200,
+
+def query_job_status(job_ids):
+    """Status projections of jobs from Postgres.
+
+    Selects only the status columns, the summary and, for URL jobs, the
+    submitted URL; the submitted text of text jobs is never read.
+    """
+    url_join = and_(Content.hash == Job.content_id, Job.content_type == ContentType.URL)
+    return (
+        db.session.query(
+            Job.id,
+            Job.status,
+            Job.created_at,
+            Job.content_type,
+            Job.cached,
+            Job.similarity,
+            Job.processing_time_ms,
+            Summary.data.label("summary"),
+            Content.data.label("original_url"),
         )
-    except Exception as e:
-        logger.exception("Unexpected error in submit endpoint: %s", str(e))
-        return jsonify({"error": str(e)}), 500
+        .outerjoin(Summary, Summary.hash == Job.summary_id)
+        .outerjoin(Content, url_join)
+        .filter(jobs_filter(job_ids))
+        .all()
+    )
+
+
+def row_fields(row):
+    """job_fields of a status projection"""
+    return job_fields(
+        row, decompress_text(row.summary), decompress_text(row.original_url)
+    )
+
+
+def load_job_status(job_id):
+    """Hot status of a job from Redis, falling back to Postgres on a miss"""
+    entry = get_job_status(job_id)
+    if entry is not None:
+        return entry
+
+    rows = query_job_status([job_id])
+    if not rows:
+        return None
+
+    # Backfill the store so the next poll is served from Redis. The row may
+    # trail a state a worker wrote since the miss; the store keeps that one
+    fields = row_fields(rows[0])
+    return backfill_job_status(job_id, fields) or job_entry(fields)
+
+
+def job_entry(fields):
+    """Status entry from job_fields in the form read from the status store"""
+    entry = dict(fields)
+    entry["status"] = fields["status"].value
+    entry["created_at"] = fields["created_at"].isoformat()
+    return entry
+
+
+def load_many_job_status(job_ids):
+    """Status entries by job id, from Redis with one Postgres query for misses"""
+    entries = {
+        job_id: entry
+        for job_id, entry in zip(job_ids, get_many_job_status(job_ids))
+        if entry is not None
+    }
+
+    missing = [job_id for job_id in job_ids if job_id not in entries]
+    if missing:
+        fields_by_id = {row.id: row_fields(row) for row in query_job_status(missing)}
+        backfilled = backfill_many_job_status(fields_by_id)
+        entries.update(
+            (job_id, backfilled.get(job_id) or job_entry(fields))
+            for job_id, fields in fields_by_id.items()
+        )
+
+    return entries
+
+
+def result_payload(job_id, job):
+    """Response body for a completed job"""
+    response_data = {
+        "job_id": job_id,
+        "summary": job["summary"],
+        "cached": job["cached"],
+        "processing_time_ms": job["processing_time_ms"],
+    }
+
+    # Only include similarity if the summary came from a near-duplicate
+    if job.get("similarity") is not None:
+        response_data["similarity"] = job["similarity"]
+
+    # Only include original_url if content type is URL
+    if job.get("original_url"):
+        response_data["original_url"] = job["original_url"]
+
+    return response_data
+
+
+def wait_payload(job_id, job):
+    """Status of a job, with its result once completed"""
+    payload = {
+        "job_id": job_id,
+        "status": job["status"],
+        "created_at": job["created_at"],
+    }
+    if job["status"] == JobStatus.COMPLETED:
+        payload.update(result_payload(job_id, job))
+    return payload
 
 
 @api.route("/status/<job_id>")
@@ -90,19 +490,19 @@ def status(job_id):
     """Get the current status of a job"""
     try:
         logger.info("Checking status for job: %s", job_id)
-        job = Job.query.get(job_id)
+        job = load_job_status(job_id)
 
         if not job:
             logger.warning("Job not found: %s", job_id)
             return jsonify({"error": "Job not found"}), 404
 
-        logger.info("Job %s status: %s", job_id, job.status)
+        logger.info("Job %s status: %s", job_id, job["status"])
         return (
             jsonify(
                 {
-                    "job_id": job.id,
-                    "status": job.status,
-                    "created_at": job.created_at.isoformat(),
+                    "job_id": job_id,
+                    "status": job["status"],
+                    "created_at": job["created_at"],
                 }
             ),
             200,
@@ -112,35 +512,223 @@ def status(job_id):
         return jsonify({"error": str(e)}), 500
 
 
+@api.route("/status/batch", methods=["POST"])
+@swag_from(status_batch_spec)
+def status_batch():
+    """Get the current status of many jobs"""
+    try:
+        job_ids = (request.json or {}).get("job_ids")
+        if (
+            not isinstance(job_ids, list)
+            or not job_ids
+            or not all(isinstance(job_id, str) for job_id in job_ids)
+        ):
+            logger.warning("Invalid batch status request")
+            return jsonify({"error": "Provide a non-empty 'job_ids' list"}), 400
+        if len(job_ids) > Config.BATCH_MAX_ITEMS:
+            logger.warning("Invalid batch status request: %d ids", len(job_ids))
+            return (
+                jsonify({"error": f"At most {Config.BATCH_MAX_ITEMS} ids per batch"}),
+                400,
+            )
+
+        entries = load_many_job_status(job_ids)
+        results = []
+        for job_id in job_ids:
+            job = entries.get(job_id)
+            if job is None:
+                results.append({"job_id": job_id, "error": "Job not found"})
+            else:
+                results.append(
+                    {
+                        "job_id": job_id,
+                        "status": job["status"],
+                        "created_at": job["created_at"],
+                    }
+                )
+
+        logger.info("Batch status for %d jobs, %d found", len(job_ids), len(entries))
+        return jsonify({"jobs": results}), 200
+    except Exception as e:
+        logger.exception("Error checking batch status: %s", str(e))
+        return jsonify({"error": str(e)}), 500
+
+
 @api.route("/result/<job_id>")
 @swag_from(result_spec)
 def result(job_id):
     """Get the result of a completed job"""
     try:
         logger.info("Retrieving result for job: %s", job_id)
-        job = Job.query.get(job_id)
+        job = load_job_status(job_id)
 
         if not job:
             logger.warning("Job not found for result: %s", job_id)
             return jsonify({"error": "Job not found"}), 404
 
-        if job.status != JobStatus.COMPLETED:
-            logger.info("Job %s not ready, status: %s", job_id, job.status)
+        if job["status"] != JobStatus.COMPLETED:
+            logger.info("Job %s not ready, status: %s", job_id, job["status"])
             return jsonify({"error": "Not ready"}), 400
 
         logger.info("Returning result for completed job: %s", job_id)
-        response_data = {
-            "job_id": job.id,
-            "summary": job.summary,
-            "cached": job.cached,
-            "processing_time_ms": job.processing_time_ms,
-        }
+        return jsonify(result_payload(job_id, job)), 200
+    except Exception as e:
+        logger.exception("Error retrieving result for job %s: %s", job_id, str(e))
+        return jsonify({"error": str(e)}), 500
+
 
-        # Only include original_url if content type is URL
-        if job.content_type == ContentType.URL:
-            response_data["original_url"] = job.content
+@api.route("/wait/<job_id>")
+@swag_from(wait_spec)
+def wait(job_id):
+    """Long-poll until a job completes or fails, or the timeout passes"""
+    try:
+        timeout = min(
+            request.args.get("timeout", Config.WAIT_DEFAULT_SECONDS, type=float),
+            Config.WAIT_MAX_SECONDS,
+        )
+
+        # Subscribe before reading the status so a finish in between is seen
+        with hub.subscription(job_id) as finished:
+            job = load_job_status(job_id)
+            if not job:
+                logger.warning("Job not found for wait: %s", job_id)
+                return jsonify({"error": "Job not found"}), 404
+
+            if job["status"] not in TERMINAL_STATUSES:
+                # Don't hold a pooled connection while the client waits
+                db.session.remove()
+                if finished.wait(max(timeout, 0)):
+                    job = load_job_status(job_id) or job
 
-        return jsonify(response_data), 200
+        logger.info("Job %s wait returned status: %s", job_id, job["status"])
+        return jsonify(wait_payload(job_id, job)), 200
     except Exception as e:
-        logger.exception("Error retrieving result for job %s: %s", job_id, str(e))
+        logger.exception("Error waiting for job %s: %s", job_id, str(e))
+        return jsonify({"error": str(e)}), 500
+
+
+def sse_message(event, data, event_id=None):
+    """Format one server-sent event"""
+    message = f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    if event_id:
+        message = f"id: {event_id}\n" + message
+    return message
+
+
+@api.route("/events/<job_id>")
+@swag_from(events_spec)
+def events(job_id):
+    """Stream a job's status as server-sent events until it finishes"""
+    try:
+        job = load_job_status(job_id)
+        if not job:
+            logger.warning("Job not found for events: %s", job_id)
+            return jsonify({"error": "Job not found"}), 404
+        db.session.remove()
+    except Exception as e:
+        logger.exception("Error loading job %s for events: %s", job_id, str(e))
         return jsonify({"error": str(e)}), 500
+
+    def stream(job):
+        with hub.subscription(job_id) as finished:
+            # Re-read once subscribed so a finish since the check is not missed
+            job = load_job_status(job_id) or job
+            db.session.remove()
+            yield sse_message("status", wait_payload(job_id, job))
+
+            deadline = time.monotonic() + Config.EVENTS_MAX_SECONDS
+            while job["status"] not in TERMINAL_STATUSES:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                if finished.wait(min(Config.EVENTS_KEEPALIVE_SECONDS, remaining)):
+                    finished.clear()
+                    job = load_job_status(job_id) or job
+                    db.session.remove()
+                    yield sse_message("status", wait_payload(job_id, job))
+                else:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+
+    return Response(
+        stream_with_context(stream(job)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def token_messages(entries):
+    """Server-sent events for token stream entries"""
+    for entry_id, fields in entries:
+        if fields.get("reset"):
+            # A new attempt started; clients drop the text received so far
+            yield sse_message("reset", {})
+        yield sse_message("token", {"text": fields["text"]}, entry_id)
+
+
+@api.route("/stream/<job_id>")
+@swag_from(stream_spec)
+def stream_tokens(job_id):
+    """Relay a job's summary tokens as server-sent events as they arrive"""
+    try:
+        job = load_job_status(job_id)
+        if not job:
+            logger.warning("Job not found for token stream: %s", job_id)
+            return jsonify({"error": "Job not found"}), 404
+        db.session.remove()
+    except Exception as e:
+        logger.exception("Error loading job %s for token stream: %s", job_id, str(e))
+        return jsonify({"error": str(e)}), 500
+
+    # Reconnecting clients resume after the last token they received
+    last_id = request.headers.get("Last-Event-ID") or "0-0"
+
+    def relay(job, last_id):
+        with hub.subscription(job_id) as finished:
+            job = load_job_status(job_id) or job
+            db.session.remove()
+            running = job["status"] not in TERMINAL_STATUSES
+
+            deadline = time.monotonic() + Config.EVENTS_MAX_SECONDS
+            idle_since = time.monotonic()
+            while job["status"] not in TERMINAL_STATUSES:
+                if time.monotonic() >= deadline:
+                    return
+                entries = read_tokens(job_id, last_id, Config.TOKEN_RELAY_BLOCK_SECONDS)
+                if entries:
+                    last_id = entries[-1][0]
+                    idle_since = time.monotonic()
+                    yield from token_messages(entries)
+                elif time.monotonic() - idle_since >= Config.EVENTS_KEEPALIVE_SECONDS:
+                    idle_since = time.monotonic()
+                    yield ": keepalive\n\n"
+
+                if finished.is_set():
+                    finished.clear()
+                    job = load_job_status(job_id) or job
+                    db.session.remove()
+
+            # Tokens flushed just before the job finished
+            if running:
+                yield from token_messages(read_tokens(job_id, last_id))
+            yield sse_message("status", wait_payload(job_id, job))
+
+    return Response(
+        stream_with_context(relay(job, last_id)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@api.route("/cache/stats")
+@swag_from(cache_stats_spec)
+def cache_stats_view():
+    """Summary cache counters of this process, per tier"""
+    return jsonify(cache_stats()), 200
+
+
+@api.route("/metrics")
+@swag_from(metrics_spec)
+def metrics():
+    """Stage latency histograms, job counters and queue gauges for Prometheus"""
+    return Response(render_metrics(), content_type=CONTENT_TYPE_LATEST)
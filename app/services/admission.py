@@ -0,0 +1,262 @@
+"""
+Admission control for job submissions.
+
+Workers record when they start and finish each job: started jobs are kept
+in a per-priority in-flight set, and finished ones are counted in
+per-priority buckets of BUCKET_SECONDS together with their processing time.
+From these and the depth of the job's dispatch queue, a submission's queue
+wait is estimated as
+
+    wait = (jobs queued + jobs in flight) / recent completion rate
+
+Jobs count as in flight from the moment a worker takes them off the
+dispatch queue until their pipeline finishes, so on the Celery engine the
+backlog waiting in the fetch, extract and summarize queues is work ahead
+too. Submissions whose wait exceeds the SLO of their priority are refused
+with a Retry-After of the time the backlog needs to drain to the SLO.
+Accepted jobs get an estimated completion time. Redis failures admit
+everything.
+"""
+
+from datetime import datetime, timedelta
+from app.config import Config
+from app.models import JobPriority
+from app.services.cache_service import redis_client, async_redis_client
+from app.services.metrics import broker_client
+import logging
+import math
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+BUCKET_SECONDS = 5
+
+PRIORITIES = list(JobPriority)
+
+# Remove a finished job from whichever in-flight set holds it and count it
+# in the completion bucket of that priority. KEYS are the in-flight sets
+# followed by the buckets, in the same priority order.
+FINISH_LUA = """
+local n = #KEYS / 2
+for i = 1, n do
+    if redis.call('zrem', KEYS[i], ARGV[1]) == 1 then
+        redis.call('hincrby', KEYS[n + i], 'count', 1)
+        redis.call('hincrbyfloat', KEYS[n + i], 'ms', ARGV[2])
+        redis.call('expire', KEYS[n + i], ARGV[3])
+        return 1
+    end
+end
+return 0
+"""
+
+_finish_script = redis_client.register_script(FINISH_LUA)
+_async_finish_script = async_redis_client.register_script(FINISH_LUA)
+
+
+def _inflight_key(priority):
+    """Redis sorted set of started, unfinished jobs scored by start time"""
+    return f"admission:inflight:{priority.value}"
+
+
+def _bucket_key(priority, bucket):
+    """Redis hash counting the jobs finished in one bucket of time"""
+    return f"admission:done:{priority.value}:{bucket}"
+
+
+def _slo(priority):
+    if priority == JobPriority.BULK:
+        return Config.ADMISSION_BULK_SLO_SECONDS
+    return Config.ADMISSION_INTERACTIVE_SLO_SECONDS
+
+
+def _finish_args(job_id, processing_time_ms):
+    bucket = int(time.time() // BUCKET_SECONDS)
+    keys = [_inflight_key(p) for p in PRIORITIES]
+    keys += [_bucket_key(p, bucket) for p in PRIORITIES]
+    ttl = Config.ADMISSION_RATE_WINDOW_SECONDS + BUCKET_SECONDS
+    return keys, [job_id, processing_time_ms or 0, ttl]
+
+
+def job_started(job_id, priority):
+    """Count a job as in flight from now until job_finished"""
+    try:
+        redis_client.zadd(_inflight_key(priority), {job_id: time.time()})
+    except Exception as e:
+        logger.error("Tracking start of job %s failed: %s", job_id, str(e))
+
+
+async def ajob_started(job_id, priority):
+    """Async variant of job_started"""
+    try:
+        await async_redis_client.zadd(_inflight_key(priority), {job_id: time.time()})
+    except Exception as e:
+        logger.error("Tracking start of job %s failed: %s", job_id, str(e))
+
+
+def job_finished(job_id, processing_time_ms):
+    """Count a started job as finished; unstarted jobs are ignored"""
+    try:
+        keys, args = _finish_args(job_id, processing_time_ms)
+        _finish_script(keys=keys, args=args)
+    except Exception as e:
+        logger.error("Tracking finish of job %s failed: %s", job_id, str(e))
+
+
+async def ajob_finished(job_id, processing_time_ms):
+    """Async variant of job_finished"""
+    try:
+        keys, args = _finish_args(job_id, processing_time_ms)
+        await _async_finish_script(keys=keys, args=args)
+    except Exception as e:
+        logger.error("Tracking finish of job %s failed: %s", job_id, str(e))
+
+
+class Load:
+    """Queue depth, in-flight jobs and recent service of one priority"""
+
+    def __init__(self, queued, inflight, completed, busy_ms, span):
+        self.queued = queued
+        self.inflight = inflight
+        self.completed = completed
+        self.busy_ms = busy_ms
+        self.span = span
+
+    @property
+    def service_seconds(self):
+        """Mean processing time of recently finished jobs"""
+        if not self.completed:
+            return Config.ADMISSION_DEFAULT_SERVICE_SECONDS
+        return self.busy_ms / self.completed / 1000
+
+    @property
+    def throughput(self):
+        """Jobs per second recently finished, at least the configured floor"""
+        return max(self.completed / self.span, Config.ADMISSION_MIN_SERVICE_RATE)
+
+    def wait_seconds(self, count=1):
+        """Estimated queue wait of the last of count new jobs"""
+        return (self.queued + self.inflight + count - 1) / self.throughput
+
+
+def _dispatch_queue(priority):
+    """Queue new jobs of a priority wait in, and the client holding it"""
+    # Import here to avoid circular import
+    from app.services.worker import priority_queue
+
+    if Config.WORKER_ENGINE == "asyncio":
+        return redis_client, priority_queue(Config.ASYNC_JOB_QUEUE, priority)
+    return broker_client, priority_queue(Config.CELERY_DISPATCH_QUEUE, priority)
+
+
+def read_load(now=None):
+    """Current Load of every priority, read from Redis and the broker"""
+    now = now or time.time()
+    current = int(now // BUCKET_SECONDS)
+    buckets = range(
+        current - Config.ADMISSION_RATE_WINDOW_SECONDS // BUCKET_SECONDS, current + 1
+    )
+
+    pipe = redis_client.pipeline(transaction=False)
+    for priority in PRIORITIES:
+        key = _inflight_key(priority)
+        pipe.zremrangebyscore(key, "-inf", now - Config.ADMISSION_INFLIGHT_MAX_SECONDS)
+        pipe.zcard(key)
+        for bucket in buckets:
+            pipe.hmget(_bucket_key(priority, bucket), "count", "ms")
+    results = iter(pipe.execute())
+
+    loads = {}
+    for priority in PRIORITIES:
+        next(results)
+        inflight = next(results)
+        completed = busy_ms = 0
+        oldest = None
+        for bucket in buckets:
+            count, ms = next(results)
+            if count:
+                completed += int(count)
+                busy_ms += float(ms or 0)
+                if oldest is None:
+                    oldest = bucket
+        # Rates cover the buckets with completions, so a service that just
+        # started is not measured over the whole window, but at least one
+        # bucket, so a burst just after a bucket starts is not a huge rate
+        span = now - oldest * BUCKET_SECONDS if oldest is not None else 0
+        client, queue = _dispatch_queue(priority)
+        queued = client.llen(queue) if client is not None else 0
+        loads[priority] = Load(
+            queued, inflight, completed, busy_ms, max(span, BUCKET_SECONDS)
+        )
+    return loads
+
+
+class Decision:
+    """Outcome of an admission check"""
+
+    def __init__(self, admitted, wait_seconds, service_seconds, retry_after=None):
+        self.admitted = admitted
+        self.wait_seconds = wait_seconds
+        self.retry_after = retry_after
+        self.estimated_completion = datetime.utcnow() + timedelta(
+            seconds=wait_seconds + service_seconds
+        )
+
+
+class AdmissionController:
+    """Admit or refuse submissions from a periodically refreshed Load.
+
+    The Load is read at most every ADMISSION_REFRESH_MS per process. Jobs
+    admitted in between are added to the cached queue depth, so a burst
+    cannot slip in before the next refresh.
+    """
+
+    def __init__(self):
+        self._loads = None
+        self._read_at = 0.0
+        self._lock = threading.Lock()
+
+    def _load(self, priority):
+        now = time.time()
+        with self._lock:
+            if (
+                self._loads is None
+                or now - self._read_at >= Config.ADMISSION_REFRESH_MS / 1000
+            ):
+                self._loads = read_load(now)
+                self._read_at = now
+            return self._loads[priority]
+
+    def admit(self, priority, count=1):
+        """Decision on count new jobs of a priority.
+
+        Returns None, admitting the jobs, if the load cannot be read.
+        """
+        slo = _slo(priority)
+        try:
+            load = self._load(priority)
+        except Exception as e:
+            logger.error("Reading load for admission failed: %s", str(e))
+            return None
+
+        wait = load.wait_seconds(count)
+        if slo > 0 and wait > slo:
+            retry_after = min(
+                max(1, math.ceil(wait - slo)),
+                Config.ADMISSION_MAX_RETRY_AFTER_SECONDS,
+            )
+            logger.warning(
+                "Refused %d %s jobs: estimated wait %.1fs over SLO %ss",
+                count,
+                priority.value,
+                wait,
+                slo,
+            )
+            return Decision(False, wait, load.service_seconds, retry_after)
+
+        with self._lock:
+            load.queued += count
+        return Decision(True, wait, load.service_seconds)
+
+
+controller = AdmissionController()
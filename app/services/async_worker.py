@@ -0,0 +1,435 @@
+"""
+Asyncio worker engine.
+
+Runs many jobs concurrently on one event loop per process instead of one job
+per prefork process. Jobs are taken from a Redis list (Config.ASYNC_JOB_QUEUE),
+or from its bulk counterpart when no interactive job is waiting, and processed
+end to end with an async HTTP client, AsyncOpenAI, async Redis
+and an async SQLAlchemy engine. It reads and writes the same Job rows and
+cache keys as the Celery pipeline, so the two engines are interchangeable.
+
+Run with:
+    python -m app.services.async_worker
+"""
+
+from dotenv import load_dotenv
+
+# Load environment variables before importing Config
+load_dotenv()
+
+from app.config import Config
+from app.services.admission import ajob_finished, ajob_started
+from app.models import Job, JobStatus, ContentType, jobs_filter
+from app.services.content_fetcher import fetch_url_async, extract_text
+from app.services.content_store import aload_content
+from app.services.job_writer import (
+    abuffer_job_states,
+    aflush_all_job_writes,
+    aflush_loop,
+)
+from app.services.summarizer import summarize_async
+from app.services.cache_service import (
+    async_redis_client,
+    aget_cached_summary,
+    aset_cached_summary,
+    arelease_inflight,
+)
+from app.services.url_cache import (
+    aget_url_entry,
+    astore_url_entry,
+    atouch_url_entry,
+    is_fresh,
+)
+from app.services.job_events import apublish_job_events
+from app.services.token_stream import AsyncTokenStreamWriter
+from app.services.llm_budget import aadmit
+from app.services.metrics import afinish_stage_timings, aobserve_job
+from app.services.similarity_index import (
+    afind_similar_summary,
+    aindex_text,
+    text_signature,
+)
+from app.services.status_store import (
+    afinished_status,
+    aset_job_status,
+    aset_many_job_status,
+)
+from app.utils.cache_keys import normalize_text
+from app.utils.helpers import hash_content
+from app.utils.timings import StageTimings, current_timings, recording
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine
+import asyncio
+import httpx
+import logging
+import math
+import os
+import signal
+import socket
+import time
+
+logger = logging.getLogger(__name__)
+
+# Core table behind the Job model, usable without a Flask app context
+jobs_table = Job.__table__
+
+# Seconds to block waiting for a job before re-checking for shutdown
+POLL_TIMEOUT_SECONDS = 1
+
+
+class AsyncWorker:
+    """Consume jobs from Redis and process up to `concurrency` at once"""
+
+    def __init__(self, concurrency=None, consumer=None):
+        self.concurrency = concurrency or Config.ASYNC_WORKER_CONCURRENCY
+        self.consumer = consumer or f"{socket.gethostname()}:{os.getpid()}"
+        self.bulk_queue = f"{Config.ASYNC_JOB_QUEUE}{Config.CELERY_BULK_QUEUE_SUFFIX}"
+        # Claimed jobs of each priority, so leftovers return to their own queue
+        self.processing_queue = f"{Config.ASYNC_JOB_QUEUE}:processing:{self.consumer}"
+        self.bulk_processing_queue = f"{self.bulk_queue}:processing:{self.consumer}"
+
+        # Slots bulk jobs may occupy; the rest stay free for interactive jobs
+        reserved = math.ceil(self.concurrency * Config.LLM_BULK_RESERVE_FRACTION)
+        self.bulk_limit = max(1, self.concurrency - reserved)
+        self.bulk_running = 0
+        self.stopping = asyncio.Event()
+        self.engine = None
+        self.http = None
+
+    async def run(self):
+        """Run the consume loop until stop() is called"""
+        self.engine = create_async_engine(
+            Config.ASYNC_DATABASE_URL,
+            pool_size=Config.ASYNC_DB_POOL_SIZE,
+            pool_pre_ping=True,
+        )
+        self.http = httpx.AsyncClient(
+            timeout=5,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=Config.ASYNC_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=Config.ASYNC_HTTP_MAX_CONNECTIONS,
+                keepalive_expiry=60,
+            ),
+        )
+        slots = asyncio.Semaphore(self.concurrency)
+        tasks = set()
+        flusher = asyncio.create_task(aflush_loop(self.engine, self.stopping))
+
+        logger.info(
+            "Async worker %s started with concurrency %d",
+            self.consumer,
+            self.concurrency,
+        )
+
+        try:
+            await self._requeue_unfinished()
+
+            while not self.stopping.is_set():
+                await slots.acquire()
+
+                job_id, bulk = await self._next_job()
+                if job_id is None:
+                    slots.release()
+                    continue
+
+                task = asyncio.create_task(self._run_job(job_id.decode(), bulk))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                task.add_done_callback(lambda _: slots.release())
+                if bulk:
+                    self.bulk_running += 1
+                    task.add_done_callback(self._bulk_done)
+
+            # Let in-flight jobs finish before closing shared clients
+            if tasks:
+                logger.info("Waiting for %d in-flight jobs", len(tasks))
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            # Write the terminal states still buffered by this process's jobs
+            self.stopping.set()
+            await flusher
+            try:
+                await aflush_all_job_writes(self.engine)
+            except Exception as e:
+                logger.error("Final flush of job writes failed: %s", e)
+            await self.http.aclose()
+            await self.engine.dispose()
+            logger.info("Async worker %s stopped", self.consumer)
+
+    async def _next_job(self):
+        """Claim the next job, interactive before bulk; returns (id, is_bulk)"""
+        job_id = await async_redis_client.lmove(
+            Config.ASYNC_JOB_QUEUE, self.processing_queue, "RIGHT", "LEFT"
+        )
+        if job_id is not None:
+            return job_id, False
+
+        if self.bulk_running < self.bulk_limit:
+            job_id = await async_redis_client.lmove(
+                self.bulk_queue, self.bulk_processing_queue, "RIGHT", "LEFT"
+            )
+            if job_id is not None:
+                return job_id, True
+
+        job_id = await async_redis_client.blmove(
+            Config.ASYNC_JOB_QUEUE,
+            self.processing_queue,
+            POLL_TIMEOUT_SECONDS,
+            "RIGHT",
+            "LEFT",
+        )
+        return job_id, False
+
+    def _bulk_done(self, _):
+        self.bulk_running -= 1
+
+    def stop(self):
+        """Stop taking new jobs; running jobs are allowed to finish"""
+        logger.info("Async worker %s stopping", self.consumer)
+        self.stopping.set()
+
+    async def _requeue_unfinished(self):
+        """Return jobs left over from a previous run of this consumer"""
+        for processing, queue in (
+            (self.processing_queue, Config.ASYNC_JOB_QUEUE),
+            (self.bulk_processing_queue, self.bulk_queue),
+        ):
+            while await async_redis_client.lmove(processing, queue, "RIGHT", "RIGHT"):
+                pass
+
+    async def _run_job(self, job_id, bulk=False):
+        """Process one job and acknowledge it"""
+        try:
+            with recording():
+                await self.process_job(job_id)
+        except Exception as e:
+            logger.exception("Async job %s crashed: %s", job_id, str(e))
+        finally:
+            processing = self.bulk_processing_queue if bulk else self.processing_queue
+            await async_redis_client.lrem(processing, 1, job_id)
+
+    async def process_job(self, job_id):
+        """Process a summarization job on the event loop"""
+        start_time = time.time()
+        logger.info("Starting processing for job: %s", job_id)
+
+        async with self.engine.connect() as conn:
+            row = (
+                await conn.execute(
+                    select(
+                        jobs_table.c.content_hash,
+                        jobs_table.c.content_type,
+                        jobs_table.c.content_id,
+                        jobs_table.c.status,
+                        jobs_table.c.priority,
+                        jobs_table.c.created_at,
+                    ).where(jobs_filter([job_id]))
+                )
+            ).first()
+
+        if not row:
+            logger.error("Job not found: %s", job_id)
+            return
+
+        finished = await afinished_status(job_id, row.status)
+        if finished:
+            logger.info("Job %s already finished: %s", job_id, finished)
+            return
+        await ajob_started(job_id, row.priority)
+
+        # Queue wait runs from submission unless submit marked the hand-off
+        timings = current_timings()
+        if timings is not None:
+            timings.queued_at = row.created_at
+
+        # Check cache first
+        cached = await aget_cached_summary(row.content_hash)
+        if cached:
+            logger.info("Cache hit for job %s, hash: %s", job_id, row.content_hash)
+            await self._finish(
+                job_id,
+                row.content_hash,
+                JobStatus.COMPLETED,
+                cached.decode(),
+                True,
+                start_time,
+            )
+            return
+
+        try:
+            # Intermediate states only go to the status store
+            await aset_job_status(job_id, status=JobStatus.PROCESSING, cached=False)
+            logger.info("Job %s status updated to PROCESSING", job_id)
+
+            # Fetch content if URL, otherwise use text
+            async with self.engine.connect() as conn:
+                content = await aload_content(conn, row.content_id)
+            if row.content_type == ContentType.URL:
+                content = await self._fetch_text(job_id, content)
+            else:
+                logger.info("Using text content for job %s", job_id)
+
+            # Reuse the summary if this text, once normalized, was
+            # summarized before
+            content = normalize_text(content)
+            text_hash = hash_content(content)
+            cached = await aget_cached_summary(text_hash)
+            similarity = None
+            signature = None
+            if not cached:
+                # Reuse the summary of a near-identical text if one is indexed.
+                # Shingling is CPU-bound; keep it off the event loop
+                signature = await asyncio.to_thread(text_signature, content)
+                match = signature and await afind_similar_summary(signature)
+                if match:
+                    cached, similarity = match
+
+            if cached:
+                logger.info("Content unchanged for job %s, reusing summary", job_id)
+                summary = cached.decode()
+            else:
+                # Wait for capacity in the shared provider budget
+                await aadmit(row.priority, content)
+
+                # Generate summary
+                logger.info("Summarizing content for job %s", job_id)
+                stream = None
+                if Config.STREAM_SUMMARIES:
+                    stream = AsyncTokenStreamWriter(job_id)
+                summary = await summarize_async(content, stream)
+                await aset_cached_summary(text_hash, summary)
+                if signature:
+                    await aindex_text(text_hash, signature)
+
+            # URL summaries expire with the fetched content so they are refreshed
+            if row.content_hash != text_hash:
+                logger.info(
+                    "Setting cache for job %s, hash: %s", job_id, row.content_hash
+                )
+                await aset_cached_summary(
+                    row.content_hash, summary, ttl=Config.URL_CONTENT_TTL_SECONDS
+                )
+
+            await self._finish(
+                job_id,
+                row.content_hash,
+                JobStatus.COMPLETED,
+                summary,
+                bool(cached),
+                start_time,
+                similarity,
+            )
+
+        except Exception as e:
+            logger.error("Job %s processing failed: %s", job_id, str(e))
+            await self._finish(
+                job_id, row.content_hash, JobStatus.FAILED, None, False, start_time
+            )
+
+    async def _fetch_text(self, job_id, url):
+        """Return a URL's extracted text, using and revalidating the URL cache"""
+        entry = await aget_url_entry(url)
+        if is_fresh(entry):
+            logger.info("Using fresh cached content for job %s", job_id)
+            return entry["text"]
+
+        logger.info("Fetching content from URL for job %s", job_id)
+        result = await fetch_url_async(
+            self.http,
+            url,
+            etag=entry and entry["etag"],
+            last_modified=entry and entry["last_modified"],
+        )
+
+        if result.status == 304 and entry:
+            logger.info("Content not modified for job %s", job_id)
+            await atouch_url_entry(url)
+            return entry["text"]
+
+        # Parsing is CPU-bound; keep it off the event loop
+        content = await asyncio.to_thread(extract_text, result.body, result.encoding)
+        await astore_url_entry(url, content, result.etag, result.last_modified)
+        return content
+
+    async def _finish(
+        self,
+        job_id,
+        content_hash,
+        status,
+        summary,
+        cached,
+        start_time,
+        similarity=None,
+    ):
+        """Record a terminal state and resolve jobs coalesced onto this one.
+
+        The state is buffered for the batched Postgres flush.
+        """
+        processing_time_ms = int((time.time() - start_time) * 1000)
+        totals = await afinish_stage_timings(
+            job_id, current_timings() or StageTimings()
+        )
+        timings = {**totals, "total": processing_time_ms}
+        await ajob_finished(job_id, processing_time_ms)
+        await abuffer_job_states(
+            self.engine,
+            [job_id],
+            status,
+            summary,
+            cached=cached,
+            similarity=similarity,
+            processing_time_ms=processing_time_ms,
+            timings=timings,
+        )
+        await aobserve_job(status, cached, similarity, timings)
+        await aset_job_status(
+            job_id,
+            status=status,
+            summary=summary,
+            cached=cached,
+            similarity=similarity,
+            processing_time_ms=processing_time_ms,
+        )
+        await apublish_job_events([job_id], status)
+
+        waiter_ids = await arelease_inflight(content_hash, job_id)
+        if waiter_ids:
+            await abuffer_job_states(
+                self.engine,
+                waiter_ids,
+                status,
+                summary,
+                cached=True,
+                similarity=similarity,
+                processing_time_ms=processing_time_ms,
+            )
+            await aset_many_job_status(
+                waiter_ids,
+                status=status,
+                summary=summary,
+                cached=True,
+                similarity=similarity,
+                processing_time_ms=processing_time_ms,
+            )
+            await apublish_job_events(waiter_ids, status)
+            await aobserve_job(status, True, similarity, count=len(waiter_ids))
+            logger.info("Resolved %d waiting jobs from job %s", len(waiter_ids), job_id)
+
+        logger.info("Job %s processing completed with status: %s", job_id, status)
+
+
+async def main():
+    """Run an async worker until SIGINT or SIGTERM"""
+    logging.basicConfig(level=logging.INFO)
+    worker = AsyncWorker()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+
+    await worker.run()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
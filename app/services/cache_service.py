@@ -1,17 +1,203 @@
 import redis
+import redis.asyncio
 from app.config import Config
+from app.utils.cache_keys import summary_namespace
+from app.utils.memory_cache import CacheStats, MemoryCache
+from app.utils.timings import timed
+import json
 import logging
+import os
+import socket
+import threading
+import time
+import zlib
 
 logger = logging.getLogger(__name__)
 
-# Initialize Redis client
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Initialize Redis clients
 redis_client = redis.Redis.from_url(Config.REDIS_URL)
+async_redis_client = redis.asyncio.Redis.from_url(Config.REDIS_URL)
+
+# Prefixes of compressed values in Redis. Summaries are text, which never
+# starts with a NUL byte, so uncompressed values need no marker
+ZLIB_MARKER = b"\x00z"
+ZSTD_MARKER = b"\x00s"
+
+# Seconds to wait before re-subscribing after the listener loses Redis
+RECONNECT_DELAY_SECONDS = 1
+
+# Summaries and chunk summaries go through a per-process L1 in front of
+# Redis (L2). Counters are per process
+local_cache = MemoryCache(Config.CACHE_L1_MAX_BYTES, Config.CACHE_L1_TTL_SECONDS)
+redis_stats = CacheStats("hits", "misses", "errors", "sets", "compressed")
+
+_hostname = socket.gethostname()
+
+
+def cache_stats():
+    """Hit, miss and eviction counters of both cache tiers in this process"""
+    return {"l1": local_cache.info(), "l2": redis_stats.snapshot()}
+
+
+def _compress(value):
+    """Bytes stored in Redis for a value; large values are compressed"""
+    if len(value) < Config.CACHE_COMPRESS_MIN_BYTES:
+        return value
+    if Config.CACHE_COMPRESSION == "zstd" and zstandard is not None:
+        packed = ZSTD_MARKER + zstandard.ZstdCompressor().compress(value)
+    else:
+        packed = ZLIB_MARKER + zlib.compress(value)
+    if len(packed) >= len(value):
+        return value
+    redis_stats.incr("compressed")
+    return packed
+
+
+def _decompress(raw):
+    """Original bytes of a value read from Redis"""
+    if raw.startswith(ZLIB_MARKER):
+        return zlib.decompress(raw[len(ZLIB_MARKER) :])
+    if raw.startswith(ZSTD_MARKER):
+        if zstandard is None:
+            raise ValueError("zstd-compressed value but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(raw[len(ZSTD_MARKER) :])
+    return raw
+
+
+def _origin():
+    """Identifies this process in invalidation messages"""
+    return f"{_hostname}:{os.getpid()}"
+
+
+def _invalidation(key):
+    """Message telling other processes to drop key from their L1"""
+    return json.dumps({"key": key, "origin": _origin()})
+
+
+class InvalidationListener:
+    """Drop L1 entries that another process has overwritten in Redis.
+
+    One subscriber thread per process. The L1 is cleared whenever the
+    subscription is (re)established, since messages published while it
+    was down are lost.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def ensure(self):
+        """Start the subscriber thread for this process if needed"""
+        if not Config.CACHE_INVALIDATION_ENABLED or not local_cache.max_bytes:
+            return
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._listen, name="cache-invalidation", daemon=True
+            )
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def _listen(self):
+        while True:
+            pubsub = None
+            try:
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(Config.CACHE_INVALIDATION_CHANNEL)
+                local_cache.clear()
+                for message in pubsub.listen():
+                    event = json.loads(message["data"])
+                    if event.get("origin") != _origin():
+                        local_cache.delete(event.get("key"))
+            except Exception as e:
+                logger.error("Cache invalidation listener failed: %s", str(e))
+                time.sleep(RECONNECT_DELAY_SECONDS)
+            finally:
+                if pubsub is not None:
+                    pubsub.close()
+
+
+invalidations = InvalidationListener()
+
+
+def _from_redis(key, raw):
+    """Count an L2 lookup and keep a hit in L1"""
+    if raw is None:
+        redis_stats.incr("misses")
+        return None
+    redis_stats.incr("hits")
+    value = _decompress(raw)
+    invalidations.ensure()
+    local_cache.set(key, value)
+    return value
+
+
+def _tiered_get(key):
+    """Value from L1, else from Redis"""
+    with timed("cache_get"):
+        value = local_cache.get(key)
+        if value is not None:
+            return value
+        return _from_redis(key, redis_client.get(key))
+
+
+def _tiered_set(key, value, ttl):
+    """Write a value to Redis and L1, invalidating other processes' L1"""
+    if isinstance(value, str):
+        value = value.encode()
+    with timed("cache_set"):
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.set(key, _compress(value), ex=ttl)
+        if Config.CACHE_INVALIDATION_ENABLED:
+            pipe.publish(Config.CACHE_INVALIDATION_CHANNEL, _invalidation(key))
+        pipe.execute()
+    redis_stats.incr("sets")
+    invalidations.ensure()
+    local_cache.set(key, value, ttl)
+
+
+async def _atiered_get(key):
+    """Async variant of _tiered_get"""
+    with timed("cache_get"):
+        value = local_cache.get(key)
+        if value is not None:
+            return value
+        return _from_redis(key, await async_redis_client.get(key))
+
+
+async def _atiered_set(key, value, ttl):
+    """Async variant of _tiered_set"""
+    if isinstance(value, str):
+        value = value.encode()
+    with timed("cache_set"):
+        pipe = async_redis_client.pipeline(transaction=False)
+        pipe.set(key, _compress(value), ex=ttl)
+        if Config.CACHE_INVALIDATION_ENABLED:
+            pipe.publish(Config.CACHE_INVALIDATION_CHANNEL, _invalidation(key))
+        await pipe.execute()
+    redis_stats.incr("sets")
+    invalidations.ensure()
+    local_cache.set(key, value, ttl)
+
+
+def _summary_key(content_hash):
+    """Redis key for a summary under the current model and prompt version"""
+    return f"summary:{summary_namespace()}:{content_hash}"
 
 
 def get_cached_summary(content_hash):
-    """Retrieve cached summary from Redis by content hash"""
+    """Retrieve cached summary by content hash, from memory or Redis"""
     try:
-        result = redis_client.get(content_hash)
+        result = _tiered_get(_summary_key(content_hash))
 
         if result:
             logger.info("Cache hit for hash: %s", content_hash)
@@ -20,14 +206,428 @@ def get_cached_summary(content_hash):
 
         return result
     except Exception as e:
+        redis_stats.incr("errors")
         logger.error("Cache get failed for hash %s: %s", content_hash, str(e))
         return None
 
 
-def set_cached_summary(content_hash, summary):
-    """Store summary in Redis cache with content hash as key"""
+def get_many_cached_summaries(content_hashes):
+    """Cached summaries for several hashes; L1 misses are read with one MGET.
+
+    None for misses.
+    """
+    if not content_hashes:
+        return []
     try:
-        redis_client.set(content_hash, summary)
+        keys = [_summary_key(h) for h in content_hashes]
+        results = [local_cache.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            with timed("cache_get"):
+                raw = redis_client.mget([keys[i] for i in missing])
+            for i, value in zip(missing, raw):
+                results[i] = _from_redis(keys[i], value)
+        logger.info(
+            "Cache hits for %d of %d hashes",
+            sum(1 for r in results if r),
+            len(content_hashes),
+        )
+        return results
+    except Exception as e:
+        redis_stats.incr("errors")
+        logger.error("Cache get failed for %d hashes: %s", len(content_hashes), e)
+        return [None] * len(content_hashes)
+
+
+def set_cached_summary(content_hash, summary, ttl=None):
+    """Store summary in Redis cache with content hash as key.
+
+    Kept for SUMMARY_CACHE_TTL_SECONDS unless a shorter ttl is given.
+    """
+    try:
+        _tiered_set(
+            _summary_key(content_hash),
+            summary,
+            ttl or Config.SUMMARY_CACHE_TTL_SECONDS,
+        )
         logger.info("Cache set for hash: %s", content_hash)
     except Exception as e:
+        redis_stats.incr("errors")
         logger.error("Cache set failed for hash %s: %s", content_hash, str(e))
+
+
+def _chunk_key(chunk_hash):
+    """Redis key for the summary of one chunk of a long document"""
+    return f"chunk:{summary_namespace()}:{chunk_hash}"
+
+
+def get_cached_chunk_summary(chunk_hash):
+    """Retrieve a cached chunk summary, from memory or Redis"""
+    try:
+        return _tiered_get(_chunk_key(chunk_hash))
+    except Exception as e:
+        redis_stats.incr("errors")
+        logger.error("Chunk cache get failed for hash %s: %s", chunk_hash, str(e))
+        return None
+
+
+def set_cached_chunk_summary(chunk_hash, summary):
+    """Store a chunk summary so unchanged chunks are not re-summarized"""
+    try:
+        _tiered_set(_chunk_key(chunk_hash), summary, Config.CHUNK_SUMMARY_TTL_SECONDS)
+    except Exception as e:
+        redis_stats.incr("errors")
+        logger.error("Chunk cache set failed for hash %s: %s", chunk_hash, str(e))
+
+
+# Atomically release an in-flight marker and collect the jobs waiting on it.
+# Waiters are also drained when the marker has already expired so they are
+# never stranded.
+RELEASE_INFLIGHT_LUA = """
+local owner = redis.call('get', KEYS[1])
+if owner and owner ~= ARGV[1] then
+    return {}
+end
+redis.call('del', KEYS[1])
+local waiters = redis.call('lrange', KEYS[2], 0, -1)
+redis.call('del', KEYS[2])
+return waiters
+"""
+_release_inflight_script = redis_client.register_script(RELEASE_INFLIGHT_LUA)
+_async_release_inflight_script = async_redis_client.register_script(
+    RELEASE_INFLIGHT_LUA
+)
+
+# Add a waiter only while the in-flight marker exists, and note the hash as
+# coalescing so recovery can find waiters whose leader never finished
+ADD_WAITER_LUA = """
+if redis.call('exists', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('rpush', KEYS[2], ARGV[1])
+redis.call('expire', KEYS[2], ARGV[2])
+redis.call('zadd', KEYS[3], ARGV[3], ARGV[4])
+return 1
+"""
+_add_waiter_script = redis_client.register_script(ADD_WAITER_LUA)
+
+# Drop an in-flight marker if job ARGV[1] still holds it, keeping its waiters
+ABANDON_INFLIGHT_LUA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    redis.call('del', KEYS[1])
+    return 1
+end
+return 0
+"""
+_abandon_inflight_script = redis_client.register_script(ABANDON_INFLIGHT_LUA)
+
+# Make the first waiter of a hash whose marker is gone the new leader; the
+# other waiters keep waiting on it. Returns the waiters, leader first.
+ADOPT_WAITERS_LUA = """
+if redis.call('exists', KEYS[1]) == 1 then
+    return {}
+end
+local waiters = redis.call('lrange', KEYS[2], 0, -1)
+redis.call('del', KEYS[2])
+redis.call('zrem', KEYS[3], ARGV[1])
+if #waiters > 0 then
+    redis.call('set', KEYS[1], waiters[1], 'EX', ARGV[2])
+end
+if #waiters > 1 then
+    redis.call('rpush', KEYS[2], unpack(waiters, 2))
+    redis.call('expire', KEYS[2], ARGV[3])
+    redis.call('zadd', KEYS[3], ARGV[4], ARGV[1])
+end
+return waiters
+"""
+_adopt_waiters_script = redis_client.register_script(ADOPT_WAITERS_LUA)
+
+# Sorted set of hashes with waiters, scored by when the last one was added
+COALESCING_KEY = "inflight:coalescing"
+
+
+def _inflight_key(content_hash):
+    """Redis key marking a summarization in progress for a content hash"""
+    return f"inflight:{content_hash}"
+
+
+def _waiters_key(content_hash):
+    """Redis key listing jobs waiting on an in-flight summarization"""
+    return f"inflight:{content_hash}:waiters"
+
+
+def _waiter_args(content_hash, job_id):
+    """Keys and args of ADD_WAITER_LUA.
+
+    Waiters outlive the marker, so those of a leader that died are still
+    there when recover_inflight_waiters finds the marker expired.
+    """
+    keys = [_inflight_key(content_hash), _waiters_key(content_hash), COALESCING_KEY]
+    return keys, [job_id, 2 * Config.INFLIGHT_TTL_SECONDS, time.time(), content_hash]
+
+
+def claim_inflight(content_hash, job_id):
+    """Mark job_id as the single job summarizing content_hash.
+
+    Returns True if the claim succeeded, False if another job already holds it.
+    """
+    try:
+        claimed = redis_client.set(
+            _inflight_key(content_hash),
+            job_id,
+            nx=True,
+            ex=Config.INFLIGHT_TTL_SECONDS,
+        )
+        if claimed:
+            logger.info("Job %s claimed in-flight hash: %s", job_id, content_hash)
+        return bool(claimed)
+    except Exception as e:
+        logger.error("In-flight claim failed for hash %s: %s", content_hash, str(e))
+        # Behave as the leader so the job is still processed
+        return True
+
+
+def add_inflight_waiter(content_hash, job_id):
+    """Register job_id to receive the result of an in-flight summarization.
+
+    Returns True if the job will be resolved by the in-flight leader, False if
+    the leader already finished and the caller must process the job itself.
+    """
+    try:
+        keys, args = _waiter_args(content_hash, job_id)
+        leader_active = _add_waiter_script(keys=keys, args=args)
+
+        if leader_active:
+            logger.info("Job %s waiting on in-flight hash: %s", job_id, content_hash)
+        return bool(leader_active)
+    except Exception as e:
+        logger.error("In-flight wait failed for hash %s: %s", content_hash, str(e))
+        return False
+
+
+def claim_many_inflight(claims):
+    """Claim in-flight markers for (content_hash, job_id) pairs in one round trip.
+
+    Returns whether each claim succeeded, in order.
+    """
+    if not claims:
+        return []
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for content_hash, job_id in claims:
+            pipe.set(
+                _inflight_key(content_hash),
+                job_id,
+                nx=True,
+                ex=Config.INFLIGHT_TTL_SECONDS,
+            )
+        return [bool(claimed) for claimed in pipe.execute()]
+    except Exception as e:
+        logger.error("In-flight claim failed for %d hashes: %s", len(claims), e)
+        # Behave as the leaders so the jobs are still processed
+        return [True] * len(claims)
+
+
+def add_many_inflight_waiters(claims):
+    """Register waiters for (content_hash, job_id) pairs in one round trip.
+
+    Returns, in order, whether each job will be resolved by an in-flight
+    leader (see add_inflight_waiter).
+    """
+    if not claims:
+        return []
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for content_hash, job_id in claims:
+            keys, args = _waiter_args(content_hash, job_id)
+            _add_waiter_script(keys=keys, args=args, client=pipe)
+        return [bool(active) for active in pipe.execute()]
+    except Exception as e:
+        logger.error("In-flight wait failed for %d hashes: %s", len(claims), e)
+        return [False] * len(claims)
+
+
+def abandon_many_inflight(claims):
+    """Drop the markers of (content_hash, job_id) leaders that were not queued.
+
+    Their waiters are left for recover_inflight_waiters.
+    """
+    if not claims:
+        return
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for content_hash, job_id in claims:
+            _abandon_inflight_script(
+                keys=[_inflight_key(content_hash)], args=[job_id], client=pipe
+            )
+        pipe.execute()
+    except Exception as e:
+        logger.error("In-flight abandon failed for %d hashes: %s", len(claims), e)
+
+
+def abandon_inflight(content_hash, job_id):
+    """Drop the marker of a leader that was not queued"""
+    abandon_many_inflight([(content_hash, job_id)])
+
+
+def adopt_stranded_waiters():
+    """New leaders for waiters whose leader never released its marker.
+
+    A leader that was not queued or whose worker died leaves its waiters
+    behind once the marker expires. The first of them becomes the leader
+    of the rest. Returns the IDs of the new leaders, which must be queued.
+    """
+    leaders = []
+    for content_hash in redis_client.zrange(COALESCING_KEY, 0, -1):
+        content_hash = content_hash.decode()
+        waiters = _adopt_waiters_script(
+            keys=[
+                _inflight_key(content_hash),
+                _waiters_key(content_hash),
+                COALESCING_KEY,
+            ],
+            args=[
+                content_hash,
+                Config.INFLIGHT_TTL_SECONDS,
+                2 * Config.INFLIGHT_TTL_SECONDS,
+                time.time(),
+            ],
+        )
+        if waiters:
+            leaders.append(waiters[0].decode())
+            logger.warning(
+                "Job %s adopted %d stranded waiters of hash %s",
+                leaders[-1],
+                len(waiters) - 1,
+                content_hash,
+            )
+    return leaders
+
+
+def release_inflight(content_hash, job_id):
+    """Release the in-flight marker held by job_id and return waiting job IDs"""
+    try:
+        waiters = _release_inflight_script(
+            keys=[_inflight_key(content_hash), _waiters_key(content_hash)],
+            args=[job_id],
+        )
+        waiter_ids = [w.decode() for w in waiters if w.decode() != job_id]
+        logger.info(
+            "Released in-flight hash %s with %d waiters", content_hash, len(waiter_ids)
+        )
+        return waiter_ids
+    except Exception as e:
+        logger.error("In-flight release failed for hash %s: %s", content_hash, str(e))
+        return []
+
+
+def _stage_key(job_id, stage):
+    """Redis key holding a pipeline stage's output for a job"""
+    return f"stage:{job_id}:{stage}"
+
+
+def set_stage_payload(job_id, stage, payload):
+    """Hand a pipeline stage's output to the next stage through Redis"""
+    redis_client.set(
+        _stage_key(job_id, stage), payload, ex=Config.STAGE_PAYLOAD_TTL_SECONDS
+    )
+    logger.info("Stored %s payload for job %s", stage, job_id)
+
+
+def get_stage_payload(job_id, stage, required=True):
+    """Read a pipeline stage's output, raising if required and missing"""
+    payload = redis_client.get(_stage_key(job_id, stage))
+    if payload is None and required:
+        raise LookupError(f"Missing {stage} payload for job {job_id}")
+    return payload
+
+
+def clear_stage_payloads(job_id, *stages):
+    """Delete intermediate pipeline output for a job"""
+    try:
+        redis_client.delete(*[_stage_key(job_id, stage) for stage in stages])
+    except Exception as e:
+        logger.error("Stage cleanup failed for job %s: %s", job_id, str(e))
+
+
+def enqueue_async_job(job_id, queue=None):
+    """Push a job onto the queue consumed by the asyncio worker engine"""
+    redis_client.lpush(queue or Config.ASYNC_JOB_QUEUE, job_id)
+    logger.info("Queued job %s for the asyncio worker", job_id)
+
+
+def enqueue_async_jobs(job_ids, queue=None):
+    """Push several jobs onto the asyncio worker queue in one command"""
+    if not job_ids:
+        return
+    redis_client.lpush(queue or Config.ASYNC_JOB_QUEUE, *job_ids)
+    logger.info("Queued %d jobs for the asyncio worker", len(job_ids))
+
+
+async def aget_cached_summary(content_hash):
+    """Async variant of get_cached_summary"""
+    try:
+        result = await _atiered_get(_summary_key(content_hash))
+
+        if result:
+            logger.info("Cache hit for hash: %s", content_hash)
+        else:
+            logger.info("Cache miss for hash: %s", content_hash)
+
+        return result
+    except Exception as e:
+        redis_stats.incr("errors")
+        logger.error("Cache get failed for hash %s: %s", content_hash, str(e))
+        return None
+
+
+async def aset_cached_summary(content_hash, summary, ttl=None):
+    """Async variant of set_cached_summary"""
+    try:
+        await _atiered_set(
+            _summary_key(content_hash),
+            summary,
+            ttl or Config.SUMMARY_CACHE_TTL_SECONDS,
+        )
+        logger.info("Cache set for hash: %s", content_hash)
+    except Exception as e:
+        redis_stats.incr("errors")
+        logger.error("Cache set failed for hash %s: %s", content_hash, str(e))
+
+
+async def arelease_inflight(content_hash, job_id):
+    """Async variant of release_inflight"""
+    try:
+        waiters = await _async_release_inflight_script(
+            keys=[_inflight_key(content_hash), _waiters_key(content_hash)],
+            args=[job_id],
+        )
+        waiter_ids = [w.decode() for w in waiters if w.decode() != job_id]
+        logger.info(
+            "Released in-flight hash %s with %d waiters", content_hash, len(waiter_ids)
+        )
+        return waiter_ids
+    except Exception as e:
+        logger.error("In-flight release failed for hash %s: %s", content_hash, str(e))
+        return []
+
+
+async def aget_cached_chunk_summary(chunk_hash):
+    """Async variant of get_cached_chunk_summary"""
+    try:
+        return await _atiered_get(_chunk_key(chunk_hash))
+    except Exception as e:
+        redis_stats.incr("errors")
+        logger.error("Chunk cache get failed for hash %s: %s", chunk_hash, str(e))
+        return None
+
+
+async def aset_cached_chunk_summary(chunk_hash, summary):
+    """Async variant of set_cached_chunk_summary"""
+    try:
+        await _atiered_set(
+            _chunk_key(chunk_hash), summary, Config.CHUNK_SUMMARY_TTL_SECONDS
+        )
+    except Exception as e:
+        redis_stats.incr("errors")
+        logger.error("Chunk cache set failed for hash %s: %s", chunk_hash, str(e))
@@ -1,45 +1,175 @@
+import httpx
 import requests
-from bs4 import BeautifulSoup
+from app.config import Config
+from app.services.fetch_client import get_session, host_slot, ahost_slot
+from app.services.html_extractor import create_extractor, known_encoding
 from app.utils.helpers import generic_retry
+from app.utils.timings import timed
+from collections import namedtuple
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
-# Limit content length to avoid excessive data
-MAX_CONTENT_LENGTH = 10000
+# Limit content length to avoid excessive data; long documents are
+# summarized in chunks rather than truncated to their introduction
+MAX_CONTENT_LENGTH = Config.MAX_CONTENT_LENGTH
 
+# Hard cap on bytes read from a response body
+MAX_FETCH_BYTES = Config.MAX_FETCH_BYTES
 
-@generic_retry()
-def fetch_url_content(url: str) -> str:
-    """Fetch and extract text content from a URL"""
+# Size of each block read from the network and fed to the parser
+READ_CHUNK_SIZE = 64 * 1024
+
+# Outcome of a fetch: status 304 means the cached copy is still valid
+FetchResult = namedtuple(
+    "FetchResult", ["status", "body", "etag", "last_modified", "encoding"]
+)
+
+_header_charset_re = re.compile(r"charset=[\"']?([\w-]+)", re.IGNORECASE)
+
+
+def _header_encoding(content_type):
+    """Return the charset declared in a Content-Type header, if known.
+
+    Charsets Python has no codec for are dropped, so the document's own
+    declaration is sniffed instead.
+    """
+    match = _header_charset_re.search(content_type or "")
+    return known_encoding(match.group(1)) if match else None
+
+
+def _conditional_headers(etag=None, last_modified=None):
+    """Request headers for revalidating a previously fetched page"""
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    return headers
+
+
+def _stream_url(url, headers=None):
+    """Stream a URL's body, reading at most MAX_FETCH_BYTES"""
     logger.info("Fetching content from URL: %s", url)
 
     try:
-        resp = requests.get(url, timeout=5)
-        resp.raise_for_status()
-        logger.info(
-            "Successfully fetched content from URL: %s, status: %d",
-            url,
-            resp.status_code,
-        )
-
-        # Parse HTML and extract text
-        soup = BeautifulSoup(resp.content, "html.parser")
-        content = soup.get_text(separator="\n", strip=True)
-
-        # Truncate content to max length
-        truncated_content = content[:MAX_CONTENT_LENGTH]
-        logger.info(
-            "Extracted content length: %d (truncated to %d)",
-            len(content),
-            len(truncated_content),
-        )
-
-        return truncated_content
+        with host_slot(url), get_session().get(
+            url, timeout=5, stream=True, headers=headers
+        ) as resp:
+            resp.raise_for_status()
+            logger.info(
+                "Successfully fetched content from URL: %s, status: %d",
+                url,
+                resp.status_code,
+            )
+
+            encoding = _header_encoding(resp.headers.get("Content-Type"))
+            result = FetchResult(
+                status=resp.status_code,
+                body=b"",
+                etag=resp.headers.get("ETag"),
+                last_modified=resp.headers.get("Last-Modified"),
+                encoding=encoding,
+            )
+            if resp.status_code == 304:
+                return result
+
+            body = []
+            size = 0
+            for chunk in resp.iter_content(READ_CHUNK_SIZE):
+                body.append(chunk[: MAX_FETCH_BYTES - size])
+                size += len(body[-1])
+                if size >= MAX_FETCH_BYTES:
+                    logger.info("Response from %s capped at %d bytes", url, size)
+                    break
+
+            return result._replace(body=b"".join(body))
 
     except requests.RequestException as e:
         logger.error("Failed to fetch content from URL %s: %s", url, str(e))
         raise
+
+
+@generic_retry()
+def fetch_url_conditional(url: str, etag=None, last_modified=None) -> FetchResult:
+    """Fetch a URL, revalidating with If-None-Match / If-Modified-Since.
+
+    A 304 response comes back with status 304 and an empty body.
+    """
+    with timed("fetch"):
+        return _stream_url(url, headers=_conditional_headers(etag, last_modified))
+
+
+@generic_retry()
+async def fetch_url_async(
+    client: httpx.AsyncClient, url: str, etag=None, last_modified=None
+) -> FetchResult:
+    """Fetch a URL using a pooled async client, revalidating if validators given"""
+    logger.info("Fetching content from URL: %s", url)
+
+    try:
+        with timed("fetch"):
+            async with ahost_slot(url), client.stream(
+                "GET", url, headers=_conditional_headers(etag, last_modified)
+            ) as resp:
+                # httpx raises for every non-2xx status, 304 included
+                if resp.status_code != 304:
+                    resp.raise_for_status()
+                logger.info(
+                    "Successfully fetched content from URL: %s, status: %d",
+                    url,
+                    resp.status_code,
+                )
+
+                result = FetchResult(
+                    status=resp.status_code,
+                    body=b"",
+                    etag=resp.headers.get("ETag"),
+                    last_modified=resp.headers.get("Last-Modified"),
+                    encoding=_header_encoding(resp.headers.get("Content-Type")),
+                )
+                if resp.status_code == 304:
+                    return result
+
+                body = []
+                size = 0
+                async for chunk in resp.aiter_bytes(READ_CHUNK_SIZE):
+                    body.append(chunk[: MAX_FETCH_BYTES - size])
+                    size += len(body[-1])
+                    if size >= MAX_FETCH_BYTES:
+                        logger.info("Response from %s capped at %d bytes", url, size)
+                        break
+                return result._replace(body=b"".join(body))
+
+    except httpx.HTTPError as e:
+        logger.error("Failed to fetch content from URL %s: %s", url, str(e))
+        raise
+
+
+def extract_text(html: bytes, encoding=None) -> str:
+    """Extract visible text from an HTML document.
+
+    The document is parsed incrementally, script/style/nav content is
+    skipped, and parsing stops once MAX_CONTENT_LENGTH characters of text
+    have been collected.
+    """
+    try:
+        with timed("extract"):
+            extractor = create_extractor(
+                Config.HTML_PARSER, MAX_CONTENT_LENGTH, encoding
+            )
+            for start in range(0, len(html), READ_CHUNK_SIZE):
+                extractor.feed(html[start : start + READ_CHUNK_SIZE])
+                if extractor.done:
+                    break
+
+            content = extractor.close()
+            logger.info(
+                "Extracted content length: %d from %d bytes", len(content), len(html)
+            )
+            return content
+
     except Exception as e:
-        logger.error("Unexpected error processing content from URL %s: %s", url, str(e))
+        logger.error("Unexpected error extracting content: %s", str(e))
         raise
@@ -0,0 +1,111 @@
+"""
+Content-addressed storage of submitted texts and summaries.
+
+Jobs reference rows of the contents and summaries tables by the SHA256 of
+the text, so identical submissions and shared summaries are stored once.
+Rows are inserted with ON CONFLICT DO NOTHING, so storing a text that is
+already there costs one no-op INSERT. Texts above a size threshold are
+zlib-compressed; rows without the marker are plain UTF-8, which is how
+rows migrated from the old Job columns are stored.
+"""
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from app.config import Config
+from app.models import db, Content, Summary
+from app.utils.helpers import hash_content
+import zlib
+
+ZLIB_MARKER = b"\x00z"
+
+contents_table = Content.__table__
+summaries_table = Summary.__table__
+
+
+def compress_text(text):
+    """Bytes stored for a text"""
+    raw = text.encode()
+    if len(raw) < Config.CONTENT_COMPRESS_MIN_BYTES:
+        return raw
+    packed = ZLIB_MARKER + zlib.compress(raw, Config.CONTENT_COMPRESSION_LEVEL)
+    return packed if len(packed) < len(raw) else raw
+
+
+def decompress_text(data):
+    """Text of stored bytes, or None for None"""
+    if data is None:
+        return None
+    data = bytes(data)
+    if data.startswith(ZLIB_MARKER):
+        data = zlib.decompress(data[len(ZLIB_MARKER) :])
+    return data.decode()
+
+
+def _insert_ignore(table, dialect):
+    """INSERT that skips rows whose hash is already stored"""
+    module = postgresql if dialect == "postgresql" else sqlite
+    return module.insert(table).on_conflict_do_nothing(index_elements=["hash"])
+
+
+def _rows(texts):
+    """Hash of each text, and one row per distinct text"""
+    hashes = [hash_content(text) for text in texts]
+    rows = {}
+    for key, text in zip(hashes, texts):
+        if key not in rows:
+            rows[key] = {"hash": key, "data": compress_text(text)}
+    return hashes, list(rows.values())
+
+
+def _store(table, texts):
+    hashes, rows = _rows(texts)
+    if rows:
+        dialect = db.session.get_bind().dialect.name
+        db.session.execute(_insert_ignore(table, dialect), rows)
+    return hashes
+
+
+def store_contents(texts):
+    """Add submitted texts to the current transaction; returns their ids"""
+    return _store(contents_table, texts)
+
+
+def store_content(text):
+    """Add one submitted text to the current transaction; returns its id"""
+    return store_contents([text])[0]
+
+
+def store_summary(summary):
+    """Add a summary to the current transaction; returns its id"""
+    return _store(summaries_table, [summary])[0]
+
+
+def store_summaries(summaries):
+    """Add several summaries to the current transaction; returns their ids"""
+    return _store(summaries_table, summaries)
+
+
+def load_content(content_id):
+    """Submitted text by id, or None if missing"""
+    data = db.session.execute(
+        select(contents_table.c.data).where(contents_table.c.hash == content_id)
+    ).scalar()
+    return decompress_text(data)
+
+
+async def astore_summaries(conn, summaries):
+    """Async variant of store_summaries, on an async engine connection"""
+    hashes, rows = _rows(summaries)
+    if rows:
+        await conn.execute(_insert_ignore(summaries_table, conn.dialect.name), rows)
+    return hashes
+
+
+async def aload_content(conn, content_id):
+    """Async variant of load_content, on an async engine connection"""
+    data = (
+        await conn.execute(
+            select(contents_table.c.data).where(contents_table.c.hash == content_id)
+        )
+    ).scalar()
+    return decompress_text(data)
@@ -0,0 +1,253 @@
+from contextlib import contextmanager, asynccontextmanager
+from requests.adapters import HTTPAdapter
+from app.config import Config
+from app.services.cache_service import redis_client, async_redis_client
+import asyncio
+import logging
+import os
+import requests
+import time
+import urllib.parse
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Seconds between attempts to get a free per-host connection slot
+SLOT_POLL_SECONDS = 0.05
+
+# Token bucket per host, shared by every worker. Uses the Redis server clock
+# so workers on different machines agree. Returns the seconds to wait before
+# a token is available (0 when one was taken).
+TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('time')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('hmget', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('hset', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('expire', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+# Counting semaphore per host with leases, so slots held by a crashed worker
+# expire. Returns 1 if the slot was acquired.
+HOST_SLOT_LUA = """
+local limit = tonumber(ARGV[1])
+local lease = tonumber(ARGV[2])
+local clock = redis.call('time')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+redis.call('zremrangebyscore', KEYS[1], '-inf', now - lease)
+if redis.call('zcard', KEYS[1]) < limit then
+    redis.call('zadd', KEYS[1], now, ARGV[3])
+    redis.call('expire', KEYS[1], math.ceil(lease))
+    return 1
+end
+return 0
+"""
+
+_token_bucket_script = redis_client.register_script(TOKEN_BUCKET_LUA)
+_host_slot_script = redis_client.register_script(HOST_SLOT_LUA)
+_async_token_bucket_script = async_redis_client.register_script(TOKEN_BUCKET_LUA)
+_async_host_slot_script = async_redis_client.register_script(HOST_SLOT_LUA)
+
+# Per-process HTTP session; rebuilt after fork so pools are never shared
+_session = None
+_session_pid = None
+
+
+class HostBusyError(Exception):
+    """Raised when a host's rate or concurrency limit cannot be met in time.
+
+    retry_after is the wait the rate limit asked for, if known.
+    """
+
+    retryable = True
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def get_session():
+    """Return this process's pooled keep-alive session"""
+    global _session, _session_pid
+
+    if _session is None or _session_pid != os.getpid():
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=Config.FETCH_POOL_HOSTS,
+            pool_maxsize=Config.FETCH_POOL_SIZE_PER_HOST,
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _session = session
+        _session_pid = os.getpid()
+        logger.info("Created fetch session for process %d", _session_pid)
+
+    return _session
+
+
+def host_of(url):
+    """Key used for per-host limits"""
+    return urllib.parse.urlparse(url).netloc.lower()
+
+
+def _rate_key(host):
+    """Redis key of a host's token bucket"""
+    return f"fetch:rate:{host}"
+
+
+def _slots_key(host):
+    """Redis key of a host's concurrency slots"""
+    return f"fetch:slots:{host}"
+
+
+def _rate_limited():
+    """Whether a per-host request rate is configured"""
+    return Config.FETCH_HOST_RATE > 0
+
+
+def _concurrency_limited():
+    """Whether a per-host concurrency limit is configured"""
+    return Config.FETCH_HOST_CONCURRENCY > 0
+
+
+def _acquire_host(host, token):
+    """Wait briefly for a rate-limit token and a concurrency slot for a host.
+
+    Sync callers run in a Celery worker slot, so they wait in-process for at
+    most RETRY_INLINE_MAX_SECONDS. Longer waits raise HostBusyError for the
+    task to be rescheduled instead.
+
+    Returns True once a slot is held, or False if no slot is needed: when
+    concurrency is unlimited, or when Redis is unavailable, in which case
+    the fetch proceeds unthrottled rather than failing.
+    """
+    deadline = time.monotonic() + Config.RETRY_INLINE_MAX_SECONDS
+
+    try:
+        while _rate_limited():
+            wait = float(
+                _token_bucket_script(
+                    keys=[_rate_key(host)],
+                    args=[Config.FETCH_HOST_RATE, Config.FETCH_HOST_BURST],
+                )
+            )
+            if not wait:
+                break
+            if time.monotonic() + wait > deadline:
+                raise HostBusyError(
+                    f"Rate limit for {host} not met in time", retry_after=wait
+                )
+            time.sleep(wait)
+
+        if not _concurrency_limited():
+            return False
+        while not _host_slot_script(
+            keys=[_slots_key(host)],
+            args=[
+                Config.FETCH_HOST_CONCURRENCY,
+                Config.FETCH_SLOT_LEASE_SECONDS,
+                token,
+            ],
+        ):
+            if time.monotonic() > deadline:
+                raise HostBusyError(f"No free connection slot for {host}")
+            time.sleep(SLOT_POLL_SECONDS)
+
+        return True
+    except HostBusyError:
+        raise
+    except Exception as e:
+        logger.error("Host limiter unavailable for %s: %s", host, str(e))
+        return False
+
+
+async def _aacquire_host(host, token):
+    """Async variant of _acquire_host.
+
+    Waiting does not hold up other jobs on the event loop, so this waits up
+    to FETCH_SLOT_WAIT_SECONDS.
+    """
+    deadline = time.monotonic() + Config.FETCH_SLOT_WAIT_SECONDS
+
+    try:
+        while _rate_limited():
+            wait = float(
+                await _async_token_bucket_script(
+                    keys=[_rate_key(host)],
+                    args=[Config.FETCH_HOST_RATE, Config.FETCH_HOST_BURST],
+                )
+            )
+            if not wait:
+                break
+            if time.monotonic() + wait > deadline:
+                raise HostBusyError(f"Rate limit for {host} not met in time")
+            await asyncio.sleep(wait)
+
+        if not _concurrency_limited():
+            return False
+        while not await _async_host_slot_script(
+            keys=[_slots_key(host)],
+            args=[
+                Config.FETCH_HOST_CONCURRENCY,
+                Config.FETCH_SLOT_LEASE_SECONDS,
+                token,
+            ],
+        ):
+            if time.monotonic() > deadline:
+                raise HostBusyError(f"No free connection slot for {host}")
+            await asyncio.sleep(SLOT_POLL_SECONDS)
+
+        return True
+    except HostBusyError:
+        raise
+    except Exception as e:
+        logger.error("Host limiter unavailable for %s: %s", host, str(e))
+        return False
+
+
+@contextmanager
+def host_slot(url):
+    """Hold a rate-limited concurrency slot for the URL's host.
+
+    Limits are shared across all workers through Redis.
+    """
+    host = host_of(url)
+    token = str(uuid.uuid4())
+    held = _acquire_host(host, token)
+
+    try:
+        yield
+    finally:
+        if held:
+            try:
+                redis_client.zrem(_slots_key(host), token)
+            except Exception as e:
+                logger.error("Releasing slot for %s failed: %s", host, str(e))
+
+
+@asynccontextmanager
+async def ahost_slot(url):
+    """Async variant of host_slot"""
+    host = host_of(url)
+    token = str(uuid.uuid4())
+    held = await _aacquire_host(host, token)
+
+    try:
+        yield
+    finally:
+        if held:
+            try:
+                await async_redis_client.zrem(_slots_key(host), token)
+            except Exception as e:
+                logger.error("Releasing slot for %s failed: %s", host, str(e))
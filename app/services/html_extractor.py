@@ -0,0 +1,188 @@
+from html.parser import HTMLParser
+import codecs
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Elements whose contents are never visible article text
+SKIP_TAGS = frozenset(
+    {"script", "style", "noscript", "template", "svg", "nav", "iframe"}
+)
+
+# Elements that never have a closing tag and so never change skip depth
+VOID_TAGS = frozenset(
+    {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta"}
+)
+
+# How far into a document to look for a <meta charset> declaration
+CHARSET_SNIFF_BYTES = 2048
+_charset_re = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.IGNORECASE)
+
+
+def known_encoding(encoding):
+    """encoding if Python has a codec for it, else None"""
+    if not encoding:
+        return None
+    try:
+        codecs.lookup(encoding)
+        return encoding
+    except LookupError:
+        logger.warning("Ignoring unknown encoding: %s", encoding)
+        return None
+
+
+def sniff_encoding(head: bytes, default: str = "utf-8") -> str:
+    """Guess a document's encoding from a <meta charset> near its start"""
+    match = _charset_re.search(head[:CHARSET_SNIFF_BYTES])
+    if match:
+        encoding = known_encoding(match.group(1).decode("ascii", "ignore"))
+        if encoding:
+            return encoding
+    return default
+
+
+class TextCollector:
+    """Collect visible text from parser events until a length limit is hit.
+
+    Parsers may report one text node as several data events (split on
+    entities or feed boundaries), so text is buffered until the next tag.
+    """
+
+    def __init__(self, max_chars):
+        self.max_chars = max_chars
+        self.parts = []
+        self.pending = []
+        self.length = 0
+        self.skip_depth = 0
+        self.done = False
+
+    def _flush(self):
+        text = "".join(self.pending).strip()
+        self.pending = []
+        if not text:
+            return
+
+        self.parts.append(text)
+        self.length += len(text) + 1
+        if self.length >= self.max_chars:
+            self.done = True
+
+    def start(self, tag, attrib=None):
+        self._flush()
+        if tag.lower() in SKIP_TAGS:
+            self.skip_depth += 1
+
+    def end(self, tag):
+        self._flush()
+        if tag.lower() in SKIP_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+
+    def data(self, text):
+        if self.skip_depth or self.done:
+            return
+
+        self.pending.append(text)
+
+        # Stop early inside a single very long text node too
+        if self.length + sum(map(len, self.pending)) >= self.max_chars:
+            self._flush()
+
+    def close(self):
+        self._flush()
+        return "\n".join(self.parts)[: self.max_chars]
+
+
+class _StdlibParser(HTMLParser):
+    """html.parser front end forwarding events to a TextCollector"""
+
+    def __init__(self, collector):
+        super().__init__(convert_charrefs=True)
+        self.collector = collector
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in VOID_TAGS:
+            self.collector.start(tag)
+
+    def handle_endtag(self, tag):
+        self.collector.end(tag)
+
+    def handle_data(self, data):
+        self.collector.data(data)
+
+
+class StdlibExtractor:
+    """Streaming extractor built on the standard library html.parser"""
+
+    def __init__(self, max_chars, encoding=None):
+        self.collector = TextCollector(max_chars)
+        self.encoding = encoding
+        self.decoder = None
+        self.parser = _StdlibParser(self.collector)
+
+    @property
+    def done(self):
+        return self.collector.done
+
+    def feed(self, chunk: bytes):
+        if self.decoder is None:
+            encoding = self.encoding or sniff_encoding(chunk)
+            self.decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self.parser.feed(self.decoder.decode(chunk))
+
+    def close(self) -> str:
+        if not self.collector.done:
+            self.parser.close()
+        return self.collector.close()
+
+
+class LxmlExtractor:
+    """Streaming extractor built on lxml's libxml2 HTML parser (faster)"""
+
+    def __init__(self, max_chars, encoding=None):
+        from lxml import etree
+
+        self.collector = TextCollector(max_chars)
+        self.parser = etree.HTMLParser(
+            target=self.collector, encoding=encoding, recover=True
+        )
+
+    @property
+    def done(self):
+        return self.collector.done
+
+    def feed(self, chunk: bytes):
+        self.parser.feed(chunk)
+
+    def close(self) -> str:
+        try:
+            self.parser.close()
+        except Exception:
+            # The target's result is what we want; libxml2 may still complain
+            # about a document cut off by the byte cap
+            pass
+        return self.collector.close()
+
+
+# Available parser back ends, selected with Config.HTML_PARSER
+EXTRACTORS = {
+    "html.parser": StdlibExtractor,
+    "lxml": LxmlExtractor,
+}
+
+
+def create_extractor(parser, max_chars, encoding=None):
+    """Create a streaming extractor, falling back to html.parser if needed.
+
+    An encoding without a codec is ignored and the document's is sniffed.
+    """
+    extractor_cls = EXTRACTORS.get(parser)
+    if extractor_cls is None:
+        raise ValueError(f"Unknown HTML parser: {parser}")
+    encoding = known_encoding(encoding)
+
+    try:
+        return extractor_cls(max_chars, encoding)
+    except ImportError:
+        logger.warning("HTML parser %s unavailable, using html.parser", parser)
+        return StdlibExtractor(max_chars, encoding)
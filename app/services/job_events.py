@@ -0,0 +1,129 @@
+from contextlib import contextmanager
+from app.config import Config
+from app.services.cache_service import redis_client, async_redis_client
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait before re-subscribing after the listener loses Redis
+RECONNECT_DELAY_SECONDS = 1
+
+
+def _event(job_id, status):
+    """Serialized job event published on the events channel"""
+    return json.dumps({"job_id": job_id, "status": getattr(status, "value", status)})
+
+
+def publish_job_event(job_id, status):
+    """Notify waiting clients that a job reached a terminal state"""
+    try:
+        redis_client.publish(Config.JOB_EVENTS_CHANNEL, _event(job_id, status))
+    except Exception as e:
+        logger.error("Publishing event for job %s failed: %s", job_id, str(e))
+
+
+def publish_job_events(job_ids, status):
+    """Notify waiting clients about several jobs in one round trip"""
+    if not job_ids:
+        return
+    try:
+        pipe = redis_client.pipeline()
+        for job_id in job_ids:
+            pipe.publish(Config.JOB_EVENTS_CHANNEL, _event(job_id, status))
+        pipe.execute()
+    except Exception as e:
+        logger.error("Publishing events for %d jobs failed: %s", len(job_ids), e)
+
+
+async def apublish_job_events(job_ids, status):
+    """Async variant of publish_job_events"""
+    if not job_ids:
+        return
+    try:
+        pipe = async_redis_client.pipeline()
+        for job_id in job_ids:
+            pipe.publish(Config.JOB_EVENTS_CHANNEL, _event(job_id, status))
+        await pipe.execute()
+    except Exception as e:
+        logger.error("Publishing events for %d jobs failed: %s", len(job_ids), e)
+
+
+class JobEventHub:
+    """Fan job events out to clients waiting in this process.
+
+    One subscriber connection per process listens on the events channel and
+    wakes the waiters registered for each job, so waiting clients cost an
+    Event each rather than a Redis connection or a polling loop. Under a
+    gevent worker the waits are greenlets rather than OS threads.
+    """
+
+    def __init__(self):
+        self._waiters = {}
+        self._lock = threading.Lock()
+        self._listener = None
+        self._listener_pid = None
+
+    def _ensure_listener(self):
+        """Start the subscriber thread for this process if needed"""
+        with self._lock:
+            alive = self._listener is not None and self._listener.is_alive()
+            if alive and self._listener_pid == os.getpid():
+                return
+            self._listener = threading.Thread(
+                target=self._listen, name="job-events", daemon=True
+            )
+            self._listener_pid = os.getpid()
+            self._listener.start()
+
+    def _listen(self):
+        """Dispatch events from Redis pub/sub until the process exits"""
+        while True:
+            pubsub = None
+            try:
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(Config.JOB_EVENTS_CHANNEL)
+                logger.info("Subscribed to job events in process %d", os.getpid())
+                for message in pubsub.listen():
+                    self._dispatch(json.loads(message["data"]))
+            except Exception as e:
+                logger.error("Job event listener failed: %s", str(e))
+                time.sleep(RECONNECT_DELAY_SECONDS)
+            finally:
+                if pubsub is not None:
+                    pubsub.close()
+
+    def _dispatch(self, event):
+        """Wake every waiter registered for the event's job"""
+        with self._lock:
+            waiters = list(self._waiters.get(event.get("job_id"), ()))
+        for waiter in waiters:
+            waiter.set()
+
+    @contextmanager
+    def subscription(self, job_id):
+        """Register interest in a job; yields an Event set when it finishes.
+
+        Register before reading the job's status so an event published in
+        between is not missed.
+        """
+        self._ensure_listener()
+        waiter = threading.Event()
+        with self._lock:
+            self._waiters.setdefault(job_id, set()).add(waiter)
+        try:
+            yield waiter
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(job_id)
+                if waiters is not None:
+                    waiters.discard(waiter)
+                    if not waiters:
+                        del self._waiters[job_id]
+
+
+# Shared hub for this process
+hub = JobEventHub()
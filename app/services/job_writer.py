@@ -0,0 +1,340 @@
+"""
+Buffered writes of job state transitions.
+
+Intermediate states only go to the Redis status store. Terminal states are
+pushed onto a Redis list, and a flusher in each worker process writes them
+to Postgres in batches: one executemany UPDATE ... WHERE id = :id (and
+created_at, taken from the id, for the partition) and one commit per batch,
+so the commit rate follows the flush interval rather than the job rate.
+
+A claimed batch is parked under its own key until its commit succeeds.
+Batches parked longer than JOB_WRITE_CLAIM_TIMEOUT_SECONDS, because their
+flusher died, are returned to the pending list. The UPDATEs only touch
+unfinished rows, so applying a batch twice is harmless and the first
+terminal state written for a job wins. If Redis is unreachable the state
+is written to Postgres straight away instead.
+
+Postgres therefore trails the status store by up to a flush interval, and
+readers falling back to it must not treat an unfinished row as current:
+see status_store.backfill_job_status and status_store.finished_status.
+"""
+
+from datetime import datetime
+from sqlalchemy import bindparam, or_, update
+from app.config import Config
+from app.models import db, Job, JobStatus, job_created_at
+from app.services.cache_service import redis_client, async_redis_client
+from app.services.content_store import astore_summaries, store_summaries
+from app.utils.helpers import commit_pgdb
+import asyncio
+import json
+import logging
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+jobs_table = Job.__table__
+
+PENDING_KEY = "jobwrites:pending"
+CLAIMS_KEY = "jobwrites:claims"
+
+# Move up to ARGV[1] of the oldest pending writes into a batch key and
+# record when the batch was claimed
+CLAIM_LUA = """
+local items = redis.call('lrange', KEYS[1], -tonumber(ARGV[1]), -1)
+if #items == 0 then
+    return items
+end
+redis.call('ltrim', KEYS[1], 0, -#items - 1)
+redis.call('rpush', KEYS[3], unpack(items))
+redis.call('zadd', KEYS[2], ARGV[2], ARGV[3])
+return items
+"""
+
+# Return a claimed batch to the oldest end of the pending list
+REQUEUE_LUA = """
+local items = redis.call('lrange', KEYS[3], 0, -1)
+if #items > 0 then
+    redis.call('rpush', KEYS[1], unpack(items))
+end
+redis.call('del', KEYS[3])
+redis.call('zrem', KEYS[2], ARGV[1])
+return #items
+"""
+
+_claim_script = redis_client.register_script(CLAIM_LUA)
+_requeue_script = redis_client.register_script(REQUEUE_LUA)
+_async_claim_script = async_redis_client.register_script(CLAIM_LUA)
+_async_requeue_script = async_redis_client.register_script(REQUEUE_LUA)
+
+# Only unfinished rows are updated; the SET clause comes from the row keys
+_unfinished = or_(
+    jobs_table.c.status == JobStatus.QUEUED,
+    jobs_table.c.status == JobStatus.PROCESSING,
+)
+_update_unfinished = update(jobs_table).where(
+    jobs_table.c.id == bindparam("job_id"), _unfinished
+)
+# Rows whose id carries created_at, so only their partition is probed
+_update_unfinished_dated = update(jobs_table).where(
+    jobs_table.c.id == bindparam("job_id"),
+    jobs_table.c.created_at == bindparam("job_created_at"),
+    _unfinished,
+)
+
+
+def _batch_key(token):
+    """Redis list holding a batch claimed by a flusher"""
+    return f"jobwrites:batch:{token}"
+
+
+def _entry(job_id, status, summary, values):
+    return json.dumps(
+        {
+            "job_id": job_id,
+            "status": status.value,
+            "summary": summary,
+            "updated_at": time.time(),
+            **values,
+        }
+    )
+
+
+def _decode(items):
+    """Buffered writes of a claimed batch, oldest first"""
+    return [json.loads(item) for item in reversed(items)]
+
+
+def _group_rows(writes, summary_ids):
+    """UPDATE parameters grouped by the columns they set"""
+    groups = {}
+    for write, summary_id in zip(writes, summary_ids):
+        row = dict(write)
+        row["status"] = JobStatus(row["status"])
+        row["updated_at"] = datetime.utcfromtimestamp(row["updated_at"])
+        row["summary_id"] = summary_id
+        del row["summary"]
+        created_at = job_created_at(row["job_id"])
+        if created_at is not None:
+            row["job_created_at"] = created_at
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+    return list(groups.values())
+
+
+def _update_statement(rows):
+    """UPDATE for a group of rows from _group_rows"""
+    if "job_created_at" in rows[0]:
+        return _update_unfinished_dated
+    return _update_unfinished
+
+
+def _summaries(writes):
+    return [w["summary"] for w in writes if w["summary"] is not None]
+
+
+def _summary_ids(writes, stored):
+    """summary_id of each write, given the ids of the summaries stored"""
+    stored = iter(stored)
+    return [None if w["summary"] is None else next(stored) for w in writes]
+
+
+def _write(writes):
+    """Apply buffered writes in one transaction of the current session"""
+    stored = store_summaries(_summaries(writes))
+    for rows in _group_rows(writes, _summary_ids(writes, stored)):
+        db.session.execute(_update_statement(rows), rows)
+    commit_pgdb()
+
+
+async def _awrite(engine, writes):
+    """Async variant of _write, in one transaction on an async engine"""
+    async with engine.begin() as conn:
+        stored = await astore_summaries(conn, _summaries(writes))
+        for rows in _group_rows(writes, _summary_ids(writes, stored)):
+            await conn.execute(_update_statement(rows), rows)
+
+
+def buffer_job_state(job_id, status, summary=None, **values):
+    """Queue a terminal state for Postgres.
+
+    values are Job columns to set, such as cached and processing_time_ms;
+    summary is the text the job's summary_id should point at.
+    """
+    buffer_job_states([job_id], status, summary, **values)
+
+
+def buffer_job_states(job_ids, status, summary=None, **values):
+    """Queue the same terminal state for several jobs in one push"""
+    if not job_ids:
+        return
+    entries = [_entry(job_id, status, summary, values) for job_id in job_ids]
+    try:
+        redis_client.lpush(PENDING_KEY, *entries)
+    except Exception as e:
+        logger.error("Buffering job writes failed, writing directly: %s", e)
+        _write(_decode(entries[::-1]))
+
+
+async def abuffer_job_states(engine, job_ids, status, summary=None, **values):
+    """Async variant of buffer_job_states; engine is used if Redis fails"""
+    if not job_ids:
+        return
+    entries = [_entry(job_id, status, summary, values) for job_id in job_ids]
+    try:
+        await async_redis_client.lpush(PENDING_KEY, *entries)
+    except Exception as e:
+        logger.error("Buffering job writes failed, writing directly: %s", e)
+        await _awrite(engine, _decode(entries[::-1]))
+
+
+def _claim_args(token):
+    return [Config.JOB_WRITE_BATCH_SIZE, time.time(), token]
+
+
+def requeue_stale_batches():
+    """Return batches of flushers that died before committing"""
+    cutoff = time.time() - Config.JOB_WRITE_CLAIM_TIMEOUT_SECONDS
+    for token in redis_client.zrangebyscore(CLAIMS_KEY, "-inf", cutoff):
+        token = token.decode()
+        count = _requeue_script(
+            keys=[PENDING_KEY, CLAIMS_KEY, _batch_key(token)], args=[token]
+        )
+        logger.warning("Requeued %d job writes of stale batch %s", count, token)
+
+
+def flush_job_writes():
+    """Write one batch of buffered terminal states; returns its size.
+
+    Must run inside an app context.
+    """
+    token = uuid.uuid4().hex
+    keys = [PENDING_KEY, CLAIMS_KEY, _batch_key(token)]
+    writes = _decode(_claim_script(keys=keys, args=_claim_args(token)))
+    if not writes:
+        return 0
+
+    try:
+        _write(writes)
+    except Exception:
+        db.session.rollback()
+        _requeue_script(keys=keys, args=[token])
+        raise
+
+    redis_client.pipeline().delete(keys[2]).zrem(CLAIMS_KEY, token).execute()
+    logger.info("Flushed %d job writes", len(writes))
+    return len(writes)
+
+
+async def aflush_job_writes(engine):
+    """Async variant of flush_job_writes, on an async engine"""
+    token = uuid.uuid4().hex
+    keys = [PENDING_KEY, CLAIMS_KEY, _batch_key(token)]
+    writes = _decode(await _async_claim_script(keys=keys, args=_claim_args(token)))
+    if not writes:
+        return 0
+
+    try:
+        await _awrite(engine, writes)
+    except Exception:
+        await _async_requeue_script(keys=keys, args=[token])
+        raise
+
+    await async_redis_client.pipeline().delete(keys[2]).zrem(
+        CLAIMS_KEY, token
+    ).execute()
+    logger.info("Flushed %d job writes", len(writes))
+    return len(writes)
+
+
+async def arequeue_stale_batches():
+    """Async variant of requeue_stale_batches"""
+    cutoff = time.time() - Config.JOB_WRITE_CLAIM_TIMEOUT_SECONDS
+    for token in await async_redis_client.zrangebyscore(CLAIMS_KEY, "-inf", cutoff):
+        token = token.decode()
+        count = await _async_requeue_script(
+            keys=[PENDING_KEY, CLAIMS_KEY, _batch_key(token)], args=[token]
+        )
+        logger.warning("Requeued %d job writes of stale batch %s", count, token)
+
+
+def flush_all_job_writes():
+    """Flush until no full batch is left; returns the number written"""
+    total = 0
+    while True:
+        flushed = flush_job_writes()
+        total += flushed
+        if flushed < Config.JOB_WRITE_BATCH_SIZE:
+            return total
+
+
+async def aflush_all_job_writes(engine):
+    """Async variant of flush_all_job_writes"""
+    total = 0
+    while True:
+        flushed = await aflush_job_writes(engine)
+        total += flushed
+        if flushed < Config.JOB_WRITE_BATCH_SIZE:
+            return total
+
+
+def _flush_loop(stopping):
+    from app.services.lifecycle import worker_app_context
+
+    interval = Config.JOB_WRITE_FLUSH_INTERVAL_MS / 1000
+    while not stopping.wait(interval):
+        try:
+            requeue_stale_batches()
+            with worker_app_context():
+                flush_all_job_writes()
+        except Exception as e:
+            logger.error("Flushing job writes failed: %s", e)
+
+
+async def aflush_loop(engine, stopping):
+    """Flush from the event loop until stopping is set"""
+    interval = Config.JOB_WRITE_FLUSH_INTERVAL_MS / 1000
+    while not stopping.is_set():
+        try:
+            await arequeue_stale_batches()
+            await aflush_all_job_writes(engine)
+        except Exception as e:
+            logger.error("Flushing job writes failed: %s", e)
+        try:
+            await asyncio.wait_for(stopping.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+# Flusher thread of this process
+_flusher = None
+_flusher_stopping = None
+
+
+def start_flusher():
+    """Flush buffered writes from a daemon thread of this process"""
+    global _flusher, _flusher_stopping
+
+    if _flusher is not None and _flusher.is_alive():
+        return
+    _flusher_stopping = threading.Event()
+    _flusher = threading.Thread(
+        target=_flush_loop, args=(_flusher_stopping,), name="job-writer", daemon=True
+    )
+    _flusher.start()
+
+
+def stop_flusher():
+    """Stop the flusher thread; call inside an app context to flush the rest"""
+    global _flusher
+
+    if _flusher is None:
+        return
+    _flusher_stopping.set()
+    _flusher.join()
+    _flusher = None
+    try:
+        flush_all_job_writes()
+    except Exception as e:
+        logger.error("Final flush of job writes failed: %s", e)
@@ -0,0 +1,113 @@
+from contextlib import contextmanager
+from celery.concurrency import get_implementation
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Per-process application, built once and reused by every task
+_worker_app = None
+_worker_app_lock = threading.Lock()
+
+# Celery pools running several tasks at once inside one process
+SHARED_PROCESS_POOLS = ("thread", "gevent", "eventlet")
+
+# Set in the main worker process before the pool starts, so prefork
+# children inherit it
+_shares_process = False
+
+
+def init_worker_app():
+    """Build the Flask app and database engine for this process.
+
+    Also starts the thread flushing buffered job states to Postgres.
+    """
+    global _worker_app
+
+    with _worker_app_lock:
+        if _worker_app is None:
+            # Import here to avoid circular import
+            from app import create_app
+            from app.services.job_writer import start_flusher
+
+            logger.info("Initializing worker application for process %d", os.getpid())
+            _worker_app = create_app()
+            start_flusher()
+
+    return _worker_app
+
+
+def get_worker_app():
+    """Return the per-process Flask app, building it on first use"""
+    if _worker_app is None:
+        return init_worker_app()
+    return _worker_app
+
+
+@contextmanager
+def worker_app_context():
+    """Run a task inside an app context of the shared per-process app.
+
+    Pushing a context is cheap; the app, its extensions and the engine's
+    connection pool are reused. The scoped session is removed when the
+    context is popped, returning its connection to the pool.
+    """
+    with get_worker_app().app_context():
+        yield
+
+
+def shutdown_worker_app():
+    """Close pooled connections held by the per-process app"""
+    global _worker_app
+
+    with _worker_app_lock:
+        if _worker_app is None:
+            return
+
+        from app.models import db
+        from app.services.job_writer import stop_flusher
+
+        logger.info("Shutting down worker application for process %d", os.getpid())
+        with _worker_app.app_context():
+            stop_flusher()
+            db.engine.dispose()
+        _worker_app = None
+
+
+def tasks_share_process():
+    """Whether concurrent tasks of this Celery worker run in one process.
+
+    Only then can in-process coordination such as LLM micro-batching
+    combine work from different tasks. Prefork and solo workers run one
+    task per process at a time.
+    """
+    return _shares_process
+
+
+@worker_init.connect
+def _on_worker_init(sender=None, **kwargs):
+    """Celery hook: note whether the pool runs tasks in one process"""
+    global _shares_process
+
+    pool = get_implementation(sender.pool_cls)
+    _shares_process = (
+        pool.__module__.rsplit(".", 1)[-1] in SHARED_PROCESS_POOLS
+        and sender.concurrency > 1
+    )
+    logger.info(
+        "Worker pool %s, tasks share a process: %s", pool.__name__, _shares_process
+    )
+
+
+@worker_process_init.connect
+def _on_worker_process_init(**kwargs):
+    """Celery hook: build the app once per worker process"""
+    init_worker_app()
+
+
+@worker_process_shutdown.connect
+def _on_worker_process_shutdown(**kwargs):
+    """Celery hook: release the app when the worker process exits"""
+    shutdown_worker_app()
@@ -0,0 +1,155 @@
+"""
+Micro-batching of short LLM requests across concurrent jobs.
+
+The first caller to arrive opens a batch and waits up to the batch window
+for others to join, then sends every collected input with one request. A
+batch is sent early once it reaches its item or token budget. Callers get
+back their own result, or None when the batch reply did not contain it and
+they should fall back to a single request.
+"""
+
+from concurrent.futures import Future
+from app.config import Config
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class _Batch:
+    """Inputs collected for one batched request"""
+
+    def __init__(self, full_event):
+        self.items = []
+        self.tokens = 0
+        self.full = full_event
+
+    def fits(self, tokens):
+        return self.tokens + tokens <= Config.LLM_BATCH_MAX_TOKENS
+
+    def add(self, text, tokens, future):
+        self.items.append((text, future))
+        self.tokens += tokens
+        return (
+            len(self.items) >= Config.LLM_BATCH_MAX_ITEMS
+            or self.tokens >= Config.LLM_BATCH_MAX_TOKENS
+        )
+
+
+def _deliver(batch, results):
+    """Hand each caller its result from the batched reply"""
+    for (_, future), result in zip(batch.items, results):
+        future.set_result(result)
+
+
+class MicroBatcher:
+    """Collect short inputs from concurrent threads into batched requests.
+
+    send(texts) makes the batched request and returns one result per text,
+    None for any it could not provide.
+    """
+
+    def __init__(self, send):
+        self._send = send
+        self._lock = threading.Lock()
+        self._batch = None
+
+    def submit(self, text, tokens):
+        """Result for text from a batched request, or None to call singly"""
+        future = Future()
+        with self._lock:
+            batch = self._batch
+            if batch is not None and not batch.fits(tokens):
+                # Send the open batch now and start a new one
+                batch.full.set()
+                batch = self._batch = None
+
+            leader = batch is None
+            if leader:
+                batch = self._batch = _Batch(threading.Event())
+            if batch.add(text, tokens, future):
+                batch.full.set()
+                self._batch = None
+
+        if leader:
+            batch.full.wait(Config.LLM_BATCH_WINDOW_MS / 1000)
+            with self._lock:
+                if self._batch is batch:
+                    self._batch = None
+            self._flush(batch)
+
+        return future.result()
+
+    def _flush(self, batch):
+        """Send a closed batch and resolve its callers"""
+        if len(batch.items) == 1:
+            # Nothing to batch with; the caller makes a plain request
+            _deliver(batch, [None])
+            return
+
+        logger.info(
+            "Sending %d inputs (%d tokens) in one request",
+            len(batch.items),
+            batch.tokens,
+        )
+        try:
+            results = self._send([text for text, _ in batch.items])
+        except Exception as e:
+            for _, future in batch.items:
+                future.set_exception(e)
+            return
+        _deliver(batch, results)
+
+
+class AsyncMicroBatcher:
+    """Async variant of MicroBatcher for coroutines on one event loop"""
+
+    def __init__(self, send):
+        self._send = send
+        self._batch = None
+
+    async def submit(self, text, tokens):
+        future = asyncio.get_running_loop().create_future()
+        batch = self._batch
+        if batch is not None and not batch.fits(tokens):
+            batch.full.set()
+            batch = self._batch = None
+
+        leader = batch is None
+        if leader:
+            batch = self._batch = _Batch(asyncio.Event())
+        if batch.add(text, tokens, future):
+            batch.full.set()
+            self._batch = None
+
+        if leader:
+            try:
+                await asyncio.wait_for(
+                    batch.full.wait(), Config.LLM_BATCH_WINDOW_MS / 1000
+                )
+            except asyncio.TimeoutError:
+                pass
+            if self._batch is batch:
+                self._batch = None
+            await self._flush(batch)
+
+        return await future
+
+    async def _flush(self, batch):
+        if len(batch.items) == 1:
+            _deliver(batch, [None])
+            return
+
+        logger.info(
+            "Sending %d inputs (%d tokens) in one request",
+            len(batch.items),
+            batch.tokens,
+        )
+        try:
+            results = await self._send([text for text, _ in batch.items])
+        except Exception as e:
+            for _, future in batch.items:
+                future.set_exception(e)
+            return
+        _deliver(batch, results)
@@ -0,0 +1,175 @@
+"""
+Cluster-wide admission of work against the LLM provider's rate limits.
+
+Requests-per-minute and tokens-per-minute budgets are token buckets in
+Redis shared by every worker. A job reserves its estimated cost before its
+LLM calls start. Bulk jobs may only draw the buckets down to a reserved
+fraction of their capacity, so interactive jobs always find headroom even
+while a bulk backfill keeps the quota saturated.
+"""
+
+from app.config import Config
+from app.models import JobPriority
+from app.services.cache_service import redis_client, async_redis_client
+from app.utils.chunking import CHARS_PER_TOKEN
+import asyncio
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+REQUESTS_KEY = "llm:budget:requests"
+TOKENS_KEY = "llm:budget:tokens"
+
+# Reserve both budgets at once or neither. Uses the Redis server clock so
+# workers on different machines agree. Returns the seconds to wait before
+# the reservation can succeed (0 when it was taken).
+BUDGET_LUA = """
+local clock = redis.call('time')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local burst = tonumber(ARGV[3])
+local floor_fraction = tonumber(ARGV[4])
+
+local function bucket(key, per_minute, need)
+    local rate = per_minute / 60
+    local capacity = math.max(1, rate * burst)
+    local state = redis.call('hmget', key, 'level', 'ts')
+    local level = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    level = math.min(capacity, level + math.max(0, now - ts) * rate)
+    need = math.min(need, capacity * (1 - floor_fraction))
+    local wait = (need + capacity * floor_fraction - level) / rate
+    return {key = key, rate = rate, capacity = capacity, level = level,
+            need = need, wait = math.max(0, wait)}
+end
+
+local buckets = {}
+if tonumber(ARGV[1]) > 0 then
+    table.insert(buckets, bucket(KEYS[1], tonumber(ARGV[1]), tonumber(ARGV[5])))
+end
+if tonumber(ARGV[2]) > 0 then
+    table.insert(buckets, bucket(KEYS[2], tonumber(ARGV[2]), tonumber(ARGV[6])))
+end
+
+local wait = 0
+for _, b in ipairs(buckets) do
+    wait = math.max(wait, b.wait)
+end
+for _, b in ipairs(buckets) do
+    if wait == 0 then
+        b.level = b.level - b.need
+    end
+    redis.call('hset', b.key, 'level', tostring(b.level), 'ts', tostring(now))
+    redis.call('expire', b.key, math.ceil(b.capacity / b.rate) + 1)
+end
+return tostring(wait)
+"""
+
+_budget_script = redis_client.register_script(BUDGET_LUA)
+_async_budget_script = async_redis_client.register_script(BUDGET_LUA)
+
+
+def enabled():
+    """Whether any provider limit is configured"""
+    return Config.LLM_RPM_LIMIT > 0 or Config.LLM_TPM_LIMIT > 0
+
+
+def estimate_cost(text):
+    """Rough (requests, tokens) an LLM summary of text will use.
+
+    Estimated from length alone so it is cheap to compute before dispatch:
+    one request per chunk plus reduce requests for long documents, and an
+    output allowance per request that is also read back by the reduce step.
+    """
+    input_tokens = math.ceil(len(text) / CHARS_PER_TOKEN)
+    chunks = max(1, math.ceil(input_tokens / Config.SUMMARY_CHUNK_TOKENS))
+    requests = 1
+    if chunks > 1:
+        reduce_tokens = chunks * Config.LLM_OUTPUT_TOKENS_ESTIMATE
+        requests = chunks + math.ceil(reduce_tokens / Config.SUMMARY_CHUNK_TOKENS)
+    output_tokens = requests * Config.LLM_OUTPUT_TOKENS_ESTIMATE
+    tokens = input_tokens + output_tokens * (2 if chunks > 1 else 1)
+    return requests, tokens
+
+
+def _args(priority, requests, tokens):
+    floor = Config.LLM_BULK_RESERVE_FRACTION if priority == JobPriority.BULK else 0
+    return [
+        Config.LLM_RPM_LIMIT,
+        Config.LLM_TPM_LIMIT,
+        Config.LLM_BUDGET_BURST_SECONDS,
+        floor,
+        requests,
+        tokens,
+    ]
+
+
+def reserve(priority, requests, tokens):
+    """Try to reserve LLM capacity; returns seconds to wait, 0 once reserved.
+
+    Fails open: if Redis is unavailable the work is admitted.
+    """
+    if not enabled():
+        return 0
+    try:
+        return float(
+            _budget_script(
+                keys=[REQUESTS_KEY, TOKENS_KEY],
+                args=_args(priority, requests, tokens),
+            )
+        )
+    except Exception as e:
+        logger.error("LLM budget unavailable: %s", str(e))
+        return 0
+
+
+async def areserve(priority, requests, tokens):
+    """Async variant of reserve"""
+    if not enabled():
+        return 0
+    try:
+        return float(
+            await _async_budget_script(
+                keys=[REQUESTS_KEY, TOKENS_KEY],
+                args=_args(priority, requests, tokens),
+            )
+        )
+    except Exception as e:
+        logger.error("LLM budget unavailable: %s", str(e))
+        return 0
+
+
+def admit(priority, text, max_wait):
+    """Reserve capacity for summarizing text, waiting inline up to max_wait.
+
+    Returns 0 once admitted, otherwise the seconds the caller should defer
+    the work for before trying again.
+    """
+    requests, tokens = estimate_cost(text)
+    deadline = time.monotonic() + max_wait
+    while True:
+        wait = reserve(priority, requests, tokens)
+        if not wait:
+            return 0
+        if time.monotonic() + wait > deadline:
+            logger.info(
+                "LLM budget exhausted for %s work (%d requests, %d tokens), "
+                "deferring %.1fs",
+                getattr(priority, "value", priority),
+                requests,
+                tokens,
+                wait,
+            )
+            return wait
+        time.sleep(wait)
+
+
+async def aadmit(priority, text):
+    """Async variant of admit; waits on the event loop until admitted"""
+    requests, tokens = estimate_cost(text)
+    while True:
+        wait = await areserve(priority, requests, tokens)
+        if not wait:
+            return
+        await asyncio.sleep(wait)
@@ -0,0 +1,879 @@
+"""
+Routing of LLM requests across several endpoints.
+
+Each configured endpoint has a circuit breaker whose state lives in Redis, so
+every worker agrees on which endpoints are healthy. Requests go to the
+healthy endpoint with the lowest recent median latency. If it has not
+answered by its p95 latency, a hedged request is sent to the next endpoint
+and whichever answers first wins. Failures fall through to the next endpoint
+without waiting for a retry. Streamed completions are hedged on time to
+first token instead: the endpoint that starts streaming first is kept and
+the other is closed. Once a token has been received, errors are raised to
+the caller.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from collections import namedtuple
+from openai import OpenAI, AsyncOpenAI
+from app.config import Config
+from app.services.cache_service import redis_client, async_redis_client
+from app.utils.retry import is_retryable
+import asyncio
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Recent latencies kept per endpoint for routing and hedging decisions
+LATENCY_SAMPLES = 200
+
+# Threads running primary and hedged requests for sync callers
+_hedge_pool = ThreadPoolExecutor(max_workers=Config.LLM_HEDGE_THREADS)
+
+
+# A streamed call whose first token has arrived (first is None if it had none)
+OpenStream = namedtuple(
+    "OpenStream",
+    ["endpoint", "response", "chunks", "first", "start", "first_token", "probe"],
+)
+
+
+class NoEndpointAvailableError(Exception):
+    """Raised when every LLM endpoint's circuit breaker is open"""
+
+    retryable = True
+
+
+class Endpoint:
+    """One OpenAI-compatible endpoint and model"""
+
+    def __init__(self, name, base_url, model, token):
+        self.name = name
+        self.model = model
+        self.client = OpenAI(base_url=base_url, api_key=token)
+        self.async_client = AsyncOpenAI(base_url=base_url, api_key=token)
+
+    def __repr__(self):
+        return f"Endpoint({self.name}, {self.model})"
+
+
+def load_endpoints():
+    """Build endpoints from LLM_ENDPOINTS, or the single LLM_* settings"""
+    configured = Config.LLM_ENDPOINTS or [
+        {
+            "name": "default",
+            "endpoint": Config.LLM_ENDPOINT,
+            "model": Config.LLM_MODEL,
+            "token": Config.LLM_TOKEN,
+        }
+    ]
+    return [
+        Endpoint(
+            name=item.get("name") or f"endpoint{i}",
+            base_url=item.get("endpoint") or Config.LLM_ENDPOINT,
+            model=item.get("model") or Config.LLM_MODEL,
+            token=item.get("token") or Config.LLM_TOKEN,
+        )
+        for i, item in enumerate(configured)
+    ]
+
+
+def _breaker_key(name):
+    """Present while the endpoint's breaker is open"""
+    return f"llm:breaker:{name}"
+
+
+def _tripped_key(name):
+    """Present from tripping until a successful call closes the breaker"""
+    return f"llm:tripped:{name}"
+
+
+def _probe_key(name):
+    """Held by the single request allowed through a half-open breaker"""
+    return f"llm:probe:{name}"
+
+
+def _stats_key(name, bucket):
+    """Request, error and slow-call counters for one time window"""
+    return f"llm:stats:{name}:{bucket}"
+
+
+def _latency_key(name):
+    """Recent successful call latencies"""
+    return f"llm:latency:{name}"
+
+
+def _first_token_key(name):
+    """Recent times to first token of successful streamed calls"""
+    return f"llm:ttft:{name}"
+
+
+def _delta(chunk):
+    """Text carried by a streamed chunk, if any"""
+    return chunk.choices[0].delta.content if chunk.choices else None
+
+
+def _percentile(samples, fraction):
+    """Value at the given fraction of sorted samples, or None if empty"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _should_trip(counts):
+    """Whether windowed counters exceed the error-rate or slow-call limits"""
+    requests = counts["requests"]
+    if requests < Config.LLM_BREAKER_MIN_REQUESTS:
+        return False
+    return (
+        counts["errors"] / requests >= Config.LLM_BREAKER_ERROR_RATE
+        or counts["slow"] / requests >= Config.LLM_BREAKER_SLOW_RATE
+    )
+
+
+class LLMRouter:
+    """Pick endpoints, hedge slow requests and maintain circuit breakers"""
+
+    def __init__(self, endpoints):
+        self.endpoints = endpoints
+        self._latency_cache = {}
+        self._latency_cache_at = 0.0
+        self._lock = threading.Lock()
+
+    # Latency statistics
+
+    def _latencies(self):
+        """Per-endpoint (p50, p95), refreshed from Redis every few seconds"""
+        now = time.monotonic()
+        if now - self._latency_cache_at < Config.LLM_STATS_REFRESH_SECONDS:
+            return self._latency_cache
+
+        with self._lock:
+            try:
+                pipe = redis_client.pipeline()
+                for endpoint in self.endpoints:
+                    pipe.lrange(_latency_key(endpoint.name), 0, -1)
+                    pipe.lrange(_first_token_key(endpoint.name), 0, -1)
+                results = pipe.execute()
+            except Exception as e:
+                logger.error("Loading LLM latency stats failed: %s", str(e))
+                results = [[] for _ in range(2 * len(self.endpoints))]
+
+            self._latency_cache = self._summarize_latencies(results)
+            self._latency_cache_at = now
+            return self._latency_cache
+
+    async def _alatencies(self):
+        """Async variant of _latencies"""
+        now = time.monotonic()
+        if now - self._latency_cache_at < Config.LLM_STATS_REFRESH_SECONDS:
+            return self._latency_cache
+
+        try:
+            pipe = async_redis_client.pipeline()
+            for endpoint in self.endpoints:
+                pipe.lrange(_latency_key(endpoint.name), 0, -1)
+                pipe.lrange(_first_token_key(endpoint.name), 0, -1)
+            results = await pipe.execute()
+        except Exception as e:
+            logger.error("Loading LLM latency stats failed: %s", str(e))
+            results = [[] for _ in range(2 * len(self.endpoints))]
+
+        self._latency_cache = self._summarize_latencies(results)
+        self._latency_cache_at = now
+        return self._latency_cache
+
+    def _summarize_latencies(self, results):
+        """Per-endpoint (p50, p95, p95 time to first token)"""
+        stats = {}
+        for i, endpoint in enumerate(self.endpoints):
+            samples = [float(v) for v in results[2 * i]]
+            first_tokens = [float(v) for v in results[2 * i + 1]]
+            stats[endpoint.name] = (
+                _percentile(samples, 0.5),
+                _percentile(samples, 0.95),
+                _percentile(first_tokens, 0.95),
+            )
+        return stats
+
+    def _delay(self, p95):
+        if p95 is None:
+            return Config.LLM_HEDGE_DEFAULT_DELAY
+        return max(p95, Config.LLM_HEDGE_MIN_DELAY)
+
+    def hedge_delay(self, endpoint, latencies):
+        """Seconds to wait on an endpoint before sending a hedged request"""
+        return self._delay(latencies.get(endpoint.name, (None, None, None))[1])
+
+    def first_token_delay(self, endpoint, latencies):
+        """Seconds to wait for a stream's first token before hedging it"""
+        return self._delay(latencies.get(endpoint.name, (None, None, None))[2])
+
+    def _rank(self, allowed, latencies):
+        """Order allowed endpoints by median latency, unknown ones first"""
+        order = {endpoint.name: i for i, endpoint in enumerate(self.endpoints)}
+        return sorted(
+            allowed,
+            key=lambda e: (
+                latencies.get(e.name, (None, None, None))[0] or 0.0,
+                order[e.name],
+            ),
+        )
+
+    # Circuit breaker
+
+    def _state_commands(self, pipe):
+        """Queue reading each endpoint's (open, tripped, probing) flags"""
+        for endpoint in self.endpoints:
+            pipe.exists(_breaker_key(endpoint.name))
+            pipe.exists(_tripped_key(endpoint.name))
+            pipe.exists(_probe_key(endpoint.name))
+
+    def _allowed(self, flags):
+        """Endpoints a request may go to, and the half-open ones among them.
+
+        A half-open endpoint is only offered while nobody is probing it. The
+        probe itself is taken just before calling it (see _take_probe).
+        """
+        allowed = []
+        half_open = set()
+        for i, endpoint in enumerate(self.endpoints):
+            is_open, tripped, probing = flags[3 * i : 3 * i + 3]
+            if is_open or (tripped and probing):
+                continue
+            if tripped:
+                half_open.add(endpoint.name)
+            allowed.append(endpoint)
+        return allowed, half_open
+
+    def available_endpoints(self):
+        """Endpoints whose breaker lets a request through, best first, and
+        the names of those that are half-open"""
+        try:
+            pipe = redis_client.pipeline()
+            self._state_commands(pipe)
+            flags = pipe.execute()
+        except Exception as e:
+            logger.error("Loading LLM breaker state failed: %s", str(e))
+            flags = [False] * (3 * len(self.endpoints))
+
+        allowed, half_open = self._allowed(flags)
+        return self._rank(allowed, self._latencies()), half_open
+
+    async def aavailable_endpoints(self):
+        """Async variant of available_endpoints"""
+        try:
+            pipe = async_redis_client.pipeline()
+            self._state_commands(pipe)
+            flags = await pipe.execute()
+        except Exception as e:
+            logger.error("Loading LLM breaker state failed: %s", str(e))
+            flags = [False] * (3 * len(self.endpoints))
+
+        allowed, half_open = self._allowed(flags)
+        return self._rank(allowed, await self._alatencies()), half_open
+
+    def _take_probe(self, endpoint):
+        """Claim the single request allowed through a half-open breaker.
+
+        Raises NoEndpointAvailableError, which is retryable, if another
+        request holds it. If Redis is unavailable the call goes ahead.
+        """
+        try:
+            taken = redis_client.set(
+                _probe_key(endpoint.name), 1, nx=True, ex=Config.LLM_TIMEOUT_SECONDS
+            )
+        except Exception as e:
+            logger.error("Taking LLM probe for %s failed: %s", endpoint, str(e))
+            return
+        if not taken:
+            raise NoEndpointAvailableError(f"{endpoint} is already being probed")
+
+    async def _atake_probe(self, endpoint):
+        """Async variant of _take_probe"""
+        try:
+            taken = await async_redis_client.set(
+                _probe_key(endpoint.name), 1, nx=True, ex=Config.LLM_TIMEOUT_SECONDS
+            )
+        except Exception as e:
+            logger.error("Taking LLM probe for %s failed: %s", endpoint, str(e))
+            return
+        if not taken:
+            raise NoEndpointAvailableError(f"{endpoint} is already being probed")
+
+    def _release_probe(self, endpoint):
+        """Give up a probe whose call ends without a recorded outcome"""
+        try:
+            redis_client.delete(_probe_key(endpoint.name))
+        except Exception as e:
+            logger.error("Releasing LLM probe for %s failed: %s", endpoint, str(e))
+
+    async def _arelease_probe(self, endpoint):
+        """Async variant of _release_probe"""
+        try:
+            await async_redis_client.delete(_probe_key(endpoint.name))
+        except Exception as e:
+            logger.error("Releasing LLM probe for %s failed: %s", endpoint, str(e))
+
+    def _record_commands(self, pipe, endpoint, latency, failed, first_token=None):
+        """Queue the Redis commands recording one call's outcome"""
+        bucket = int(time.time() // Config.LLM_BREAKER_WINDOW_SECONDS)
+        key = _stats_key(endpoint.name, bucket)
+        slow = latency >= Config.LLM_BREAKER_SLOW_SECONDS
+
+        pipe.hincrby(key, "requests", 1)
+        pipe.hincrby(key, "errors", int(failed))
+        pipe.hincrby(key, "slow", int(slow))
+        pipe.expire(key, 2 * Config.LLM_BREAKER_WINDOW_SECONDS)
+        pipe.hgetall(key)
+        pipe.hgetall(_stats_key(endpoint.name, bucket - 1))
+
+        if failed:
+            return
+
+        pipe.lpush(_latency_key(endpoint.name), round(latency, 4))
+        pipe.ltrim(_latency_key(endpoint.name), 0, LATENCY_SAMPLES - 1)
+        if first_token is not None:
+            pipe.lpush(_first_token_key(endpoint.name), round(first_token, 4))
+            pipe.ltrim(_first_token_key(endpoint.name), 0, LATENCY_SAMPLES - 1)
+        if not slow:
+            # A healthy call closes a half-open breaker
+            pipe.delete(_tripped_key(endpoint.name), _probe_key(endpoint.name))
+
+    def _windowed_counts(self, current, previous):
+        counts = {"requests": 0, "errors": 0, "slow": 0}
+        for window in (current, previous):
+            for field in counts:
+                counts[field] += int(window.get(field.encode(), 0))
+        return counts
+
+    def _trip_commands(self, pipe, endpoint):
+        """Queue the Redis commands opening an endpoint's breaker"""
+        pipe.set(_breaker_key(endpoint.name), 1, ex=Config.LLM_BREAKER_OPEN_SECONDS)
+        pipe.set(_tripped_key(endpoint.name), 1)
+        pipe.delete(_probe_key(endpoint.name))
+
+    def record(self, endpoint, latency, failed, first_token=None):
+        """Record a call's outcome and trip the breaker if limits are exceeded"""
+        try:
+            pipe = redis_client.pipeline()
+            self._record_commands(pipe, endpoint, latency, failed, first_token)
+            results = pipe.execute()
+
+            counts = self._windowed_counts(results[4], results[5])
+            if (failed or latency >= Config.LLM_BREAKER_SLOW_SECONDS) and (
+                _should_trip(counts) or redis_client.exists(_tripped_key(endpoint.name))
+            ):
+                logger.warning("Opening circuit breaker for %s: %s", endpoint, counts)
+                pipe = redis_client.pipeline()
+                self._trip_commands(pipe, endpoint)
+                pipe.execute()
+        except Exception as e:
+            logger.error("Recording LLM call outcome failed: %s", str(e))
+
+    async def arecord(self, endpoint, latency, failed, first_token=None):
+        """Async variant of record"""
+        try:
+            pipe = async_redis_client.pipeline()
+            self._record_commands(pipe, endpoint, latency, failed, first_token)
+            results = await pipe.execute()
+
+            counts = self._windowed_counts(results[4], results[5])
+            if (failed or latency >= Config.LLM_BREAKER_SLOW_SECONDS) and (
+                _should_trip(counts)
+                or await async_redis_client.exists(_tripped_key(endpoint.name))
+            ):
+                logger.warning("Opening circuit breaker for %s: %s", endpoint, counts)
+                pipe = async_redis_client.pipeline()
+                self._trip_commands(pipe, endpoint)
+                await pipe.execute()
+        except Exception as e:
+            logger.error("Recording LLM call outcome failed: %s", str(e))
+
+    # Calls
+
+    def _call(self, endpoint, messages, half_open):
+        """Call one endpoint and record the outcome.
+
+        A half-open endpoint's probe is taken first. Recording the outcome
+        releases it; otherwise it is released here.
+        """
+        probe = endpoint.name in half_open
+        if probe:
+            self._take_probe(endpoint)
+
+        start = time.monotonic()
+        try:
+            response = endpoint.client.chat.completions.create(
+                model=endpoint.model,
+                messages=messages,
+                timeout=Config.LLM_TIMEOUT_SECONDS,
+            )
+        except Exception as e:
+            if is_retryable(e):
+                self.record(endpoint, time.monotonic() - start, failed=True)
+            elif probe:
+                self._release_probe(endpoint)
+            raise
+
+        self.record(endpoint, time.monotonic() - start, failed=False)
+        return response
+
+    async def _acall(self, endpoint, messages, half_open):
+        """Async variant of _call; a cancelled call releases its probe"""
+        probe = endpoint.name in half_open
+        if probe:
+            await self._atake_probe(endpoint)
+
+        start = time.monotonic()
+        try:
+            response = await endpoint.async_client.chat.completions.create(
+                model=endpoint.model,
+                messages=messages,
+                timeout=Config.LLM_TIMEOUT_SECONDS,
+            )
+        except asyncio.CancelledError:
+            if probe:
+                await self._arelease_probe(endpoint)
+            raise
+        except Exception as e:
+            if is_retryable(e):
+                await self.arecord(endpoint, time.monotonic() - start, failed=True)
+            elif probe:
+                await self._arelease_probe(endpoint)
+            raise
+
+        await self.arecord(endpoint, time.monotonic() - start, failed=False)
+        return response
+
+    def _failover(self, primary, hedge, error):
+        """Whether a primary that failed before the hedge delay moves to hedge"""
+        if not is_retryable(error):
+            return False
+        logger.warning("LLM endpoint %s failed, trying %s: %s", primary, hedge, error)
+        return True
+
+    def _hedged(self, primary, hedge, messages, latencies, half_open):
+        """Call primary; if it is slower than its p95, race it against hedge.
+
+        A primary that fails before the hedge delay is replaced by hedge.
+        """
+        if hedge is None:
+            return self._call(primary, messages, half_open)
+
+        first = _hedge_pool.submit(self._call, primary, messages, half_open)
+        try:
+            return first.result(timeout=self.hedge_delay(primary, latencies))
+        except FutureTimeoutError:
+            pass
+        except Exception as e:
+            if not self._failover(primary, hedge, e):
+                raise
+            return self._call(hedge, messages, half_open)
+
+        logger.info("Hedging slow request on %s with %s", primary, hedge)
+        pending = {first, _hedge_pool.submit(self._call, hedge, messages, half_open)}
+        last_error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    return future.result()
+                except Exception as e:
+                    last_error = e
+        raise last_error
+
+    async def _ahedged(self, primary, hedge, messages, latencies, half_open):
+        """Async variant of _hedged; the losing request is cancelled"""
+        if hedge is None:
+            return await self._acall(primary, messages, half_open)
+
+        first = asyncio.ensure_future(self._acall(primary, messages, half_open))
+        done, _ = await asyncio.wait(
+            {first}, timeout=self.hedge_delay(primary, latencies)
+        )
+        if done:
+            try:
+                return first.result()
+            except Exception as e:
+                if not self._failover(primary, hedge, e):
+                    raise
+                return await self._acall(hedge, messages, half_open)
+
+        logger.info("Hedging slow request on %s with %s", primary, hedge)
+        pending = {
+            first,
+            asyncio.ensure_future(self._acall(hedge, messages, half_open)),
+        }
+        last_error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    try:
+                        return task.result()
+                    except Exception as e:
+                        last_error = e
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _pairs(self, candidates):
+        """Split ranked endpoints into (primary, hedge) pairs"""
+        if not Config.LLM_HEDGE_ENABLED:
+            return [(endpoint, None) for endpoint in candidates]
+        return [
+            (candidates[i], candidates[i + 1] if i + 1 < len(candidates) else None)
+            for i in range(0, len(candidates), 2)
+        ]
+
+    def create(self, messages):
+        """Create a chat completion on the best available endpoint(s)"""
+        candidates, half_open = self.available_endpoints()
+        if not candidates:
+            raise NoEndpointAvailableError("All LLM endpoints are unavailable")
+
+        latencies = self._latencies()
+        last_error = None
+        for primary, hedge in self._pairs(candidates):
+            try:
+                return self._hedged(primary, hedge, messages, latencies, half_open)
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                logger.warning("LLM endpoint %s failed: %s", primary, str(e))
+                last_error = e
+        raise last_error
+
+    async def acreate(self, messages):
+        """Async variant of create"""
+        candidates, half_open = await self.aavailable_endpoints()
+        if not candidates:
+            raise NoEndpointAvailableError("All LLM endpoints are unavailable")
+
+        latencies = await self._alatencies()
+        last_error = None
+        for primary, hedge in self._pairs(candidates):
+            try:
+                return await self._ahedged(
+                    primary, hedge, messages, latencies, half_open
+                )
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                logger.warning("LLM endpoint %s failed: %s", primary, str(e))
+                last_error = e
+        raise last_error
+
+    # Streaming
+
+    def _open_stream(self, endpoint, messages, half_open):
+        """Start a streamed call on one endpoint and wait for its first token.
+
+        A half-open endpoint's probe is taken first, as in _call.
+        """
+        probe = endpoint.name in half_open
+        if probe:
+            self._take_probe(endpoint)
+
+        start = time.monotonic()
+        try:
+            response = endpoint.client.chat.completions.create(
+                model=endpoint.model,
+                messages=messages,
+                timeout=Config.LLM_TIMEOUT_SECONDS,
+                stream=True,
+            )
+            chunks = iter(response)
+            for chunk in chunks:
+                delta = _delta(chunk)
+                if delta:
+                    return OpenStream(
+                        endpoint,
+                        response,
+                        chunks,
+                        delta,
+                        start,
+                        time.monotonic() - start,
+                        probe,
+                    )
+        except Exception as e:
+            if is_retryable(e):
+                self.record(endpoint, time.monotonic() - start, failed=True)
+            elif probe:
+                self._release_probe(endpoint)
+            raise
+        return OpenStream(endpoint, response, chunks, None, start, None, probe)
+
+    async def _aopen_stream(self, endpoint, messages, half_open):
+        """Async variant of _open_stream; a cancelled call closes its stream
+        and releases its probe"""
+        probe = endpoint.name in half_open
+        if probe:
+            await self._atake_probe(endpoint)
+
+        start = time.monotonic()
+        response = None
+        try:
+            response = await endpoint.async_client.chat.completions.create(
+                model=endpoint.model,
+                messages=messages,
+                timeout=Config.LLM_TIMEOUT_SECONDS,
+                stream=True,
+            )
+            chunks = response.__aiter__()
+            async for chunk in chunks:
+                delta = _delta(chunk)
+                if delta:
+                    return OpenStream(
+                        endpoint,
+                        response,
+                        chunks,
+                        delta,
+                        start,
+                        time.monotonic() - start,
+                        probe,
+                    )
+        except asyncio.CancelledError:
+            if response is not None:
+                await response.close()
+            if probe:
+                await self._arelease_probe(endpoint)
+            raise
+        except Exception as e:
+            if is_retryable(e):
+                await self.arecord(endpoint, time.monotonic() - start, failed=True)
+            elif probe:
+                await self._arelease_probe(endpoint)
+            raise
+        return OpenStream(endpoint, response, chunks, None, start, None, probe)
+
+    def _hedged_stream(self, primary, hedge, messages, latencies, half_open):
+        """Open a stream on primary; without a first token by its p95 time to
+        first token, race it against hedge.
+
+        The stream that starts first is returned and the other is closed as
+        soon as its call returns. A primary that fails before the hedge delay
+        is replaced by hedge.
+        """
+        if hedge is None:
+            return self._open_stream(primary, messages, half_open)
+
+        first = _hedge_pool.submit(self._open_stream, primary, messages, half_open)
+        try:
+            return first.result(timeout=self.first_token_delay(primary, latencies))
+        except FutureTimeoutError:
+            pass
+        except Exception as e:
+            if not self._failover(primary, hedge, e):
+                raise
+            return self._open_stream(hedge, messages, half_open)
+
+        logger.info("Hedging slow stream on %s with %s", primary, hedge)
+        second = _hedge_pool.submit(self._open_stream, hedge, messages, half_open)
+        pending = {first, second}
+        winner = None
+        last_error = None
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        opened = future.result()
+                    except Exception as e:
+                        last_error = e
+                        continue
+                    winner = future
+                    return opened
+            raise last_error
+        finally:
+            for future in {first, second} - {winner}:
+                future.add_done_callback(self._discard_stream)
+
+    async def _ahedged_stream(self, primary, hedge, messages, latencies, half_open):
+        """Async variant of _hedged_stream; the losing call is cancelled"""
+        if hedge is None:
+            return await self._aopen_stream(primary, messages, half_open)
+
+        first = asyncio.ensure_future(self._aopen_stream(primary, messages, half_open))
+        done, _ = await asyncio.wait(
+            {first}, timeout=self.first_token_delay(primary, latencies)
+        )
+        if done:
+            try:
+                return first.result()
+            except Exception as e:
+                if not self._failover(primary, hedge, e):
+                    raise
+                return await self._aopen_stream(hedge, messages, half_open)
+
+        logger.info("Hedging slow stream on %s with %s", primary, hedge)
+        second = asyncio.ensure_future(self._aopen_stream(hedge, messages, half_open))
+        pending = {first, second}
+        winner = None
+        last_error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    try:
+                        opened = task.result()
+                    except Exception as e:
+                        last_error = e
+                        continue
+                    winner = task
+                    return opened
+            raise last_error
+        finally:
+            for task in {first, second} - {winner}:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled() and task.exception() is None:
+                    await self._adiscard(task.result())
+
+    def _discard_stream(self, future):
+        """Close the stream opened by a hedged call that lost the race"""
+        if future.cancelled() or future.exception() is not None:
+            return
+        opened = future.result()
+        opened.response.close()
+        if opened.probe:
+            self._release_probe(opened.endpoint)
+
+    async def _adiscard(self, opened):
+        """Close an opened stream that will not be read"""
+        await opened.response.close()
+        if opened.probe:
+            await self._arelease_probe(opened.endpoint)
+
+    def _relay(self, opened):
+        """Yield an opened stream's deltas and record the call's outcome.
+
+        A probe is released if the caller stops reading early.
+        """
+        try:
+            if opened.first:
+                yield opened.first
+                for chunk in opened.chunks:
+                    delta = _delta(chunk)
+                    if delta:
+                        yield delta
+        except GeneratorExit:
+            if opened.probe:
+                self._release_probe(opened.endpoint)
+            raise
+        except Exception as e:
+            if is_retryable(e):
+                self.record(
+                    opened.endpoint, time.monotonic() - opened.start, failed=True
+                )
+            elif opened.probe:
+                self._release_probe(opened.endpoint)
+            raise
+
+        self.record(
+            opened.endpoint,
+            time.monotonic() - opened.start,
+            failed=False,
+            first_token=opened.first_token,
+        )
+
+    async def _arelay(self, opened):
+        """Async variant of _relay"""
+        try:
+            if opened.first:
+                yield opened.first
+                async for chunk in opened.chunks:
+                    delta = _delta(chunk)
+                    if delta:
+                        yield delta
+        except (GeneratorExit, asyncio.CancelledError):
+            if opened.probe:
+                await self._arelease_probe(opened.endpoint)
+            raise
+        except Exception as e:
+            if is_retryable(e):
+                await self.arecord(
+                    opened.endpoint, time.monotonic() - opened.start, failed=True
+                )
+            elif opened.probe:
+                await self._arelease_probe(opened.endpoint)
+            raise
+
+        await self.arecord(
+            opened.endpoint,
+            time.monotonic() - opened.start,
+            failed=False,
+            first_token=opened.first_token,
+        )
+
+    def stream(self, messages):
+        """Stream a chat completion's text deltas from the best endpoint(s).
+
+        Endpoints are raced on time to first token like create hedges whole
+        calls. An endpoint failing before its first token falls through to the
+        next one. Once tokens have been yielded, errors are raised to the
+        caller.
+        """
+        candidates, half_open = self.available_endpoints()
+        if not candidates:
+            raise NoEndpointAvailableError("All LLM endpoints are unavailable")
+
+        latencies = self._latencies()
+        last_error = None
+        for primary, hedge in self._pairs(candidates):
+            try:
+                opened = self._hedged_stream(
+                    primary, hedge, messages, latencies, half_open
+                )
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                logger.warning("LLM endpoint %s failed: %s", primary, str(e))
+                last_error = e
+                continue
+
+            yield from self._relay(opened)
+            return
+        raise last_error
+
+    async def astream(self, messages):
+        """Async variant of stream"""
+        candidates, half_open = await self.aavailable_endpoints()
+        if not candidates:
+            raise NoEndpointAvailableError("All LLM endpoints are unavailable")
+
+        latencies = await self._alatencies()
+        last_error = None
+        for primary, hedge in self._pairs(candidates):
+            try:
+                opened = await self._ahedged_stream(
+                    primary, hedge, messages, latencies, half_open
+                )
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                logger.warning("LLM endpoint %s failed: %s", primary, str(e))
+                last_error = e
+                continue
+
+            relay = self._arelay(opened)
+            try:
+                async for delta in relay:
+                    yield delta
+            finally:
+                await relay.aclose()
+            return
+        raise last_error
+
+
+# Shared router for this process
+router = LLMRouter(load_endpoints())
@@ -0,0 +1,400 @@
+"""
+Job stage timings and the Prometheus metrics surface.
+
+Each pipeline stage records where its time goes (see app.utils.timings)
+and adds it to a per-job hash in Redis, so the totals survive hand-offs
+between Celery stages on different workers. The gap between one stage
+handing off and the next one starting counts as queue wait. When a job
+finishes, its totals are stored on the Job row and added to cluster-wide
+histograms in Redis. /metrics renders those histograms together with queue
+depths, in-flight LLM calls and this process's cache counters.
+"""
+
+from contextlib import asynccontextmanager, contextmanager
+from prometheus_client import CollectorRegistry, generate_latest
+from prometheus_client.core import (
+    CounterMetricFamily,
+    GaugeMetricFamily,
+    HistogramMetricFamily,
+)
+from prometheus_client.utils import floatToGoString
+from app.config import Config
+from app.services.cache_service import redis_client, async_redis_client, cache_stats
+from app.utils.timings import recording, timed
+import calendar
+import logging
+import redis
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds of the stage histogram buckets
+STAGE_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    120,
+    300,
+)
+
+# Stages reported in Job.timings and the histograms, in milliseconds
+STAGES = (
+    "queue_wait",
+    "fetch",
+    "extract",
+    "llm",
+    "cache_get",
+    "cache_set",
+    "db_commit",
+    "total",
+)
+
+JOBS_KEY = "metrics:jobs"
+LLM_INFLIGHT_KEY = "metrics:llm:inflight"
+
+# Add one stage's timings to a job's totals. Queue wait is the time from
+# the previous hand-off (or from when the job was queued) to this stage's
+# start. With the final flag set the totals are returned and removed.
+TIMINGS_LUA = """
+local started = tonumber(ARGV[1])
+local handoff = tonumber(redis.call('hget', KEYS[1], '_handoff_at'))
+    or tonumber(ARGV[2])
+if started and handoff then
+    redis.call('hincrbyfloat', KEYS[1], 'queue_wait',
+               math.max(0, started - handoff) * 1000)
+end
+for i = 6, #ARGV, 2 do
+    redis.call('hincrbyfloat', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+if ARGV[5] == '1' then
+    local totals = redis.call('hgetall', KEYS[1])
+    redis.call('del', KEYS[1])
+    return totals
+end
+redis.call('hset', KEYS[1], '_handoff_at', ARGV[3])
+redis.call('expire', KEYS[1], ARGV[4])
+return {}
+"""
+
+_timings_script = redis_client.register_script(TIMINGS_LUA)
+_async_timings_script = async_redis_client.register_script(TIMINGS_LUA)
+
+# Celery queues live on the broker, which may be a different Redis
+broker_client = None
+if (Config.CELERY_BROKER_URL or "").startswith(("redis://", "rediss://")):
+    broker_client = redis.Redis.from_url(Config.CELERY_BROKER_URL)
+
+
+def _timings_key(job_id):
+    """Redis hash accumulating a job's stage timings across stages"""
+    return f"timings:{job_id}"
+
+
+def _stage_key(stage):
+    """Redis hash of bucket counts, sum and count for one stage"""
+    return f"metrics:stage:{stage}"
+
+
+def _epoch(moment):
+    """Unix time of a naive UTC datetime"""
+    return calendar.timegm(moment.utctimetuple()) + moment.microsecond / 1e6
+
+
+def _timings_args(timings, wait, final):
+    queued_at = timings.queued_at
+    args = [
+        timings.started if wait else "",
+        _epoch(queued_at) if queued_at else "",
+        time.time(),
+        Config.STAGE_PAYLOAD_TTL_SECONDS,
+        "1" if final else "0",
+    ]
+    for stage, ms in timings.snapshot().items():
+        args += [stage, ms]
+    return args
+
+
+def _decode_totals(raw):
+    totals = {}
+    for name, value in zip(raw[::2], raw[1::2]):
+        name = name.decode()
+        if not name.startswith("_"):
+            totals[name] = round(float(value), 1)
+    return totals
+
+
+def flush_stage_timings(job_id, timings, wait=True):
+    """Add a stage's timings to the job's totals and mark the hand-off.
+
+    wait=False skips queue wait, for work done before the job was queued.
+    """
+    try:
+        _timings_script(
+            keys=[_timings_key(job_id)], args=_timings_args(timings, wait, False)
+        )
+    except Exception as e:
+        logger.error("Recording timings for job %s failed: %s", job_id, str(e))
+
+
+def finish_stage_timings(job_id, timings):
+    """Add the last stage's timings and return the job's totals in ms"""
+    timings.finished = True
+    try:
+        raw = _timings_script(
+            keys=[_timings_key(job_id)], args=_timings_args(timings, True, True)
+        )
+        return _decode_totals(raw)
+    except Exception as e:
+        logger.error("Collecting timings for job %s failed: %s", job_id, str(e))
+        return timings.snapshot()
+
+
+async def afinish_stage_timings(job_id, timings):
+    """Async variant of finish_stage_timings"""
+    timings.finished = True
+    try:
+        raw = await _async_timings_script(
+            keys=[_timings_key(job_id)], args=_timings_args(timings, True, True)
+        )
+        return _decode_totals(raw)
+    except Exception as e:
+        logger.error("Collecting timings for job %s failed: %s", job_id, str(e))
+        return timings.snapshot()
+
+
+@contextmanager
+def stage_timings(job_id):
+    """Record a pipeline stage and add its timings to the job's totals.
+
+    Nothing is added when the job finished inside, since finishing
+    collects the totals.
+    """
+    with recording() as timings:
+        try:
+            yield timings
+        finally:
+            if not timings.finished:
+                flush_stage_timings(job_id, timings)
+
+
+def _cache_outcome(cached, similarity):
+    if similarity is not None:
+        return "similar"
+    return "hit" if cached else "miss"
+
+
+def _bucket(seconds):
+    for bound in STAGE_BUCKETS:
+        if seconds <= bound:
+            return str(bound)
+    return "+Inf"
+
+
+def _observe(pipe, status, cached, similarity, timings, count):
+    status = getattr(status, "value", status)
+    outcome = _cache_outcome(cached, similarity)
+    pipe.hincrby(JOBS_KEY, f"{status}:{outcome}", count)
+    for stage, ms in (timings or {}).items():
+        if stage not in STAGES:
+            continue
+        seconds = ms / 1000
+        pipe.hincrby(_stage_key(stage), _bucket(seconds), count)
+        pipe.hincrbyfloat(_stage_key(stage), "sum", seconds * count)
+        pipe.hincrby(_stage_key(stage), "count", count)
+
+
+def observe_job(status, cached, similarity=None, timings=None, count=1):
+    """Add count finished jobs with the same outcome and timings to the metrics"""
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        _observe(pipe, status, cached, similarity, timings, count)
+        pipe.execute()
+    except Exception as e:
+        logger.error("Recording job metrics failed: %s", str(e))
+
+
+async def aobserve_job(status, cached, similarity=None, timings=None, count=1):
+    """Async variant of observe_job"""
+    try:
+        pipe = async_redis_client.pipeline(transaction=False)
+        _observe(pipe, status, cached, similarity, timings, count)
+        await pipe.execute()
+    except Exception as e:
+        logger.error("Recording job metrics failed: %s", str(e))
+
+
+@contextmanager
+def llm_call():
+    """Time an LLM call as the llm stage and count it as in flight"""
+    call_id = uuid.uuid4().hex
+    try:
+        redis_client.zadd(LLM_INFLIGHT_KEY, {call_id: time.time()})
+    except Exception as e:
+        logger.error("Tracking LLM call failed: %s", str(e))
+    try:
+        with timed("llm"):
+            yield
+    finally:
+        try:
+            redis_client.zrem(LLM_INFLIGHT_KEY, call_id)
+        except Exception as e:
+            logger.error("Tracking LLM call failed: %s", str(e))
+
+
+@asynccontextmanager
+async def allm_call():
+    """Async variant of llm_call"""
+    call_id = uuid.uuid4().hex
+    try:
+        await async_redis_client.zadd(LLM_INFLIGHT_KEY, {call_id: time.time()})
+    except Exception as e:
+        logger.error("Tracking LLM call failed: %s", str(e))
+    try:
+        with timed("llm"):
+            yield
+    finally:
+        try:
+            await async_redis_client.zrem(LLM_INFLIGHT_KEY, call_id)
+        except Exception as e:
+            logger.error("Tracking LLM call failed: %s", str(e))
+
+
+def _queue_names(*queues):
+    """Queues and their bulk-priority counterparts"""
+    return [
+        name
+        for queue in queues
+        for name in (queue, f"{queue}{Config.CELERY_BULK_QUEUE_SUFFIX}")
+    ]
+
+
+class _ClusterCollector:
+    """Read cluster-wide metrics from Redis at scrape time"""
+
+    def collect(self):
+        try:
+            yield from self._collect()
+        except Exception as e:
+            logger.error("Collecting metrics from Redis failed: %s", str(e))
+
+    def _collect(self):
+        async_queues = _queue_names(Config.ASYNC_JOB_QUEUE)
+        pipe = redis_client.pipeline(transaction=False)
+        for stage in STAGES:
+            pipe.hgetall(_stage_key(stage))
+        pipe.hgetall(JOBS_KEY)
+        pipe.zremrangebyscore(
+            LLM_INFLIGHT_KEY, "-inf", time.time() - Config.METRICS_LLM_CALL_MAX_SECONDS
+        )
+        pipe.zcard(LLM_INFLIGHT_KEY)
+        for queue in async_queues:
+            pipe.llen(queue)
+        results = pipe.execute()
+
+        stages = HistogramMetricFamily(
+            "summarizer_stage_seconds",
+            "Time finished jobs spent per stage",
+            labels=["stage"],
+        )
+        for stage, values in zip(STAGES, results):
+            values = {k.decode(): v for k, v in values.items()}
+            buckets = []
+            cumulative = 0
+            for bound in STAGE_BUCKETS:
+                cumulative += int(values.get(str(bound), 0))
+                buckets.append((floatToGoString(bound), cumulative))
+            buckets.append(("+Inf", int(values.get("count", 0))))
+            stages.add_metric([stage], buckets, float(values.get("sum", 0)))
+        yield stages
+
+        jobs = CounterMetricFamily(
+            "summarizer_jobs",
+            "Finished jobs by status and summary cache outcome",
+            labels=["status", "cache"],
+        )
+        completed = hits = 0
+        for field, value in results[len(STAGES)].items():
+            status, outcome = field.decode().split(":", 1)
+            jobs.add_metric([status, outcome], int(value))
+            if status == "completed":
+                completed += int(value)
+                hits += int(value) if outcome != "miss" else 0
+        yield jobs
+        yield GaugeMetricFamily(
+            "summarizer_cache_hit_ratio",
+            "Share of completed jobs served from the summary cache",
+            value=hits / completed if completed else 0,
+        )
+
+        yield GaugeMetricFamily(
+            "summarizer_llm_inflight_calls",
+            "LLM calls in progress across all workers",
+            value=results[len(STAGES) + 2],
+        )
+
+        depth = GaugeMetricFamily(
+            "summarizer_queue_depth", "Jobs waiting in each queue", labels=["queue"]
+        )
+        for queue, length in zip(async_queues, results[len(STAGES) + 3 :]):
+            depth.add_metric([queue], length)
+        if broker_client is not None:
+            celery_queues = _queue_names(
+                Config.CELERY_DISPATCH_QUEUE,
+                Config.CELERY_FETCH_QUEUE,
+                Config.CELERY_EXTRACT_QUEUE,
+                Config.CELERY_SUMMARIZE_QUEUE,
+            )
+            pipe = broker_client.pipeline(transaction=False)
+            for queue in celery_queues:
+                pipe.llen(queue)
+            for queue, length in zip(celery_queues, pipe.execute()):
+                depth.add_metric([queue], length)
+        yield depth
+
+
+class _ProcessCollector:
+    """Cache tier counters of the process serving the scrape"""
+
+    def collect(self):
+        stats = cache_stats()
+        events = CounterMetricFamily(
+            "summarizer_cache_events",
+            "Summary cache events in this process by tier",
+            labels=["tier", "event"],
+        )
+        for tier, counters in stats.items():
+            for event, value in counters.items():
+                if event not in ("entries", "bytes", "max_bytes"):
+                    events.add_metric([tier, event], value)
+        yield events
+        yield GaugeMetricFamily(
+            "summarizer_cache_l1_bytes",
+            "Bytes held by this process's in-memory summary cache",
+            value=stats["l1"]["bytes"],
+        )
+        yield GaugeMetricFamily(
+            "summarizer_cache_l1_entries",
+            "Entries in this process's in-memory summary cache",
+            value=stats["l1"]["entries"],
+        )
+
+
+registry = CollectorRegistry()
+registry.register(_ClusterCollector())
+registry.register(_ProcessCollector())
+
+
+def render_metrics():
+    """All metrics in the Prometheus text format"""
+    return generate_latest(registry)
@@ -0,0 +1,236 @@
+"""
+Time-based partitioning, retention and archival of the jobs table.
+
+On Postgres the jobs table is partitioned by range of created_at into
+partitions of JOB_PARTITION_DAYS days, named jobs_p<first day>. Job ids
+carry their created_at (see app.models.new_job_key) and lookups filter on
+it, so inserts and lookups only touch the indexes of one live partition and
+their cost stays flat as history accumulates. A periodic task creates partitions ahead of time and
+detaches the ones that ended more than JOB_RETENTION_DAYS ago. Each detached
+partition is copied to a gzipped CSV file in JOB_ARCHIVE_DIR and then
+dropped. A partition detached by an interrupted run is picked up by the next
+one. Other databases are not partitioned and nothing is expired.
+"""
+
+from datetime import date, datetime, timedelta
+from sqlalchemy import text
+from app.config import Config
+from app.models import db
+import gzip
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+PARTITION_PREFIX = "jobs_p"
+DEFAULT_PARTITION = "jobs_default"
+
+# Keys of the advisory locks serializing partition creation and retention runs
+PARTITION_LOCK_KEY = 0x6A6F6273
+RETENTION_LOCK_KEY = 0x6A6F6274
+
+_UPPER_BOUND_RE = re.compile(r"TO \('([^']+)'\)")
+
+
+def partition_start(moment):
+    """First day of the partition holding moment.
+
+    Partitions are aligned to 0001-01-01, so weekly ones start on Mondays.
+    """
+    days = Config.JOB_PARTITION_DAYS
+    ordinal = moment.toordinal() - 1
+    return date.fromordinal(ordinal - ordinal % days + 1)
+
+
+def partition_name(start):
+    return f"{PARTITION_PREFIX}{start:%Y%m%d}"
+
+
+def _is_partitioned(conn):
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(
+        conn.execute(
+            text(
+                "SELECT 1 FROM pg_partitioned_table "
+                "WHERE partrelid = to_regclass('jobs')"
+            )
+        ).scalar()
+    )
+
+
+def _upper_bound(bound):
+    """End of a partition from its FOR VALUES clause, or None if unbounded"""
+    match = _UPPER_BOUND_RE.search(bound or "")
+    return datetime.fromisoformat(match.group(1)) if match else None
+
+
+def _create_partition(conn, name, lower, upper):
+    """Create one partition unless it exists; returns True if created"""
+    exists = conn.execute(
+        text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}
+    ).scalar()
+    if exists:
+        return False
+    # Fails if the default partition already holds rows in the range
+    try:
+        with conn.begin_nested():
+            conn.execute(
+                text(
+                    f'CREATE TABLE "{name}" PARTITION OF jobs '
+                    f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+                )
+            )
+        return True
+    except Exception as e:
+        logger.error("Creating job partition %s failed: %s", name, e)
+        return False
+
+
+def ensure_job_partitions(now=None, since=None):
+    """Create the current and the next JOB_PARTITIONS_AHEAD partitions.
+
+    since, if given, also creates the partitions from that moment on, for
+    loading older rows. A default partition catches rows no partition
+    covers, so inserts keep working if maintenance stops running.
+    """
+    now = now or datetime.utcnow()
+    lower = partition_start(since or now)
+    last = partition_start(now) + timedelta(
+        days=Config.JOB_PARTITIONS_AHEAD * Config.JOB_PARTITION_DAYS
+    )
+    created = []
+    with db.engine.begin() as conn:
+        if not _is_partitioned(conn):
+            return created
+        conn.execute(
+            text("SELECT pg_advisory_xact_lock(:key)"), {"key": PARTITION_LOCK_KEY}
+        )
+        conn.execute(
+            text(
+                f'CREATE TABLE IF NOT EXISTS "{DEFAULT_PARTITION}" '
+                "PARTITION OF jobs DEFAULT"
+            )
+        )
+        while lower <= last:
+            upper = lower + timedelta(days=Config.JOB_PARTITION_DAYS)
+            name = partition_name(lower)
+            if _create_partition(conn, name, lower, upper):
+                created.append(name)
+            lower = upper
+    if created:
+        logger.info("Created job partitions: %s", ", ".join(created))
+    return created
+
+
+def detach_expired_partitions(now=None):
+    """Detach partitions that ended before the retention cutoff"""
+    cutoff = (now or datetime.utcnow()) - timedelta(days=Config.JOB_RETENTION_DAYS)
+    with db.engine.connect() as conn:
+        if not _is_partitioned(conn):
+            return []
+        partitions = conn.execute(
+            text(
+                "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+                "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = to_regclass('jobs')"
+            )
+        ).all()
+
+    detached = []
+    for name, bound in partitions:
+        upper = _upper_bound(bound)
+        if upper is None or upper > cutoff:
+            continue
+        with db.engine.begin() as conn:
+            conn.execute(text(f'ALTER TABLE jobs DETACH PARTITION "{name}"'))
+        logger.info("Detached job partition %s (ended %s)", name, upper)
+        detached.append(name)
+    return detached
+
+
+def detached_partitions():
+    """Job partitions detached but not yet archived and dropped"""
+    with db.engine.connect() as conn:
+        if conn.dialect.name != "postgresql":
+            return []
+        return list(
+            conn.execute(
+                text(
+                    "SELECT c.relname FROM pg_class c "
+                    "JOIN pg_namespace n ON n.oid = c.relnamespace "
+                    "WHERE n.nspname = current_schema() AND c.relkind = 'r' "
+                    "AND NOT c.relispartition AND c.relname LIKE :pattern "
+                    "ORDER BY c.relname"
+                ),
+                {"pattern": PARTITION_PREFIX.replace("_", "\\_") + "%"},
+            ).scalars()
+        )
+
+
+def archive_partition(name):
+    """Copy a detached partition to a gzipped CSV file, then drop it.
+
+    The file is written under a temporary name and renamed once complete,
+    so a file with the final name always holds the whole partition.
+    """
+    os.makedirs(Config.JOB_ARCHIVE_DIR, exist_ok=True)
+    path = os.path.join(Config.JOB_ARCHIVE_DIR, f"{name}.csv.gz")
+    partial = f"{path}.partial"
+
+    raw = db.engine.raw_connection()
+    try:
+        with gzip.open(partial, "wt", encoding="utf-8") as archive:
+            cursor = raw.cursor()
+            cursor.copy_expert(
+                f'COPY "{name}" TO STDOUT WITH (FORMAT csv, HEADER)', archive
+            )
+            cursor.close()
+        with open(partial, "rb") as archive:
+            os.fsync(archive.fileno())
+        os.replace(partial, path)
+
+        cursor = raw.cursor()
+        cursor.execute(f'DROP TABLE "{name}"')
+        cursor.close()
+        raw.commit()
+    finally:
+        raw.close()
+
+    logger.info("Archived job partition %s to %s", name, path)
+    return path
+
+
+def run_retention(now=None):
+    """Create upcoming partitions, then detach, archive and drop expired ones.
+
+    Returns None without doing anything if another run holds the lock.
+    """
+    with db.engine.connect() as lock:
+        postgres = lock.dialect.name == "postgresql"
+        if (
+            postgres
+            and not lock.execute(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": RETENTION_LOCK_KEY}
+            ).scalar()
+        ):
+            logger.info("Job retention already running elsewhere, skipping")
+            return None
+        try:
+            created = ensure_job_partitions(now)
+            detach_expired_partitions(now)
+
+            archived = []
+            for name in detached_partitions():
+                try:
+                    archived.append(archive_partition(name))
+                except Exception as e:
+                    logger.error("Archiving job partition %s failed: %s", name, e)
+            return {"created": created, "archived": archived}
+        finally:
+            if postgres:
+                lock.execute(
+                    text("SELECT pg_advisory_unlock(:key)"),
+                    {"key": RETENTION_LOCK_KEY},
+                )
@@ -0,0 +1,169 @@
+"""
+Near-duplicate lookup over summarized texts.
+
+Each summarized text is indexed by its MinHash signature: the signature is
+stored under the text hash and the hash is added to one Redis sorted set
+per LSH band, scored by when it was indexed. A new text is compared only
+against texts sharing a band with it, and the closest one at or above
+SIMILARITY_THRESHOLD lends its cached summary, so pages that differ only
+in timestamps, ads or formatting skip the LLM.
+
+Every write drops band members older than SIMILARITY_TTL_SECONDS and
+trims the band to its SIMILARITY_BAND_MAX_MEMBERS newest, and lookups read
+at most that many per band. Bands shared by many texts, such as
+boilerplate pages, keep a bounded size and lookup cost.
+"""
+
+from collections import Counter
+from app.config import Config
+from app.services.cache_service import (
+    redis_client,
+    async_redis_client,
+    get_cached_summary,
+    aget_cached_summary,
+)
+from app.utils.minhash import band_keys, pack, shingles, signature, similarity, unpack
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _band_key(band):
+    """Redis sorted set of text hashes whose signatures share one LSH band"""
+    return f"sim:zband:{band}"
+
+
+def _signature_key(text_hash):
+    """Redis key holding the MinHash signature of a summarized text"""
+    return f"sim:sig:{text_hash}"
+
+
+def text_signature(text):
+    """Signature of text for the index.
+
+    None when near-duplicate matching is disabled or the text is too short
+    for its shingles to be meaningful.
+    """
+    if not Config.SIMILARITY_ENABLED:
+        return None
+    hashes = shingles(text, Config.SIMILARITY_SHINGLE_SIZE)
+    if len(hashes) < Config.SIMILARITY_MIN_SHINGLES:
+        return None
+    return signature(hashes, Config.SIMILARITY_NUM_PERM)
+
+
+def _read_bands(pipe, sig):
+    """Queue reads of the newest live members of each band of sig"""
+    oldest = time.time() - Config.SIMILARITY_TTL_SECONDS
+    for band in band_keys(sig, Config.SIMILARITY_BANDS):
+        pipe.zrevrangebyscore(
+            _band_key(band),
+            "+inf",
+            oldest,
+            start=0,
+            num=Config.SIMILARITY_BAND_MAX_MEMBERS,
+        )
+
+
+def _write_bands(pipe, text_hash, sig):
+    """Queue adding text_hash to the bands of sig and trimming them"""
+    now = time.time()
+    ttl = Config.SIMILARITY_TTL_SECONDS
+    pipe.set(_signature_key(text_hash), pack(sig), ex=ttl)
+    for band in band_keys(sig, Config.SIMILARITY_BANDS):
+        key = _band_key(band)
+        pipe.zadd(key, {text_hash: now})
+        pipe.zremrangebyscore(key, "-inf", now - ttl)
+        pipe.zremrangebyrank(key, 0, -Config.SIMILARITY_BAND_MAX_MEMBERS - 1)
+        pipe.expire(key, ttl)
+
+
+def _candidates(members):
+    """Text hashes from the band sets, those sharing the most bands first"""
+    counts = Counter(m.decode() for band in members for m in band)
+    return [h for h, _ in counts.most_common(Config.SIMILARITY_MAX_CANDIDATES)]
+
+
+def _best_match(sig, candidates, packed):
+    """Closest candidate at or above the threshold as (text_hash, similarity)"""
+    best = None
+    for text_hash, data in zip(candidates, packed):
+        if data is None:
+            continue
+        score = similarity(sig, unpack(data))
+        if score >= Config.SIMILARITY_THRESHOLD and (best is None or score > best[1]):
+            best = (text_hash, score)
+    return best
+
+
+def find_similar_summary(sig):
+    """Cached summary of the closest indexed text as (summary, similarity).
+
+    Returns None when nothing similar enough is indexed or its summary has
+    expired. Errors are logged and treated as a miss.
+    """
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        _read_bands(pipe, sig)
+        candidates = _candidates(pipe.execute())
+        if not candidates:
+            return None
+
+        packed = redis_client.mget([_signature_key(h) for h in candidates])
+        match = _best_match(sig, candidates, packed)
+        if match is None:
+            return None
+
+        summary = get_cached_summary(match[0])
+        if summary is None:
+            return None
+        logger.info("Near-duplicate of %s (similarity %.2f)", match[0], match[1])
+        return summary, match[1]
+    except Exception as e:
+        logger.error("Similarity lookup failed: %s", str(e))
+        return None
+
+
+def index_text(text_hash, sig):
+    """Make a summarized text available to near-duplicate lookups"""
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        _write_bands(pipe, text_hash, sig)
+        pipe.execute()
+    except Exception as e:
+        logger.error("Similarity index update failed for %s: %s", text_hash, str(e))
+
+
+async def afind_similar_summary(sig):
+    """Async variant of find_similar_summary"""
+    try:
+        pipe = async_redis_client.pipeline(transaction=False)
+        _read_bands(pipe, sig)
+        candidates = _candidates(await pipe.execute())
+        if not candidates:
+            return None
+
+        packed = await async_redis_client.mget([_signature_key(h) for h in candidates])
+        match = _best_match(sig, candidates, packed)
+        if match is None:
+            return None
+
+        summary = await aget_cached_summary(match[0])
+        if summary is None:
+            return None
+        logger.info("Near-duplicate of %s (similarity %.2f)", match[0], match[1])
+        return summary, match[1]
+    except Exception as e:
+        logger.error("Similarity lookup failed: %s", str(e))
+        return None
+
+
+async def aindex_text(text_hash, sig):
+    """Async variant of index_text"""
+    try:
+        pipe = async_redis_client.pipeline(transaction=False)
+        _write_bands(pipe, text_hash, sig)
+        await pipe.execute()
+    except Exception as e:
+        logger.error("Similarity index update failed for %s: %s", text_hash, str(e))
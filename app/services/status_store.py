@@ -0,0 +1,292 @@
+from enum import Enum
+from app.config import Config
+from app.models import ContentType, JobStatus
+from app.services.cache_service import redis_client, async_redis_client
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+# Fields a status entry must have to answer /status and /result on its own
+REQUIRED_FIELDS = ("status", "created_at")
+
+TERMINAL_STATUSES = (JobStatus.COMPLETED, JobStatus.FAILED)
+
+
+# Fill in the fields of a status entry that are not set yet and return the
+# entry. Fields written meanwhile by a worker are newer than the Postgres
+# row the backfill comes from, so they are kept. ARGV[1] is the TTL of an
+# entry that did not exist; the rest are field/value pairs.
+BACKFILL_LUA = """
+local existed = redis.call('exists', KEYS[1])
+for i = 2, #ARGV, 2 do
+    redis.call('hsetnx', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+if existed == 0 then
+    redis.call('expire', KEYS[1], ARGV[1])
+end
+return redis.call('hgetall', KEYS[1])
+"""
+_backfill_script = redis_client.register_script(BACKFILL_LUA)
+
+
+def _status_key(job_id):
+    """Redis hash holding the hot status fields of a job"""
+    return f"job:{job_id}"
+
+
+def _encode(fields):
+    """Convert field values to the strings stored in the Redis hash"""
+    encoded = {}
+    for name, value in fields.items():
+        if value is None:
+            encoded[name] = ""
+        elif isinstance(value, bool):
+            encoded[name] = "1" if value else "0"
+        elif isinstance(value, Enum):
+            encoded[name] = value.value
+        elif hasattr(value, "isoformat"):
+            encoded[name] = value.isoformat()
+        else:
+            encoded[name] = value
+    return encoded
+
+
+def _decode(values):
+    """Turn a raw Redis hash into a status dict, or None if incomplete"""
+    entry = {k.decode(): v.decode() for k, v in values.items()}
+    if not all(entry.get(name) for name in REQUIRED_FIELDS):
+        return None
+
+    entry["cached"] = entry.get("cached") == "1"
+    ms = entry.get("processing_time_ms")
+    entry["processing_time_ms"] = int(ms) if ms else None
+    similarity = entry.get("similarity")
+    entry["similarity"] = float(similarity) if similarity else None
+    entry["summary"] = entry.get("summary") or None
+    entry["original_url"] = entry.get("original_url") or None
+    return entry
+
+
+def result_fields(job, summary=None):
+    """Hot status fields that change as a job runs.
+
+    summary is the text behind the job's summary_id.
+    """
+    return {
+        "status": job.status,
+        "cached": job.cached,
+        "similarity": job.similarity,
+        "processing_time_ms": job.processing_time_ms,
+        "summary": summary,
+    }
+
+
+def job_fields(job, summary=None, original_url=None):
+    """All hot status fields of a job.
+
+    Job rows reference their texts by id, so the summary and, for URL jobs,
+    the submitted URL are passed in.
+    """
+    fields = {"created_at": job.created_at, **result_fields(job, summary)}
+    if job.content_type == ContentType.URL:
+        fields["original_url"] = original_url
+    return fields
+
+
+def set_job_status(job_id, **fields):
+    """Write-through update of a job's hot status fields"""
+    try:
+        pipe = redis_client.pipeline()
+        pipe.hset(_status_key(job_id), mapping=_encode(fields))
+        pipe.expire(_status_key(job_id), Config.JOB_STATUS_TTL_SECONDS)
+        pipe.execute()
+    except Exception as e:
+        logger.error("Status store update failed for job %s: %s", job_id, str(e))
+
+
+def set_many_job_status(job_ids, **fields):
+    """Apply the same status update to several jobs in one round trip"""
+    if not job_ids:
+        return
+    try:
+        encoded = _encode(fields)
+        pipe = redis_client.pipeline()
+        for job_id in job_ids:
+            pipe.hset(_status_key(job_id), mapping=encoded)
+            pipe.expire(_status_key(job_id), Config.JOB_STATUS_TTL_SECONDS)
+        pipe.execute()
+    except Exception as e:
+        logger.error("Status store update failed for %d jobs: %s", len(job_ids), e)
+
+
+def store_job(job, summary=None, original_url=None):
+    """Write all hot status fields of a job"""
+    set_job_status(job.id, **job_fields(job, summary, original_url))
+
+
+def store_jobs(fields_by_id):
+    """Write the hot status fields of several jobs in one round trip.
+
+    fields_by_id maps job ids to their job_fields.
+    """
+    if not fields_by_id:
+        return
+    try:
+        pipe = redis_client.pipeline()
+        for job_id, fields in fields_by_id.items():
+            pipe.hset(_status_key(job_id), mapping=_encode(fields))
+            pipe.expire(_status_key(job_id), Config.JOB_STATUS_TTL_SECONDS)
+        pipe.execute()
+    except Exception as e:
+        logger.error("Status store update failed for %d jobs: %s", len(fields_by_id), e)
+
+
+def _backfill_ttl(fields):
+    """TTL of an entry backfilled from Postgres.
+
+    Terminal states reach Postgres through the buffered job writer, so an
+    unfinished row may be up to a flush interval behind. Those entries only
+    live a few flush intervals, so later polls read Postgres again.
+    """
+    if fields["status"] in TERMINAL_STATUSES:
+        return Config.JOB_STATUS_TTL_SECONDS
+    return max(1, math.ceil(3 * Config.JOB_WRITE_FLUSH_INTERVAL_MS / 1000))
+
+
+def _backfill_args(fields):
+    args = [_backfill_ttl(fields)]
+    for name, value in _encode(fields).items():
+        args += [name, value]
+    return args
+
+
+def _pairs(values):
+    """Dict of a flat HGETALL reply from a script"""
+    return dict(zip(values[::2], values[1::2]))
+
+
+def backfill_job_status(job_id, fields):
+    """Fill a missing or partial entry from job_fields read from Postgres.
+
+    Returns the resulting entry, which keeps any field a worker wrote since
+    the row was read, or None if the store is unavailable.
+    """
+    try:
+        values = _backfill_script(
+            keys=[_status_key(job_id)], args=_backfill_args(fields)
+        )
+        return _decode(_pairs(values))
+    except Exception as e:
+        logger.error("Status store backfill failed for job %s: %s", job_id, str(e))
+        return None
+
+
+def backfill_many_job_status(fields_by_id):
+    """backfill_job_status for several jobs in one round trip.
+
+    Returns the resulting entries by job id; None where unavailable.
+    """
+    if not fields_by_id:
+        return {}
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for job_id, fields in fields_by_id.items():
+            _backfill_script(
+                keys=[_status_key(job_id)], args=_backfill_args(fields), client=pipe
+            )
+        results = pipe.execute()
+        return {
+            job_id: _decode(_pairs(values))
+            for job_id, values in zip(fields_by_id, results)
+        }
+    except Exception as e:
+        logger.error(
+            "Status store backfill failed for %d jobs: %s", len(fields_by_id), e
+        )
+        return dict.fromkeys(fields_by_id)
+
+
+def _terminal(db_status, stored):
+    if db_status in TERMINAL_STATUSES:
+        return db_status
+    if stored and JobStatus(stored.decode()) in TERMINAL_STATUSES:
+        return JobStatus(stored.decode())
+    return None
+
+
+def finished_status(job_id, db_status):
+    """Terminal status of a job, or None if it has not finished.
+
+    Postgres gets terminal states from the buffered job writer, up to a
+    flush interval after the status store, so an unfinished db_status is
+    checked against the store.
+    """
+    if db_status in TERMINAL_STATUSES:
+        return db_status
+    try:
+        return _terminal(db_status, redis_client.hget(_status_key(job_id), "status"))
+    except Exception as e:
+        logger.error("Status store read failed for job %s: %s", job_id, str(e))
+        return None
+
+
+async def afinished_status(job_id, db_status):
+    """Async variant of finished_status"""
+    if db_status in TERMINAL_STATUSES:
+        return db_status
+    try:
+        stored = await async_redis_client.hget(_status_key(job_id), "status")
+        return _terminal(db_status, stored)
+    except Exception as e:
+        logger.error("Status store read failed for job %s: %s", job_id, str(e))
+        return None
+
+
+def get_job_status(job_id):
+    """Read a job's hot status, or None if it is not in the store"""
+    try:
+        return _decode(redis_client.hgetall(_status_key(job_id)))
+    except Exception as e:
+        logger.error("Status store read failed for job %s: %s", job_id, str(e))
+        return None
+
+
+def get_many_job_status(job_ids):
+    """Read several jobs' hot status in one round trip; None for misses"""
+    if not job_ids:
+        return []
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for job_id in job_ids:
+            pipe.hgetall(_status_key(job_id))
+        return [_decode(values) for values in pipe.execute()]
+    except Exception as e:
+        logger.error("Status store read failed for %d jobs: %s", len(job_ids), e)
+        return [None] * len(job_ids)
+
+
+async def aset_job_status(job_id, **fields):
+    """Async variant of set_job_status"""
+    try:
+        pipe = async_redis_client.pipeline()
+        pipe.hset(_status_key(job_id), mapping=_encode(fields))
+        pipe.expire(_status_key(job_id), Config.JOB_STATUS_TTL_SECONDS)
+        await pipe.execute()
+    except Exception as e:
+        logger.error("Status store update failed for job %s: %s", job_id, str(e))
+
+
+async def aset_many_job_status(job_ids, **fields):
+    """Async variant of set_many_job_status"""
+    if not job_ids:
+        return
+    try:
+        encoded = _encode(fields)
+        pipe = async_redis_client.pipeline()
+        for job_id in job_ids:
+            pipe.hset(_status_key(job_id), mapping=encoded)
+            pipe.expire(_status_key(job_id), Config.JOB_STATUS_TTL_SECONDS)
+        await pipe.execute()
+    except Exception as e:
+        logger.error("Status store update failed for %d jobs: %s", len(job_ids), e)
@@ -0,0 +1,119 @@
+from app.config import Config
+from app.services.cache_service import redis_client, async_redis_client
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _stream_key(job_id):
+    """Redis stream holding a job's summary tokens as they are generated"""
+    return f"tokens:{job_id}"
+
+
+class TokenStreamWriter:
+    """Append a job's summary tokens to its Redis stream as they arrive.
+
+    Tokens are buffered and written every TOKEN_FLUSH_SECONDS, except the
+    first of each attempt, which is written at once to keep time to first
+    token low. The first entry of each attempt carries a reset flag so
+    readers drop output from an earlier attempt that failed part way.
+    Errors writing the stream are logged and never fail the summary.
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self._buffer = []
+        self._flushed_at = None
+        self._fresh = True
+
+    def begin(self):
+        """Start a new attempt at generating the summary"""
+        self._buffer = []
+        self._flushed_at = None
+        self._fresh = True
+
+    def _due(self):
+        return (
+            self._flushed_at is None
+            or time.monotonic() - self._flushed_at >= Config.TOKEN_FLUSH_SECONDS
+        )
+
+    def _entry(self):
+        """Fields of the next stream entry from buffered tokens"""
+        fields = {"text": "".join(self._buffer)}
+        if self._fresh:
+            fields["reset"] = "1"
+        self._buffer = []
+        self._flushed_at = time.monotonic()
+        self._fresh = False
+        return fields
+
+    def write(self, text):
+        """Buffer a token, writing the buffer out when a flush is due"""
+        self._buffer.append(text)
+        if self._due():
+            self.flush()
+
+    def replace(self, text):
+        """Write a complete result as a new attempt in one entry"""
+        self.begin()
+        self._buffer.append(text)
+        self.flush()
+
+    def flush(self):
+        """Write any buffered tokens to the stream"""
+        if not self._buffer:
+            return
+        key = _stream_key(self.job_id)
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.xadd(key, self._entry())
+            pipe.expire(key, Config.TOKEN_STREAM_TTL_SECONDS)
+            pipe.execute()
+        except Exception as e:
+            logger.error("Writing tokens for job %s failed: %s", self.job_id, str(e))
+
+
+class AsyncTokenStreamWriter(TokenStreamWriter):
+    """Async variant of TokenStreamWriter"""
+
+    async def write(self, text):
+        self._buffer.append(text)
+        if self._due():
+            await self.flush()
+
+    async def replace(self, text):
+        self.begin()
+        self._buffer.append(text)
+        await self.flush()
+
+    async def flush(self):
+        if not self._buffer:
+            return
+        key = _stream_key(self.job_id)
+        try:
+            pipe = async_redis_client.pipeline(transaction=False)
+            pipe.xadd(key, self._entry())
+            pipe.expire(key, Config.TOKEN_STREAM_TTL_SECONDS)
+            await pipe.execute()
+        except Exception as e:
+            logger.error("Writing tokens for job %s failed: %s", self.job_id, str(e))
+
+
+def read_tokens(job_id, last_id="0-0", block_seconds=None):
+    """Stream entries after last_id as (entry_id, fields) with str values.
+
+    Blocks up to block_seconds for new entries when given.
+    """
+    block = int(block_seconds * 1000) if block_seconds else None
+    result = redis_client.xread({_stream_key(job_id): last_id}, block=block)
+    if not result:
+        return []
+    return [
+        (
+            entry_id.decode(),
+            {k.decode(): v.decode() for k, v in fields.items()},
+        )
+        for entry_id, fields in result[0][1]
+    ]
@@ -0,0 +1,120 @@
+from app.config import Config
+from app.services.cache_service import redis_client, async_redis_client
+from app.utils.cache_keys import url_hash
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _url_key(url):
+    """Redis key of the fetched-content entry for a URL.
+
+    Keyed by the canonical URL, so variants differing only in tracking
+    parameters or host case share one entry.
+    """
+    return f"url:{url_hash(url)}"
+
+
+def _decode_entry(values):
+    """Turn raw HGETALL output into an entry dict, or None if absent"""
+    if not values:
+        return None
+    entry = {k.decode(): v.decode() for k, v in values.items()}
+    entry["fresh_until"] = float(entry.get("fresh_until") or 0)
+    return entry
+
+
+def is_fresh(entry):
+    """Whether an entry can be used without revalidating with the origin"""
+    return entry is not None and entry["fresh_until"] > time.time()
+
+
+def _entry_mapping(text, etag, last_modified):
+    """Hash fields for a newly fetched page"""
+    return {
+        "text": text,
+        "etag": etag or "",
+        "last_modified": last_modified or "",
+        "fresh_until": time.time() + Config.URL_CONTENT_TTL_SECONDS,
+    }
+
+
+def get_url_entry(url):
+    """Return the cached extracted text and validators for a URL"""
+    try:
+        entry = _decode_entry(redis_client.hgetall(_url_key(url)))
+        logger.info("URL cache %s for: %s", "hit" if entry else "miss", url)
+        return entry
+    except Exception as e:
+        logger.error("URL cache get failed for %s: %s", url, str(e))
+        return None
+
+
+def store_url_entry(url, text, etag=None, last_modified=None):
+    """Cache a page's extracted text and its validators"""
+    try:
+        mapping = _entry_mapping(text, etag, last_modified)
+        pipe = redis_client.pipeline()
+        pipe.hset(_url_key(url), mapping=mapping)
+        pipe.expire(_url_key(url), Config.URL_CONTENT_RETENTION_SECONDS)
+        pipe.execute()
+        logger.info("URL cache set for: %s", url)
+        return mapping
+    except Exception as e:
+        logger.error("URL cache set failed for %s: %s", url, str(e))
+        return None
+
+
+def touch_url_entry(url):
+    """Mark an entry fresh again after the origin answered 304"""
+    try:
+        pipe = redis_client.pipeline()
+        pipe.hset(
+            _url_key(url), "fresh_until", time.time() + Config.URL_CONTENT_TTL_SECONDS
+        )
+        pipe.expire(_url_key(url), Config.URL_CONTENT_RETENTION_SECONDS)
+        pipe.execute()
+        logger.info("URL cache revalidated for: %s", url)
+    except Exception as e:
+        logger.error("URL cache touch failed for %s: %s", url, str(e))
+
+
+async def aget_url_entry(url):
+    """Async variant of get_url_entry"""
+    try:
+        entry = _decode_entry(await async_redis_client.hgetall(_url_key(url)))
+        logger.info("URL cache %s for: %s", "hit" if entry else "miss", url)
+        return entry
+    except Exception as e:
+        logger.error("URL cache get failed for %s: %s", url, str(e))
+        return None
+
+
+async def astore_url_entry(url, text, etag=None, last_modified=None):
+    """Async variant of store_url_entry"""
+    try:
+        mapping = _entry_mapping(text, etag, last_modified)
+        pipe = async_redis_client.pipeline()
+        pipe.hset(_url_key(url), mapping=mapping)
+        pipe.expire(_url_key(url), Config.URL_CONTENT_RETENTION_SECONDS)
+        await pipe.execute()
+        logger.info("URL cache set for: %s", url)
+        return mapping
+    except Exception as e:
+        logger.error("URL cache set failed for %s: %s", url, str(e))
+        return None
+
+
+async def atouch_url_entry(url):
+    """Async variant of touch_url_entry"""
+    try:
+        pipe = async_redis_client.pipeline()
+        pipe.hset(
+            _url_key(url), "fresh_until", time.time() + Config.URL_CONTENT_TTL_SECONDS
+        )
+        pipe.expire(_url_key(url), Config.URL_CONTENT_RETENTION_SECONDS)
+        await pipe.execute()
+        logger.info("URL cache revalidated for: %s", url)
+    except Exception as e:
+        logger.error("URL cache touch failed for %s: %s", url, str(e))
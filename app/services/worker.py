@@ -1,15 +1,55 @@
-from celery import Celery
+from celery import Celery, chain, group
 from dotenv import load_dotenv
 
 # Load environment variables before importing Config
 load_dotenv()
 
 from app.config import Config
-from app.models import Job, JobStatus, ContentType
-from app.services.content_fetcher import fetch_url_content
+from app.services.admission import job_finished, job_started
+from app.models import Job, JobStatus, ContentType, JobPriority, find_job, jobs_filter
+from app.services.content_fetcher import fetch_url_conditional, extract_text
+from app.services.content_store import load_content
+from app.services.job_writer import buffer_job_state, buffer_job_states
 from app.services.summarizer import summarize
-from app.services.cache_service import set_cached_summary, get_cached_summary
-from app.utils.helpers import commit_pgdb
+from app.services.cache_service import (
+    set_cached_summary,
+    get_cached_summary,
+    release_inflight,
+    adopt_stranded_waiters,
+    enqueue_async_job,
+    enqueue_async_jobs,
+    set_stage_payload,
+    get_stage_payload,
+    clear_stage_payloads,
+)
+from app.services.job_events import publish_job_event, publish_job_events
+from app.services.lifecycle import worker_app_context
+from app.services.similarity_index import (
+    find_similar_summary,
+    index_text,
+    text_signature,
+)
+from app.services.llm_budget import admit
+from app.services.retention import run_retention
+from app.services.metrics import finish_stage_timings, observe_job, stage_timings
+from app.services.token_stream import TokenStreamWriter
+from app.services.status_store import (
+    finished_status,
+    result_fields,
+    set_job_status,
+    set_many_job_status,
+)
+from app.services.url_cache import (
+    get_url_entry,
+    is_fresh,
+    store_url_entry,
+    touch_url_entry,
+)
+from app.utils.cache_keys import normalize_text
+from app.utils.helpers import hash_content
+from app.utils.retry import RetryPolicy, is_retryable
+from app.utils.timings import StageTimings, current_timings
+import json
 import logging
 import time
 
@@ -22,23 +62,184 @@ celery = Celery(
     backend=Config.CELERY_RESULT_BACKEND,
 )
 
+# Route each pipeline stage to its own queue
+celery.conf.task_routes = {
+    "app.services.worker.fetch_stage": {"queue": Config.CELERY_FETCH_QUEUE},
+    "app.services.worker.extract_stage": {"queue": Config.CELERY_EXTRACT_QUEUE},
+    "app.services.worker.summarize_stage": {"queue": Config.CELERY_SUMMARIZE_QUEUE},
+}
+
+# Periodic maintenance, run by `celery -A app.services.worker beat`
+celery.conf.beat_schedule = {
+    "job-retention": {
+        "task": "app.services.worker.job_retention",
+        "schedule": Config.JOB_RETENTION_INTERVAL_SECONDS,
+    },
+    "inflight-recovery": {
+        "task": "app.services.worker.recover_inflight_waiters",
+        "schedule": Config.INFLIGHT_RECOVERY_INTERVAL_SECONDS,
+    },
+}
+
+# Backoff for rescheduling stages after transient errors
+stage_retry_policy = RetryPolicy(max_attempts=Config.TASK_MAX_RETRIES + 1)
+
+# Names of the intermediate payloads handed between stages
+HTML_PAYLOAD = "html"
+META_PAYLOAD = "meta"
+TEXT_PAYLOAD = "text"
+
+
+def priority_queue(queue, priority):
+    """Name of a queue for a priority class; bulk work has its own queues"""
+    if priority == JobPriority.BULK:
+        return f"{queue}{Config.CELERY_BULK_QUEUE_SUFFIX}"
+    return queue
+
+
+def enqueue_job(job_id, priority=JobPriority.INTERACTIVE):
+    """Hand a job to the configured worker engine"""
+    if Config.WORKER_ENGINE == "asyncio":
+        enqueue_async_job(job_id, priority_queue(Config.ASYNC_JOB_QUEUE, priority))
+    else:
+        process_job.apply_async(
+            (job_id,), queue=priority_queue(Config.CELERY_DISPATCH_QUEUE, priority)
+        )
+
+
+def enqueue_jobs(job_ids, priority=JobPriority.INTERACTIVE):
+    """Hand many jobs to the configured worker engine in one publish"""
+    if not job_ids:
+        return
+    if Config.WORKER_ENGINE == "asyncio":
+        enqueue_async_jobs(job_ids, priority_queue(Config.ASYNC_JOB_QUEUE, priority))
+    else:
+        queue = priority_queue(Config.CELERY_DISPATCH_QUEUE, priority)
+        group(
+            process_job.si(job_id).set(queue=queue) for job_id in job_ids
+        ).apply_async()
+
+
+def resolve_waiters(job, summary=None):
+    """Copy a finished job's outcome onto identical jobs coalesced with it"""
+    waiter_ids = release_inflight(job.content_hash, job.id)
+    if not waiter_ids:
+        return
+
+    buffer_job_states(
+        waiter_ids,
+        job.status,
+        summary,
+        cached=True,
+        similarity=job.similarity,
+        processing_time_ms=job.processing_time_ms,
+    )
+    set_many_job_status(
+        waiter_ids,
+        status=job.status,
+        summary=summary,
+        cached=True,
+        similarity=job.similarity,
+        processing_time_ms=job.processing_time_ms,
+    )
+    publish_job_events(waiter_ids, job.status)
+    observe_job(job.status, True, job.similarity, count=len(waiter_ids))
+    logger.info("Resolved %d waiting jobs from job %s", len(waiter_ids), job.id)
+
+
+def finish_job(job, start_time, summary=None):
+    """Record a job's terminal state and release jobs waiting on it.
+
+    The state is published to the status store at once and buffered for the
+    batched Postgres flush (see app.services.job_writer). summary is the
+    summary text, if the job completed.
+    """
+    job.processing_time_ms = int((time.time() - start_time) * 1000)
+    totals = finish_stage_timings(job.id, current_timings() or StageTimings())
+    job.timings = {**totals, "total": job.processing_time_ms}
+    job_finished(job.id, job.processing_time_ms)
+    buffer_job_state(
+        job.id,
+        job.status,
+        summary,
+        cached=job.cached,
+        similarity=job.similarity,
+        processing_time_ms=job.processing_time_ms,
+        timings=job.timings,
+    )
+    observe_job(job.status, job.cached, job.similarity, job.timings)
+    set_job_status(job.id, **result_fields(job, summary))
+    publish_job_event(job.id, job.status)
+
+    # Hand the outcome to any identical jobs coalesced onto this one
+    try:
+        resolve_waiters(job, summary)
+    except Exception as e:
+        logger.error("Resolving waiters failed for job %s: %s", job.id, str(e))
+
+    clear_stage_payloads(job.id, HTML_PAYLOAD, META_PAYLOAD, TEXT_PAYLOAD)
+    logger.info("Job %s processing completed with status: %s", job.id, job.status)
+
+
+def fail_job(job_id, start_time, stage, error):
+    """Mark a job as failed after a pipeline stage raised"""
+    logger.error("Job %s failed in %s stage: %s", job_id, stage, str(error))
+
+    job = find_job(job_id)
+    if not job:
+        return
+
+    job.status = JobStatus.FAILED
+    finish_job(job, start_time)
+
+
+def retry_or_fail(task, job_id, start_time, stage, error):
+    """Reschedule a stage after a transient error, otherwise fail the job.
+
+    Rescheduling through Celery frees the worker slot while waiting instead
+    of sleeping in the task. Returns only when the job was marked failed.
+    """
+    retries = task.request.retries
+    if is_retryable(error) and retries < Config.TASK_MAX_RETRIES:
+        countdown = stage_retry_policy.delay(retries, error)
+        logger.warning(
+            "Job %s %s stage failed (%s), retry %d in %.1fs",
+            job_id,
+            stage,
+            str(error),
+            retries + 1,
+            countdown,
+        )
+        raise task.retry(exc=error, countdown=countdown)
+
+    with worker_app_context():
+        fail_job(job_id, start_time, stage, error)
+
 
 @celery.task(bind=True)
 def process_job(self, job_id):
-    """Process a summarization job asynchronously"""
-    start_time = time.time()
+    """Process a summarization job asynchronously.
 
-    # Import here to avoid circular import
-    from app import create_app
+    Serves cache hits directly; otherwise dispatches the job through the
+    fetch -> extract -> summarize stages, each on its own queue.
+    """
+    start_time = time.time()
 
     logger.info("Starting processing for job: %s", job_id)
-    app = create_app()
 
-    with app.app_context():
-        job = Job.query.get(job_id)
+    # Reuse the app and connection pool built at worker start
+    with worker_app_context(), stage_timings(job_id) as timings:
+        job = find_job(job_id)
         if not job:
             logger.error("Job not found: %s", job_id)
             return
+        timings.queued_at = job.created_at
+
+        finished = finished_status(job_id, job.status)
+        if finished:
+            logger.info("Job %s already finished: %s", job_id, finished)
+            return
+        job_started(job_id, job.priority)
 
         # Check cache first
         cached_summary = None
@@ -53,51 +254,205 @@ def process_job(self, job_id):
 
         # Use cached summary if available
         if cached_summary:
-            job.summary = cached_summary
             job.status = JobStatus.COMPLETED
             job.cached = True
-
-            # Calculate processing time
-            end_time = time.time()
-            job.processing_time_ms = int((end_time - start_time) * 1000)
-            commit_pgdb()
-            logger.info("Job %s completed from cache", job_id)
+            finish_job(job, start_time, cached_summary)
             return
 
-        # Process new summary
         try:
-            job.status = JobStatus.PROCESSING
-            job.cached = False
-            commit_pgdb()
+            # Intermediate states only go to the status store
+            set_job_status(job_id, status=JobStatus.PROCESSING, cached=False)
             logger.info("Job %s status updated to PROCESSING", job_id)
 
-            # Fetch content if URL, otherwise use text
+            # Fetch and extract content if URL, otherwise use text directly.
+            # Stages run on the queues of the job's priority class
+            priority = job.priority
+            summarize = summarize_stage.si(job_id, start_time, priority.value).set(
+                queue=priority_queue(Config.CELERY_SUMMARIZE_QUEUE, priority)
+            )
+            content = load_content(job.content_id)
             if job.content_type == ContentType.URL:
-                logger.info("Fetching content from URL for job %s", job_id)
-                content = fetch_url_content(job.content)
+                stages = [
+                    fetch_stage.si(job_id, content, start_time).set(
+                        queue=priority_queue(Config.CELERY_FETCH_QUEUE, priority)
+                    ),
+                    extract_stage.si(job_id, content, start_time).set(
+                        queue=priority_queue(Config.CELERY_EXTRACT_QUEUE, priority)
+                    ),
+                    summarize,
+                ]
             else:
-                logger.info("Using text content for job %s", job_id)
-                content = job.content
+                set_stage_payload(job_id, TEXT_PAYLOAD, content)
+                stages = [summarize]
 
-            # Generate summary
-            logger.info("Summarizing content for job %s", job_id)
-            summary = summarize(content)
+            chain(*stages).apply_async()
+            logger.info("Dispatched %d stages for job %s", len(stages), job_id)
 
-            job.summary = summary
-            job.status = JobStatus.COMPLETED
+        except Exception as e:
+            fail_job(job_id, start_time, "dispatch", e)
 
-            # Cache the new summary
-            logger.info("Setting cache for job %s, hash: %s", job_id, job.content_hash)
-            set_cached_summary(job.content_hash, summary)
 
-            # Calculate processing time
-            end_time = time.time()
-            job.processing_time_ms = int((end_time - start_time) * 1000)
-            commit_pgdb()
+@celery.task(bind=True)
+def fetch_stage(self, job_id, url, start_time):
+    """Pipeline stage: download the raw page for a URL job.
+
+    Fresh cached content is used without contacting the origin; stale
+    content is revalidated with a conditional GET. In both cases the text is
+    handed straight to the summarize stage and extraction is skipped.
+    """
+    with stage_timings(job_id):
+        try:
+            entry = get_url_entry(url)
+            if is_fresh(entry):
+                logger.info("Using fresh cached content for job %s", job_id)
+                set_stage_payload(job_id, TEXT_PAYLOAD, entry["text"])
+                return
+
+            logger.info("Fetching content from URL for job %s", job_id)
+            result = fetch_url_conditional(
+                url,
+                etag=entry and entry["etag"],
+                last_modified=entry and entry["last_modified"],
+            )
+
+            if result.status == 304 and entry:
+                logger.info("Content not modified for job %s", job_id)
+                touch_url_entry(url)
+                set_stage_payload(job_id, TEXT_PAYLOAD, entry["text"])
+                return
+
+            meta = {
+                "etag": result.etag,
+                "last_modified": result.last_modified,
+                "encoding": result.encoding,
+            }
+            set_stage_payload(job_id, META_PAYLOAD, json.dumps(meta))
+            set_stage_payload(job_id, HTML_PAYLOAD, result.body)
+        except Exception as e:
+            retry_or_fail(self, job_id, start_time, "fetch", e)
+            raise
+
+
+@celery.task(bind=True)
+def extract_stage(self, job_id, url, start_time):
+    """Pipeline stage: extract visible text from the fetched page"""
+    with stage_timings(job_id):
+        try:
+            if get_stage_payload(job_id, TEXT_PAYLOAD, required=False) is not None:
+                logger.info("Text already available for job %s, skipping", job_id)
+                return
+
+            logger.info("Extracting content for job %s", job_id)
+            meta = json.loads(get_stage_payload(job_id, META_PAYLOAD))
+            html = get_stage_payload(job_id, HTML_PAYLOAD)
+            content = extract_text(html, meta["encoding"])
+
+            store_url_entry(url, content, meta["etag"], meta["last_modified"])
+            set_stage_payload(job_id, TEXT_PAYLOAD, content)
+            clear_stage_payloads(job_id, HTML_PAYLOAD, META_PAYLOAD)
+        except Exception as e:
+            retry_or_fail(self, job_id, start_time, "extract", e)
+            raise
+
+
+@celery.task(bind=True)
+def summarize_stage(self, job_id, start_time, priority=JobPriority.INTERACTIVE.value):
+    """Pipeline stage: summarize extracted text and store the result.
+
+    Summaries are also cached by the hash of the extracted text, so a URL
+    whose content has not changed reuses its summary without an LLM call,
+    and indexed by similarity so near-identical texts can reuse it too.
+    LLM work is admitted against the shared provider budget first; when
+    the budget is exhausted the stage is re-dispatched with a countdown
+    rather than waiting in the worker.
+    """
+    with worker_app_context(), stage_timings(job_id):
+        try:
+            content = normalize_text(get_stage_payload(job_id, TEXT_PAYLOAD).decode())
+            text_hash = hash_content(content)
+
+            cached = get_cached_summary(text_hash)
+            similarity = None
+            signature = None
+            if not cached:
+                # Reuse the summary of a near-identical text if one is indexed
+                signature = text_signature(content)
+                match = signature and find_similar_summary(signature)
+                if match:
+                    cached, similarity = match
 
+            if cached:
+                logger.info("Content unchanged for job %s, reusing summary", job_id)
+                summary = cached.decode()
+            else:
+                job_priority = JobPriority(priority)
+                defer = admit(
+                    job_priority, content, Config.LLM_BUDGET_INLINE_WAIT_SECONDS
+                )
+                if defer:
+                    queue = priority_queue(Config.CELERY_SUMMARIZE_QUEUE, job_priority)
+                    summarize_stage.apply_async(
+                        (job_id, start_time, priority), countdown=defer, queue=queue
+                    )
+                    return
+
+                # Generate summary
+                logger.info("Summarizing content for job %s", job_id)
+                stream = TokenStreamWriter(job_id) if Config.STREAM_SUMMARIES else None
+                summary = summarize(content, stream)
+                set_cached_summary(text_hash, summary)
+                if signature:
+                    index_text(text_hash, signature)
         except Exception as e:
-            logger.error("Job %s processing failed: %s", job_id, str(e))
-            job.status = JobStatus.FAILED
-            commit_pgdb()
+            retry_or_fail(self, job_id, start_time, "summarize", e)
+            raise
+
+        job = find_job(job_id)
+        if not job:
+            logger.error("Job not found: %s", job_id)
+            return
+
+        job.status = JobStatus.COMPLETED
+        job.cached = bool(cached)
+        job.similarity = similarity
+
+        # URL summaries expire with the fetched content so they are refreshed
+        if job.content_hash != text_hash:
+            logger.info("Setting cache for job %s, hash: %s", job_id, job.content_hash)
+            set_cached_summary(
+                job.content_hash, summary, ttl=Config.URL_CONTENT_TTL_SECONDS
+            )
+
+        finish_job(job, start_time, summary)
+
+
+@celery.task
+def job_retention():
+    """Periodic task: create upcoming job partitions and archive expired ones"""
+    with worker_app_context():
+        result = run_retention()
+    if result is not None:
+        logger.info(
+            "Job retention created %d and archived %d partitions",
+            len(result["created"]),
+            len(result["archived"]),
+        )
+
+
+@celery.task
+def recover_inflight_waiters():
+    """Periodic task: queue new leaders for waiters of leaders that vanished"""
+    leader_ids = adopt_stranded_waiters()
+    if not leader_ids:
+        return
 
-        logger.info("Job %s processing completed with status: %s", job_id, job.status)
+    with worker_app_context():
+        priorities = dict(
+            Job.query.with_entities(Job.id, Job.priority).filter(
+                jobs_filter(leader_ids)
+            )
+        )
+    for job_id in leader_ids:
+        if job_id in priorities:
+            enqueue_job(job_id, priorities[job_id])
+    logger.info("Queued %d jobs for stranded in-flight waiters", len(priorities))
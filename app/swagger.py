@@ -2,6 +2,21 @@
 Swagger documentation specifications for API endpoints
 """
 
+# Submissions refused by admission control
+overloaded_response = {
+    "description": "Estimated queue wait exceeds the priority's SLO; "
+    "retry after the number of seconds in the Retry-After header",
+    "headers": {"Retry-After": {"type": "integer"}},
+    "schema": {
+        "type": "object",
+        "properties": {
+            "error": {"type": "string"},
+            "retry_after": {"type": "integer", "example": 12},
+            "estimated_wait_seconds": {"type": "number", "example": 41.5},
+        },
+    },
+}
+
 submit_spec = {
     "tags": ["Summarization"],
     "description": "Submit content for summarization",
@@ -27,6 +42,13 @@ submit_spec = {
                         "not both)",
                         "example": "https://example.com/article",
                     },
+                    "priority": {
+                        "type": "string",
+                        "description": "Scheduling class for LLM capacity "
+                        "and worker queues",
+                        "enum": ["interactive", "bulk"],
+                        "default": "interactive",
+                    },
                 },
             },
         }
@@ -47,6 +69,13 @@ submit_spec = {
                         "description": "Initial job status",
                         "example": "queued",
                     },
+                    "estimated_completion": {
+                        "type": "string",
+                        "format": "date-time",
+                        "description": "Estimated completion time (UTC) "
+                        "of a queued job",
+                        "example": "2026-01-07T10:30:42.123456",
+                    },
                 },
             },
         },
@@ -57,6 +86,7 @@ submit_spec = {
                 "properties": {"error": {"type": "string"}},
             },
         },
+        "429": overloaded_response,
         "500": {
             "description": "Server error",
             "schema": {
@@ -162,6 +192,13 @@ result_spec = {
                         "description": "Whether the result was retrieved " "from cache",
                         "example": False,
                     },
+                    "similarity": {
+                        "type": "number",
+                        "description": "Estimated similarity to the text whose "
+                        "summary was reused (only included for near-duplicate "
+                        "cache hits)",
+                        "example": 0.94,
+                    },
                     "processing_time_ms": {
                         "type": "integer",
                         "description": "Processing time in milliseconds",
@@ -194,3 +231,397 @@ result_spec = {
         },
     },
 }
+
+wait_spec = {
+    "tags": ["Summarization"],
+    "description": "Wait for a job to complete or fail (long-poll). Returns "
+    "the current status when the timeout passes first; call again to keep "
+    "waiting.",
+    "parameters": [
+        {
+            "in": "path",
+            "name": "job_id",
+            "type": "string",
+            "required": True,
+            "description": "Job ID to wait for",
+            "example": "abc123-def456-ghi789",
+        },
+        {
+            "in": "query",
+            "name": "timeout",
+            "type": "number",
+            "required": False,
+            "description": "Seconds to wait before returning (capped by "
+            "WAIT_MAX_SECONDS)",
+            "example": 30,
+        },
+    ],
+    "responses": {
+        "200": {
+            "description": "Job finished, or the timeout passed",
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "job_id": {
+                        "type": "string",
+                        "description": "The job ID",
+                        "example": "abc123-def456-ghi789",
+                    },
+                    "status": {
+                        "type": "string",
+                        "description": "Job status when the wait ended",
+                        "enum": ["queued", "processing", "completed", "failed"],
+                        "example": "completed",
+                    },
+                    "created_at": {
+                        "type": "string",
+                        "description": "Job creation timestamp in ISO format",
+                        "example": "2026-01-07T10:30:00.123456",
+                    },
+                    "summary": {
+                        "type": "string",
+                        "description": "The generated summary (completed " "jobs only)",
+                        "example": "This article discusses the " "importance of...",
+                    },
+                    "cached": {
+                        "type": "boolean",
+                        "description": "Whether the result was retrieved "
+                        "from cache (completed jobs only)",
+                        "example": False,
+                    },
+                    "processing_time_ms": {
+                        "type": "integer",
+                        "description": "Processing time in milliseconds "
+                        "(completed jobs only)",
+                        "example": 2340,
+                    },
+                },
+                "required": ["job_id", "status", "created_at"],
+            },
+        },
+        "404": {
+            "description": "Job not found",
+            "schema": {
+                "type": "object",
+                "properties": {"error": {"type": "string"}},
+            },
+        },
+        "500": {
+            "description": "Server error",
+            "schema": {
+                "type": "object",
+                "properties": {"error": {"type": "string"}},
+            },
+        },
+    },
+}
+
+events_spec = {
+    "tags": ["Summarization"],
+    "description": "Stream job status as server-sent events. Sends a "
+    "'status' event immediately and again when the job completes or fails, "
+    "then closes the stream.",
+    "produces": ["text/event-stream"],
+    "parameters": [
+        {
+            "in": "path",
+            "name": "job_id",
+            "type": "string",
+            "required": True,
+            "description": "Job ID to follow",
+            "example": "abc123-def456-ghi789",
+        }
+    ],
+    "responses": {
+        "200": {
+            "description": "Event stream; each 'status' event carries the "
+            "same body as /wait",
+        },
+        "404": {
+            "description": "Job not found",
+            "schema": {
+                "type": "object",
+                "properties": {"error": {"type": "string"}},
+            },
+        },
+        "500": {
+            "description": "Server error",
+            "schema": {
+                "type": "object",
+                "properties": {"error": {"type": "string"}},
+            },
+        },
+    },
+}
+
+stream_spec = {
+    "tags": ["Summarization"],
+    "description": "Stream a job's summary tokens as server-sent events while "
+    "the LLM generates them. Sends 'token' events with text deltas, a "
+    "'reset' event if generation restarts (drop the text received so far), "
+    "and a final 'status' event with the same body as /wait once the job "
+    "completes or fails. Summaries served from cache arrive only in the "
+    "final 'status' event. Reconnect with Last-Event-ID to resume.",
+    "produces": ["text/event-stream"],
+    "parameters": [
+        {
+            "in": "path",
+            "name": "job_id",
+            "type": "string",
+            "required": True,
+            "description": "Job ID to stream",
+            "example": "abc123-def456-ghi789",
+        },
+        {
+            "in": "header",
+            "name": "Last-Event-ID",
+            "type": "string",
+            "required": False,
+            "description": "ID of the last token event received",
+        },
+    ],
+    "responses": {
+        "200": {
+            "description": "Event stream of summary tokens",
+        },
+        "404": {
+            "description": "Job not found",
+            "schema": {
+                "type": "object",
+                "properties": {"error": {"type": "string"}},
+            },
+        },
+        "500": {
+            "description": "Server error",
+            "schema": {
+                "type": "object",
+                "properties": {"error": {"type": "string"}},
+            },
+        },
+    },
+}
+
+submit_batch_spec = {
+    "tags": ["Summarization"],
+    "description": "Submit many text or URL items in one request. Identical "
+    "items share one job, and cached content completes immediately. Job IDs "
+    "are returned in input order; invalid items get an error in their place.",
+    "parameters": [
+        {
+            "in": "body",
+            "name": "body",
+            "required": True,
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "items": {
+                        "type": "array",
+                        "description": "Items shaped like the /submit body "
+                        "(at most BATCH_MAX_ITEMS)",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "text": {"type": "string"},
+                                "url": {"type": "string"},
+                            },
+                        },
+                        "example": [
+                            {"url": "https://example.com/article"},
+                            {"text": "Your text content here..."},
+                        ],
+                    },
+                    "priority": {
+                        "type": "string",
+                        "description": "Scheduling class for every job in " "the batch",
+                        "enum": ["interactive", "bulk"],
+                        "default": "bulk",
+                    },
+                },
+                "required": ["items"],
+            },
+        }
+    ],
+    "responses": {
+        "200": {
+            "description": "Batch accepted",
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "jobs": {
+                        "type": "array",
+                        "description": "One entry per item, in input order",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "job_id": {"type": "string"},
+                                "status": {
+                                    "type": "string",
+                                    "enum": ["queued", "completed"],
+                                },
+                                "error": {
+                                    "type": "string",
+                                    "description": "Validation error for " "this item",
+                                },
+                                "estimated_completion": {
+                                    "type": "string",
+                                    "format": "date-time",
+                                    "description": "Estimated completion "
+                                    "time (UTC) of a queued job",
+                                },
+                            },
+                        },
+                    }
+                },
+            },
+        },
+        "400": {
+            "description": "Missing or oversized items list",
+            "schema": {
+                "type": "object",
+                "properties": {"error": {"type": "string"}},
+            },
+        },
+        "429": overloaded_response,
+        "500": {
+            "description": "Server error",
+            "schema": {
+                "type": "object",
+                "properties": {"error": {"type": "string"}},
+            },
+        },
+    },
+}
+
+status_batch_spec = {
+    "tags": ["Summarization"],
+    "description": "Get the status of many jobs in one request",
+    "parameters": [
+        {
+            "in": "body",
+            "name": "body",
+            "required": True,
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "job_ids": {
+                        "type": "array",
+                        "description": "Job IDs (at most BATCH_MAX_ITEMS)",
+                        "items": {"type": "string"},
+                        "example": ["abc123-def456-ghi789"],
+                    }
+                },
+                "required": ["job_ids"],
+            },
+        }
+    ],
+    "responses": {
+        "200": {
+            "description": "Statuses in input order",
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "jobs": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "job_id": {"type": "string"},
+                                "status": {
+                                    "type": "string",
+                                    "enum": [
+                                        "queued",
+                                        "processing",
+                                        "completed",
+                                        "failed",
+                                    ],
+                                },
+                                "created_at": {"type": "string"},
+                                "error": {
+                                    "type": "string",
+                                    "description": "Set when the job does " "not exist",
+                                },
+                            },
+                        },
+                    }
+                },
+            },
+        },
+        "400": {
+            "description": "Missing or oversized job_ids list",
+            "schema": {
+                "type": "object",
+                "properties": {"error": {"type": "string"}},
+            },
+        },
+        "500": {
+            "description": "Server error",
+            "schema": {
+                "type": "object",
+                "properties": {"error": {"type": "string"}},
+            },
+        },
+    },
+}
+
+_tier_counters = {
+    "type": "object",
+    "additionalProperties": {"type": "integer"},
+}
+
+cache_stats_spec = {
+    "tags": ["Monitoring"],
+    "description": "Summary cache counters of the API process serving the "
+    "request, per tier: the in-process LRU (l1) and Redis (l2). Counters "
+    "start at zero when the process starts.",
+    "responses": {
+        "200": {
+            "description": "Cache counters",
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "l1": {
+                        **_tier_counters,
+                        "example": {
+                            "hits": 1520,
+                            "misses": 310,
+                            "evictions": 12,
+                            "expirations": 40,
+                            "entries": 250,
+                            "bytes": 412000,
+                            "max_bytes": 67108864,
+                        },
+                    },
+                    "l2": {
+                        **_tier_counters,
+                        "example": {
+                            "hits": 120,
+                            "misses": 190,
+                            "errors": 0,
+                            "sets": 185,
+                            "compressed": 60,
+                        },
+                    },
+                },
+            },
+        },
+    },
+}
+
+metrics_spec = {
+    "tags": ["Monitoring"],
+    "description": "Metrics in the Prometheus text format. Stage latency "
+    "histograms (queue wait, fetch, extract, LLM, cache get/set, DB commit "
+    "and total), job counters by status and cache outcome, the cache hit "
+    "ratio, queue depths and in-flight LLM calls are cluster-wide; cache "
+    "tier counters are those of the process serving the scrape.",
+    "produces": ["text/plain"],
+    "responses": {
+        "200": {
+            "description": "Prometheus exposition",
+            "schema": {
+                "type": "string",
+                "example": 'summarizer_stage_seconds_bucket{stage="llm",le="2.5"} 41.0',
+            },
+        },
+    },
+}
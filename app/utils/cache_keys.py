@@ -0,0 +1,96 @@
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from app.config import Config
+from app.models import ContentType
+from app.utils.helpers import hash_content
+import re
+import unicodedata
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+_INVISIBLE_RE = re.compile("[\u200b\u200c\u200d\u2060\ufeff\u00ad]")
+_SPACES_RE = re.compile(r"[^\S\n]+")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+
+def _is_tracking_param(name):
+    name = name.lower()
+    for pattern in Config.URL_TRACKING_PARAMS:
+        if pattern.endswith("*"):
+            if name.startswith(pattern[:-1]):
+                return True
+        elif name == pattern:
+            return True
+    return False
+
+
+def canonical_url(url):
+    """URL with presentation-only differences removed.
+
+    Lowercases the scheme and host, drops default ports, the fragment and
+    tracking parameters, and sorts the remaining query parameters. The path
+    is kept as is, since servers may treat its case and trailing slash as
+    significant.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").rstrip(".")
+    if ":" in host:
+        host = f"[{host}]"
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    if parts.username:
+        userinfo = parts.username
+        if parts.password:
+            userinfo = f"{userinfo}:{parts.password}"
+        host = f"{userinfo}@{host}"
+
+    query = sorted(
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_tracking_param(name)
+    )
+    return urlunsplit((scheme, host, parts.path or "/", urlencode(query), ""))
+
+
+def normalize_text(text):
+    """Text with Unicode and whitespace differences removed.
+
+    Applies NFKC normalization, drops invisible characters, collapses runs
+    of spaces and tabs, trims every line and keeps at most one blank line
+    between paragraphs.
+    """
+    text = unicodedata.normalize("NFKC", text)
+    text = _INVISIBLE_RE.sub("", text)
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    lines = (_SPACES_RE.sub(" ", line).strip() for line in text.split("\n"))
+    return _BLANK_LINES_RE.sub("\n\n", "\n".join(lines)).strip()
+
+
+def url_hash(url):
+    """Cache identity of a URL"""
+    return hash_content(canonical_url(url))
+
+
+def text_hash(text):
+    """Cache identity of a text; text is normalized first"""
+    return hash_content(normalize_text(text))
+
+
+def hash_job_content(content_type, content):
+    """Cache identity of submitted content, used as a job's content_hash"""
+    if content_type == ContentType.URL:
+        return url_hash(content)
+    return text_hash(content)
+
+
+def summary_namespace():
+    """Prefix that ties cached summaries to the model(s) and prompts used.
+
+    Changing LLM_MODEL, the models in LLM_ENDPOINTS or
+    SUMMARY_PROMPT_VERSION moves lookups to a fresh namespace, so summaries
+    from the previous configuration stop being served and expire.
+    """
+    models = sorted(
+        {item.get("model") or Config.LLM_MODEL for item in Config.LLM_ENDPOINTS}
+        or {Config.LLM_MODEL}
+    )
+    return f"{'+'.join(str(m) for m in models)}:{Config.SUMMARY_PROMPT_VERSION}"
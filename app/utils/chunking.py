@@ -0,0 +1,154 @@
+import hashlib
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except ImportError:
+    _encoding = None
+    logger.info("tiktoken not installed, estimating token counts from length")
+
+# Rough characters per token used when tiktoken is unavailable
+CHARS_PER_TOKEN = 4
+
+# Chunks may end on a content-defined boundary once they hold MIN_FRACTION
+# of max_tokens; boundaries fall about every BOUNDARY_FRACTION of it. This
+# fills chunks to about 80% of max_tokens on average
+MIN_FRACTION = 0.5
+BOUNDARY_FRACTION = 0.5
+
+_sentence_end_re = re.compile(r"(?<=[.!?])\s+")
+
+
+def count_tokens(text):
+    """Count (or estimate) the number of LLM tokens in text"""
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _split_by_tokens(text, max_tokens):
+    """Hard-split a single block that is longer than max_tokens"""
+    if _encoding is not None:
+        tokens = _encoding.encode(text, disallowed_special=())
+        return [
+            _encoding.decode(tokens[i : i + max_tokens])
+            for i in range(0, len(tokens), max_tokens)
+        ]
+
+    step = max_tokens * CHARS_PER_TOKEN
+    return [text[i : i + step] for i in range(0, len(text), step)]
+
+
+def _split_oversized(line, max_tokens):
+    """Split a line longer than max_tokens into sentences.
+
+    Sentences still longer than max_tokens are split by token count.
+    """
+    pieces = []
+    for sentence in _sentence_end_re.split(line):
+        if not sentence:
+            continue
+        if count_tokens(sentence) > max_tokens:
+            pieces.extend(_split_by_tokens(sentence, max_tokens))
+        else:
+            pieces.append(sentence)
+    return pieces
+
+
+def _units(text, max_tokens):
+    """Lines of text, oversized ones split into sentences, with token counts"""
+    units = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        line_tokens = count_tokens(line)
+        if line_tokens <= max_tokens:
+            units.append((line, line_tokens))
+        else:
+            units.extend(
+                (piece, count_tokens(piece))
+                for piece in _split_oversized(line, max_tokens)
+            )
+    return units
+
+
+def _is_boundary(unit, tokens, target):
+    """Whether a chunk may end after unit, decided by its content alone.
+
+    Roughly one boundary falls in every target tokens of text.
+    """
+    digest = hashlib.blake2b(unit.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") < (tokens / target) * 2**64
+
+
+def split_into_chunks(text, max_tokens):
+    """Split text into chunks of at most max_tokens, on line boundaries.
+
+    Text that fits in max_tokens is one chunk. Longer text is cut on
+    boundaries chosen by the content of the line or sentence before them
+    (see _is_boundary), so an edit only moves the boundaries next to it:
+    the chunks after the next boundary are identical to the unedited
+    document's and their cached summaries are reused. A chunk also ends
+    where the next line would take it over max_tokens. Lines longer than
+    max_tokens are split into sentences.
+    """
+    units = _units(text, max_tokens)
+    if sum(tokens for _, tokens in units) <= max_tokens:
+        return ["\n".join(unit for unit, _ in units)] if units else []
+
+    min_tokens = max_tokens * MIN_FRACTION
+    target = max_tokens * BOUNDARY_FRACTION
+    chunks = []
+    current = []
+    current_tokens = 0
+
+    for unit, tokens in units:
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append("\n".join(current))
+            current = []
+            current_tokens = 0
+        current.append(unit)
+        current_tokens += tokens
+        if current_tokens >= min_tokens and _is_boundary(unit, tokens, target):
+            chunks.append("\n".join(current))
+            current = []
+            current_tokens = 0
+
+    if current:
+        chunks.append("\n".join(current))
+
+    return chunks
+
+
+def group_for_reduce(summaries, max_tokens):
+    """Group partial summaries so each group fits in one reduce request.
+
+    Every group holds at least two summaries so each reduce level shrinks
+    the number of summaries.
+    """
+    groups = []
+    current = []
+    current_tokens = 0
+
+    for summary in summaries:
+        summary_tokens = count_tokens(summary)
+        if len(current) >= 2 and current_tokens + summary_tokens > max_tokens:
+            groups.append(current)
+            current = []
+            current_tokens = 0
+        current.append(summary)
+        current_tokens += summary_tokens
+
+    if current:
+        # Fold a trailing single summary into the previous group
+        if len(current) == 1 and groups:
+            groups[-1].extend(current)
+        else:
+            groups.append(current)
+
+    return groups
@@ -1,28 +1,72 @@
+import asyncio
 import time
 import functools
+import inspect
 import hashlib
 import logging
 from sqlalchemy.exc import OperationalError
 from psycopg2 import OperationalError as Psycopg2OperationalError
+from app.config import Config
 from app.models import db
+from app.utils.retry import RetryPolicy
+from app.utils.timings import timed
 
 logger = logging.getLogger(__name__)
 
 
-def generic_retry(max_attempts=3, delay=5):
-    """Decorator to retry a function on failure"""
+def generic_retry(max_attempts=3, base_delay=None, max_delay=None):
+    """Decorator to retry a function on transient failure.
+
+    Only errors classified as retryable are retried, with exponential
+    backoff, jitter and Retry-After support (see app.utils.retry). Coroutine
+    functions wait with asyncio.sleep so the event loop keeps serving other
+    jobs. Sync functions only wait inline for short delays (up to
+    Config.RETRY_INLINE_MAX_SECONDS); longer waits re-raise immediately so a
+    Celery task can reschedule itself instead of blocking its worker slot.
+    """
+    policy = RetryPolicy(max_attempts, base_delay, max_delay)
 
     def decorator(func):
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                attempt = 0
+                while True:
+                    try:
+                        return await func(*args, **kwargs)
+                    except Exception as e:
+                        if not policy.should_retry(attempt, e):
+                            raise
+                        wait = policy.delay(attempt, e)
+                        logger.warning(
+                            "%s failed (%s), retrying in %.2fs",
+                            func.__name__,
+                            e,
+                            wait,
+                        )
+                        await asyncio.sleep(wait)
+                        attempt += 1
+
+            return async_wrapper
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            last_exc = None
-            for attempt in range(max_attempts):
+            attempt = 0
+            while True:
                 try:
                     return func(*args, **kwargs)
                 except Exception as e:
-                    last_exc = e
-                    time.sleep(delay)
-            raise last_exc
+                    if not policy.should_retry(attempt, e):
+                        raise
+                    wait = policy.delay(attempt, e)
+                    if wait > Config.RETRY_INLINE_MAX_SECONDS:
+                        raise
+                    logger.warning(
+                        "%s failed (%s), retrying in %.2fs", func.__name__, e, wait
+                    )
+                    time.sleep(wait)
+                    attempt += 1
 
         return wrapper
 
@@ -71,11 +115,23 @@ def retry_on_pgdb_exception(func):
 @retry_on_pgdb_exception
 def write_to_pgdb(obj):
     """Add object to database and commit"""
-    db.session.add(obj)
-    db.session.commit()
+    with timed("db_commit"):
+        db.session.add(obj)
+        db.session.commit()
+
+
+@retry_on_pgdb_exception
+def insert_many_pgdb(model, objs):
+    """Insert objects with a single multi-row INSERT and commit"""
+    columns = model.__table__.columns
+    rows = [{c.name: getattr(obj, c.name) for c in columns} for obj in objs]
+    with timed("db_commit"):
+        db.session.execute(model.__table__.insert().values(rows))
+        db.session.commit()
 
 
 @retry_on_pgdb_exception
 def commit_pgdb():
     """Commit current database session"""
-    db.session.commit()
+    with timed("db_commit"):
+        db.session.commit()
@@ -0,0 +1,100 @@
+from collections import OrderedDict
+import threading
+import time
+
+# Rough per-entry bookkeeping cost counted against the byte cap
+ENTRY_OVERHEAD_BYTES = 100
+
+
+class CacheStats:
+    """Thread-safe named counters"""
+
+    def __init__(self, *names):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(names, 0)
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+class MemoryCache:
+    """In-process LRU cache of bytes values with a TTL and a byte-size cap.
+
+    Entries expire ttl seconds after they are set (or sooner if a shorter
+    ttl is given). When the cap is exceeded the least recently used
+    entries are evicted. A max_bytes of 0 disables the cache.
+    """
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = CacheStats("hits", "misses", "evictions", "expirations")
+
+    @staticmethod
+    def _size(key, value):
+        return len(key) + len(value) + ENTRY_OVERHEAD_BYTES
+
+    def _remove(self, key):
+        value, _ = self._entries.pop(key)
+        self._bytes -= self._size(key, value)
+
+    def get(self, key):
+        """Cached value for key, or None if absent or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.incr("misses")
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.stats.incr("expirations")
+                self.stats.incr("misses")
+                return None
+            self._entries.move_to_end(key)
+        self.stats.incr("hits")
+        return value
+
+    def set(self, key, value, ttl=None):
+        """Store value, evicting least recently used entries to fit"""
+        size = self._size(key, value)
+        if size > self.max_bytes:
+            return
+        ttl = min(ttl, self.ttl) if ttl else self.ttl
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._bytes += size
+            evicted = 0
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                evicted += 1
+        if evicted:
+            self.stats.incr("evictions", evicted)
+
+    def delete(self, key):
+        """Drop key if present"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def info(self):
+        """Counters plus current entry count and size"""
+        with self._lock:
+            usage = {"entries": len(self._entries), "bytes": self._bytes}
+        return {**self.stats.snapshot(), **usage, "max_bytes": self.max_bytes}
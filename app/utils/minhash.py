@@ -0,0 +1,85 @@
+import hashlib
+import re
+import struct
+
+# Placeholder for bins no shingle fell into
+_EMPTY = (1 << 64) - 1
+_WORD_RE = re.compile(r"\w+")
+
+
+def _hash64(data):
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+def shingles(text, size):
+    """Hashes of the overlapping word n-grams of text.
+
+    Words are lowercased and punctuation and whitespace are dropped, so
+    reformatting alone does not change the set.
+    """
+    words = _WORD_RE.findall(text.lower())
+    if len(words) <= size:
+        return {_hash64(" ".join(words).encode())} if words else set()
+    return {
+        _hash64(" ".join(words[i : i + size]).encode())
+        for i in range(len(words) - size + 1)
+    }
+
+
+def signature(hashes, num_perm):
+    """MinHash signature of a set of 64-bit shingle hashes, or None if empty.
+
+    Uses one-permutation hashing: each hash lands in one of num_perm bins and
+    the smallest value per bin is kept, one pass instead of num_perm. Empty
+    bins borrow the value of the next filled bin, offset by the distance, so
+    short texts still give comparable signatures.
+    """
+    bins = [_EMPTY] * num_perm
+    for h in hashes:
+        index, value = h % num_perm, h // num_perm
+        if value < bins[index]:
+            bins[index] = value
+    filled = [i for i, value in enumerate(bins) if value != _EMPTY]
+    if not filled:
+        return None
+
+    offset = _EMPTY // num_perm + 1
+    result = list(bins)
+    for i in range(num_perm):
+        if bins[i] != _EMPTY:
+            continue
+        distance = 1
+        while bins[(i + distance) % num_perm] == _EMPTY:
+            distance += 1
+        result[i] = (bins[(i + distance) % num_perm] + distance * offset) & _EMPTY
+    return result
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of the texts behind two signatures"""
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+def band_keys(sig, bands):
+    """LSH band identifiers of a signature.
+
+    Texts sharing any band are candidates for a near-duplicate match; with
+    r rows per band, texts of similarity s collide with probability
+    1 - (1 - s^r)^bands.
+    """
+    rows = len(sig) // bands
+    keys = []
+    for band in range(bands):
+        data = pack(sig[band * rows : (band + 1) * rows])
+        keys.append(f"{band}:{hashlib.blake2b(data, digest_size=8).hexdigest()}")
+    return keys
+
+
+def pack(sig):
+    """Serialize a signature to bytes"""
+    return struct.pack(f">{len(sig)}Q", *sig)
+
+
+def unpack(data):
+    """Deserialize a signature packed with pack()"""
+    return list(struct.unpack(f">{len(data) // 8}Q", data))
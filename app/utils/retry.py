@@ -0,0 +1,108 @@
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from sqlalchemy.exc import OperationalError
+from app.config import Config
+import httpx
+import openai
+import random
+import requests
+
+# HTTP statuses worth retrying: timeouts, throttling and server errors
+RETRYABLE_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+# Transport-level failures that are usually transient
+RETRYABLE_ERRORS = (
+    requests.ConnectionError,
+    requests.Timeout,
+    httpx.TransportError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    OperationalError,
+)
+
+
+def _status_of(error):
+    """HTTP status carried by an exception, if any"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        response = getattr(error, "response", None)
+        status = getattr(response, "status_code", None)
+    return status
+
+
+def is_retryable(error):
+    """Classify an error as transient (retry) or permanent (fail fast).
+
+    Exceptions can opt in or out explicitly with a `retryable` attribute.
+    HTTP and LLM errors are classified by status: 4xx other than 408/425/429
+    are permanent. Unknown errors are treated as permanent.
+    """
+    explicit = getattr(error, "retryable", None)
+    if explicit is not None:
+        return bool(explicit)
+
+    if isinstance(error, RETRYABLE_ERRORS):
+        return True
+
+    status = _status_of(error)
+    if status is not None:
+        return status in RETRYABLE_STATUSES or status >= 500
+
+    return False
+
+
+def retry_after_seconds(error):
+    """Seconds the server asked us to wait (Retry-After), if it said.
+
+    Exceptions can also carry the wait themselves as `retry_after`.
+    """
+    explicit = getattr(error, "retry_after", None)
+    if explicit is not None:
+        return max(0.0, float(explicit))
+
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+        return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, honouring Retry-After"""
+
+    def __init__(self, max_attempts=3, base_delay=None, max_delay=None):
+        self.max_attempts = max_attempts
+        self.base_delay = Config.RETRY_BASE_DELAY if base_delay is None else base_delay
+        self.max_delay = Config.RETRY_MAX_DELAY if max_delay is None else max_delay
+
+    def should_retry(self, attempt, error):
+        """Whether to try again after `attempt` (0-based) failed with error"""
+        return attempt + 1 < self.max_attempts and is_retryable(error)
+
+    def delay(self, attempt, error=None):
+        """Seconds to wait before the next attempt"""
+        requested = retry_after_seconds(error) if error is not None else None
+        if requested is not None:
+            return min(requested, self.max_delay)
+
+        ceiling = min(self.max_delay, self.base_delay * (2**attempt))
+        return random.uniform(0, ceiling)
@@ -0,0 +1,76 @@
+from contextlib import contextmanager
+import contextvars
+import threading
+import time
+
+# Stage timings of the job being processed in the current thread or task
+_current = contextvars.ContextVar("stage_timings", default=None)
+
+
+class StageTimings:
+    """Milliseconds spent in each stage while processing one job.
+
+    Time in a stage is summed over every call, so parallel LLM calls for
+    the chunks of a long document add up to more than the wall time.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        # When the job was queued; the hand-off time for the first stage
+        self.queued_at = None
+        self.finished = False
+        self._ms = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self._ms[stage] = self._ms.get(stage, 0.0) + seconds * 1000
+
+    def snapshot(self):
+        """Stage totals in milliseconds"""
+        with self._lock:
+            return {stage: round(ms, 1) for stage, ms in self._ms.items()}
+
+
+@contextmanager
+def recording():
+    """Collect the stage timings of the code run inside into a new recorder"""
+    timings = StageTimings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+def current_timings():
+    """The active recorder, or None outside recording()"""
+    return _current.get()
+
+
+@contextmanager
+def timed(stage):
+    """Add the time spent inside to stage in the active recorder, if any"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(stage, time.perf_counter() - start)
+
+
+def propagate(func):
+    """Wrap func to record into the caller's recorder from another thread"""
+    timings = _current.get()
+
+    def run(*args, **kwargs):
+        token = _current.set(timings)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current.reset(token)
+
+    return run
@@ -0,0 +1,143 @@
+"""
+Benchmark HTML text extraction over a corpus of saved pages.
+
+Compares the previous extraction path (full BeautifulSoup tree, get_text()
+on the whole document, then truncation) against the streaming extractor in
+app.services.html_extractor with each available parser back end. Every mode
+runs in its own subprocess so peak RSS is measured independently.
+
+Usage:
+    python -m benchmarks.bench_extraction --corpus path/to/html/pages
+    python -m benchmarks.bench_extraction --generate 20
+
+Without --corpus, a synthetic corpus of large pages is generated into a
+temporary directory.
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = ["bs4", "stream-html.parser", "stream-lxml"]
+
+# Matches the default Config.MAX_CONTENT_LENGTH
+DEFAULT_MAX_CHARS = 200000
+
+
+def generate_corpus(directory, pages):
+    """Write synthetic pages with heavy boilerplate and long bodies"""
+    script = "<script>" + "var x = 1;" * 5000 + "</script>"
+    style = "<style>" + ".a{color:red}" * 5000 + "</style>"
+    nav = "<nav>" + "<a href='/'>Home</a>" * 500 + "</nav>"
+    paragraph = "<p>" + "Lorem ipsum dolor sit amet, consectetur. " * 40 + "</p>"
+
+    for i in range(pages):
+        body = paragraph * (200 + 100 * (i % 10))
+        html = f"<html><head>{style}{script}</head><body>{nav}{body}</body></html>"
+        with open(os.path.join(directory, f"page{i}.html"), "w") as f:
+            f.write(html)
+
+
+def _extract_bs4(html, max_chars):
+    """Previous behaviour: parse everything, then truncate"""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    return soup.get_text(separator="\n", strip=True)[:max_chars]
+
+
+def _extract_stream(parser, html, max_chars):
+    """Streaming extractor with the given parser back end"""
+    from app.services.html_extractor import create_extractor
+
+    extractor = create_extractor(parser, max_chars)
+    for start in range(0, len(html), 64 * 1024):
+        extractor.feed(html[start : start + 64 * 1024])
+        if extractor.done:
+            break
+    return extractor.close()
+
+
+def run_mode(mode, corpus, max_chars):
+    """Extract every page in the corpus and report time and peak RSS"""
+    paths = sorted(
+        os.path.join(corpus, name)
+        for name in os.listdir(corpus)
+        if name.endswith((".html", ".htm"))
+    )
+    pages = []
+    for path in paths:
+        with open(path, "rb") as f:
+            pages.append(f.read())
+
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    chars = 0
+    for html in pages:
+        if mode == "bs4":
+            text = _extract_bs4(html, max_chars)
+        else:
+            text = _extract_stream(mode.split("-", 1)[1], html, max_chars)
+        chars += len(text)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "mode": mode,
+        "pages": len(pages),
+        "bytes": sum(len(p) for p in pages),
+        "chars": chars,
+        "seconds": round(elapsed, 4),
+        "ms_per_page": round(elapsed * 1000 / max(len(pages), 1), 3),
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "peak_rss_growth_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        - baseline_rss,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--corpus", help="Directory of saved .html pages")
+    parser.add_argument("--generate", type=int, default=20)
+    parser.add_argument("--max-chars", type=int, default=DEFAULT_MAX_CHARS)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Child process: run one mode and print its result
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.corpus, args.max_chars)))
+        return
+
+    corpus = args.corpus
+    if not corpus:
+        corpus = tempfile.mkdtemp(prefix="bench_extraction_")
+        generate_corpus(corpus, args.generate)
+
+    for mode in MODES:
+        proc = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.bench_extraction",
+                "--corpus",
+                corpus,
+                "--max-chars",
+                str(args.max_chars),
+                "--mode",
+                mode,
+            ],
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            print(f"{mode}: failed\n{proc.stderr}", file=sys.stderr)
+            continue
+        print(proc.stdout.strip())
+
+
+if __name__ == "__main__":
+    main()
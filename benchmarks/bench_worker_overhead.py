@@ -0,0 +1,95 @@
+"""
+Benchmark per-task setup overhead of the Celery worker.
+
+Compares building a fresh Flask app for every task (the old behaviour of
+process_job) against reusing the per-process app from app.services.lifecycle.
+Only the setup and a single job lookup are timed, so the numbers reflect the
+fixed cost each task pays before doing any real work.
+
+Usage:
+    python -m benchmarks.bench_worker_overhead --tasks 200
+
+DATABASE_URL defaults to a temporary SQLite database so the benchmark runs
+without Postgres; point it at Postgres to include schema round-trips.
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+# Defaults so the benchmark runs without a full .env
+os.environ.setdefault(
+    "DATABASE_URL",
+    "sqlite:///" + os.path.join(tempfile.gettempdir(), "bench_worker.db"),
+)
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
+os.environ.setdefault("LLM_TOKEN", "benchmark")
+
+from app import create_app  # noqa: E402
+from app.models import db, Job, JobStatus, ContentType  # noqa: E402
+from app.services.content_store import store_content  # noqa: E402
+from app.services.lifecycle import (  # noqa: E402
+    worker_app_context,
+    shutdown_worker_app,
+)
+
+
+def _seed_job():
+    """Insert one job to look up during the benchmark"""
+    app = create_app()
+    with app.app_context():
+        job = Job(
+            content_hash="benchmark",
+            content_type=ContentType.TEXT,
+            content_id=store_content("benchmark"),
+            status=JobStatus.QUEUED,
+        )
+        db.session.add(job)
+        db.session.commit()
+        return job.id
+
+
+def _per_task_app(job_id):
+    """Old behaviour: build a new app for every task"""
+    app = create_app()
+    with app.app_context():
+        Job.query.get(job_id)
+
+
+def _shared_app(job_id):
+    """New behaviour: reuse the per-process app"""
+    with worker_app_context():
+        Job.query.get(job_id)
+
+
+def _run(label, func, job_id, tasks):
+    """Time func over the given number of tasks and print a summary"""
+    timings = []
+    for _ in range(tasks):
+        start = time.perf_counter()
+        func(job_id)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(
+        f"{label:<16} mean={statistics.mean(timings):8.3f}ms "
+        f"p50={statistics.median(timings):8.3f}ms p95={p95:8.3f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tasks", type=int, default=200)
+    args = parser.parse_args()
+
+    job_id = _seed_job()
+    _run("per-task app", _per_task_app, job_id, args.tasks)
+    _run("shared app", _shared_app, job_id, args.tasks)
+    shutdown_worker_app()
+
+
+if __name__ == "__main__":
+    main()
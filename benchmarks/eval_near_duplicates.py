@@ -0,0 +1,223 @@
+"""
+Evaluate near-duplicate summary reuse against exact-hash caching.
+
+Replays a corpus through the same shingling, MinHash and LSH banding as
+app.services.similarity_index, with an in-memory index in place of Redis.
+Each document is an exact hit, a near-duplicate hit, or a miss that gets
+"summarized" and indexed. Documents carry a group label, and a near hit on
+a document from another group counts as a false match.
+
+Usage:
+    python -m benchmarks.eval_near_duplicates --corpus path/to/texts
+    python -m benchmarks.eval_near_duplicates --documents 300 --variants 3
+
+Corpus files are named <group>--<anything>.txt; files sharing a group are
+versions of the same content. Without --corpus, a synthetic corpus is
+generated: articles with rotating timestamps, ad blocks, reflowed
+whitespace and small edits, plus follow-up articles that quote part of an
+earlier one and share site boilerplate but should not match it.
+
+Prints one JSON line per threshold.
+"""
+
+import argparse
+import json
+import os
+import random
+import string
+import time
+from collections import Counter, defaultdict
+
+# Defaults so the script runs without a full .env
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
+os.environ.setdefault("LLM_TOKEN", "benchmark")
+
+from app.config import Config  # noqa: E402
+from app.utils.helpers import hash_content  # noqa: E402
+from app.utils.minhash import band_keys, shingles, signature, similarity  # noqa: E402
+
+
+def _words(rng, vocabulary, count):
+    return [rng.choice(vocabulary) for _ in range(count)]
+
+
+def _paragraphs(rng, vocabulary, count):
+    return [
+        " ".join(_words(rng, vocabulary, rng.randint(40, 120))) + "."
+        for _ in range(count)
+    ]
+
+
+def _vary(rng, vocabulary, paragraphs, kind):
+    """A re-rendering of an article of the given kind"""
+    paragraphs = list(paragraphs)
+    if kind in ("timestamp", "mixed"):
+        stamp = f"{rng.randint(2020, 2026)}-{rng.randint(1, 12):02d}-" + (
+            f"{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}:"
+            f"{rng.randint(0, 59):02d} UTC"
+        )
+        paragraphs.insert(1, f"Updated {stamp}")
+    if kind in ("ads", "mixed"):
+        ad = "Advertisement " + " ".join(_words(rng, vocabulary, 30))
+        paragraphs.insert(rng.randint(1, len(paragraphs)), ad)
+    if kind in ("edit", "mixed"):
+        edited = []
+        for paragraph in paragraphs:
+            words = paragraph.split()
+            for _ in range(max(1, len(words) // 50)):
+                words[rng.randrange(len(words))] = rng.choice(vocabulary)
+            edited.append(" ".join(words))
+        paragraphs = edited
+    if kind == "whitespace":
+        return "\n\n\n".join("  ".join(p.split()) for p in paragraphs)
+    return "\n".join(paragraphs)
+
+
+def generate_corpus(documents, variants, seed):
+    """Synthetic (group, text) pairs with near-duplicates and hard negatives"""
+    rng = random.Random(seed)
+    vocabulary = [
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9)))
+        for _ in range(5000)
+    ]
+    sites = [_paragraphs(rng, vocabulary, 2) for _ in range(5)]
+    kinds = ["timestamp", "ads", "whitespace", "edit", "mixed"]
+
+    corpus = []
+    articles = []
+    for i in range(documents):
+        site = rng.choice(sites)
+        if articles and rng.random() < 0.2:
+            # Follow-up article quoting part of an earlier one
+            quoted = rng.choice(articles)
+            body = quoted[2 : 2 + len(quoted) // 3] + _paragraphs(
+                rng, vocabulary, rng.randint(4, 10)
+            )
+        else:
+            body = _paragraphs(rng, vocabulary, rng.randint(3, 12))
+        paragraphs = site[:1] + body + site[1:]
+        articles.append(paragraphs)
+
+        group = f"article{i}"
+        corpus.append((group, "\n".join(paragraphs)))
+        for _ in range(rng.randint(0, variants)):
+            corpus.append(
+                (group, _vary(rng, vocabulary, paragraphs, rng.choice(kinds)))
+            )
+
+    rng.shuffle(corpus)
+    return corpus
+
+
+def load_corpus(directory):
+    """(group, text) pairs from <group>--<anything>.txt files"""
+    corpus = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".txt"):
+            continue
+        with open(os.path.join(directory, name), encoding="utf-8") as f:
+            corpus.append((name.split("--", 1)[0], f.read()))
+    return corpus
+
+
+def evaluate(corpus, threshold, args):
+    """Replay the corpus through exact and near-duplicate lookups"""
+    exact = set()
+    groups_seen = set()
+    bands = defaultdict(set)
+    signatures = {}
+    counts = Counter()
+    signature_seconds = 0.0
+
+    for group, text in corpus:
+        text_hash = hash_content(text)
+        if text_hash in exact:
+            counts["exact_hits"] += 1
+            continue
+
+        start = time.perf_counter()
+        hashes = shingles(text, args.shingle_size)
+        sig = None
+        if len(hashes) >= args.min_shingles:
+            sig = signature(hashes, args.num_perm)
+        signature_seconds += time.perf_counter() - start
+
+        match = None
+        if sig is not None:
+            keys = band_keys(sig, args.bands)
+            candidates = Counter(h for key in keys for h in bands[key])
+            best = 0.0
+            for candidate, _ in candidates.most_common(args.max_candidates):
+                score = similarity(sig, signatures[candidate][0])
+                if score >= threshold and score > best:
+                    match, best = candidate, score
+
+        if match is not None:
+            if signatures[match][1] == group:
+                counts["near_hits"] += 1
+            else:
+                counts["false_matches"] += 1
+            continue
+
+        # Miss: summarize and index
+        counts["misses"] += 1
+        if group in groups_seen:
+            counts["missed_duplicates"] += 1
+        groups_seen.add(group)
+        exact.add(text_hash)
+        if sig is not None:
+            signatures[text_hash] = (sig, group)
+            for key in keys:
+                bands[key].add(text_hash)
+
+    total = max(len(corpus), 1)
+    near_total = counts["near_hits"] + counts["false_matches"]
+    duplicates = counts["near_hits"] + counts["missed_duplicates"]
+    return {
+        "threshold": threshold,
+        "documents": len(corpus),
+        "groups": len({group for group, _ in corpus}),
+        "exact_hits": counts["exact_hits"],
+        "near_hits": counts["near_hits"],
+        "false_matches": counts["false_matches"],
+        "missed_duplicates": counts["missed_duplicates"],
+        "exact_hit_rate": round(counts["exact_hits"] / total, 4),
+        "combined_hit_rate": round((counts["exact_hits"] + near_total) / total, 4),
+        "hit_rate_gain": round(near_total / total, 4),
+        "false_match_rate": round(counts["false_matches"] / max(near_total, 1), 4),
+        "near_duplicate_recall": round(counts["near_hits"] / max(duplicates, 1), 4),
+        "ms_per_signature": round(signature_seconds * 1000 / total, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--corpus", help="Directory of <group>--<name>.txt files")
+    parser.add_argument("--documents", type=int, default=300)
+    parser.add_argument("--variants", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--thresholds", default=str(Config.SIMILARITY_THRESHOLD))
+    parser.add_argument(
+        "--shingle-size", type=int, default=Config.SIMILARITY_SHINGLE_SIZE
+    )
+    parser.add_argument("--num-perm", type=int, default=Config.SIMILARITY_NUM_PERM)
+    parser.add_argument("--bands", type=int, default=Config.SIMILARITY_BANDS)
+    parser.add_argument(
+        "--min-shingles", type=int, default=Config.SIMILARITY_MIN_SHINGLES
+    )
+    parser.add_argument(
+        "--max-candidates", type=int, default=Config.SIMILARITY_MAX_CANDIDATES
+    )
+    args = parser.parse_args()
+
+    if args.corpus:
+        corpus = load_corpus(args.corpus)
+    else:
+        corpus = generate_corpus(args.documents, args.variants, args.seed)
+
+    for threshold in args.thresholds.split(","):
+        print(json.dumps(evaluate(corpus, float(threshold), args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Fake OpenAI-compatible chat completions server for offline benchmarks.
+
+Answers POST /v1/chat/completions, streaming or not, after a configurable
+time to first token and at a configurable token rate. A share of requests
+can be answered with 429 or 500 to exercise retries, breakers and the LLM
+budget. Batched requests (a JSON array of documents with an id and a text)
+get a JSON reply with one summary per document, as the summarizer expects.
+
+Usage:
+    python -m benchmarks.fake_llm --port 8001 --latency-ms 400 \
+        --tokens-per-second 80 --rate-limit-ratio 0.02
+
+Point the service at it with LLM_ENDPOINT=http://127.0.0.1:8001/v1.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+
+_WORD_RE = re.compile(r"\w+")
+
+
+class FakeLLMSettings:
+    """Behaviour of the fake server, shared by its request handlers"""
+
+    def __init__(
+        self,
+        latency_ms=400,
+        jitter_ms=100,
+        tokens_per_second=80,
+        summary_words=60,
+        rate_limit_ratio=0.0,
+        error_ratio=0.0,
+        seed=None,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.tokens_per_second = tokens_per_second
+        self.summary_words = summary_words
+        self.rate_limit_ratio = rate_limit_ratio
+        self.error_ratio = error_ratio
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts = dict.fromkeys(
+            ("requests", "streamed", "rate_limited", "errors", "tokens"), 0
+        )
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self.counts[name] += amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts)
+
+    def roll(self):
+        """Outcome of one request: "rate_limited", "error" or "ok" """
+        with self._lock:
+            value = self._rng.random()
+        if value < self.rate_limit_ratio:
+            return "rate_limited"
+        if value < self.rate_limit_ratio + self.error_ratio:
+            return "error"
+        return "ok"
+
+    def first_token_delay(self):
+        with self._lock:
+            jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+
+def _summary(text, words):
+    """Deterministic stand-in summary built from the input's words"""
+    found = _WORD_RE.findall(text)
+    return " ".join(found[:words]) or "Empty document."
+
+
+def reply_for(messages, words):
+    """Text the fake model answers a chat request with"""
+    text = messages[-1].get("content", "") if messages else ""
+    try:
+        documents = json.loads(text)
+    except ValueError:
+        documents = None
+    if not isinstance(documents, list):
+        return _summary(text, words)
+
+    # Batched request: one summary per document
+    return json.dumps(
+        {
+            str(doc.get("id")): _summary(str(doc.get("text", "")), words)
+            for doc in documents
+            if isinstance(doc, dict)
+        }
+    )
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    settings = FakeLLMSettings()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._json(404, {"error": {"message": "Not found"}})
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        settings = self.settings
+        settings.incr("requests")
+
+        outcome = settings.roll()
+        if outcome == "rate_limited":
+            settings.incr("rate_limited")
+            self._json(
+                429,
+                {"error": {"message": "Rate limit exceeded", "type": "rate_limit"}},
+                {"Retry-After": "1"},
+            )
+            return
+        if outcome == "error":
+            settings.incr("errors")
+            self._json(500, {"error": {"message": "Injected server error"}})
+            return
+
+        tokens = reply_for(request.get("messages", []), settings.summary_words)
+        tokens = tokens.split(" ")
+        settings.incr("tokens", len(tokens))
+        time.sleep(settings.first_token_delay())
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model = request.get("model") or "fake-model"
+        if request.get("stream"):
+            settings.incr("streamed")
+            self._stream(completion_id, model, tokens)
+            return
+
+        if settings.tokens_per_second:
+            time.sleep(len(tokens) / settings.tokens_per_second)
+        self._json(
+            200,
+            {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": " ".join(tokens)},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": length // 4,
+                    "completion_tokens": len(tokens),
+                    "total_tokens": length // 4 + len(tokens),
+                },
+            },
+        )
+
+    def _stream(self, completion_id, model, tokens):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        interval = (
+            1 / self.settings.tokens_per_second
+            if self.settings.tokens_per_second
+            else 0
+        )
+        for i, token in enumerate(tokens):
+            delta = token if i == 0 else f" {token}"
+            self._event(completion_id, model, {"content": delta}, None)
+            if interval:
+                time.sleep(interval)
+        self._event(completion_id, model, {}, "stop")
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _event(self, completion_id, model, delta, finish_reason):
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        self.wfile.flush()
+
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    """Threaded server that ignores clients dropping their connections"""
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass
+
+
+def start_fake_llm(settings, host="127.0.0.1", port=0):
+    """Serve the fake LLM from a background thread; returns the server"""
+    handler = type("Handler", (FakeLLMHandler,), {"settings": settings})
+    server = QuietHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_arguments(parser):
+    """Command-line options for the fake LLM, shared with the load test"""
+    parser.add_argument("--latency-ms", type=float, default=400)
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--tokens-per-second", type=float, default=80)
+    parser.add_argument("--summary-words", type=int, default=60)
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0)
+    parser.add_argument("--error-ratio", type=float, default=0.0)
+
+
+def settings_from_args(args):
+    return FakeLLMSettings(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        tokens_per_second=args.tokens_per_second,
+        summary_words=args.summary_words,
+        rate_limit_ratio=args.rate_limit_ratio,
+        error_ratio=args.error_ratio,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--seed", type=int, default=None)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = start_fake_llm(settings_from_args(args), args.host, args.port)
+    print(f"Fake LLM listening on http://{args.host}:{server.server_port}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
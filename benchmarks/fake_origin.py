@@ -0,0 +1,125 @@
+"""
+Fake HTTP origin serving a synthetic corpus of HTML pages.
+
+GET /pages/<corpus>/<n>.html returns page n of corpus <corpus>. Pages are
+generated deterministically from both, so the same URL always returns the
+same document and a new corpus name gives unrelated pages. Pages carry the
+navigation, scripts and boilerplate of a real article page, plus an ETag,
+and a matching If-None-Match is answered with 304.
+
+Usage:
+    python -m benchmarks.fake_origin --port 8002 --latency-ms 50
+"""
+
+from http.server import BaseHTTPRequestHandler
+import argparse
+import hashlib
+import random
+import string
+import threading
+import time
+
+from benchmarks.fake_llm import QuietHTTPServer
+
+_VOCABULARY = [
+    "".join(random.Random(i).choices(string.ascii_lowercase, k=3 + i % 7))
+    for i in range(5000)
+]
+
+
+def page_text(corpus, number, paragraphs):
+    """Paragraphs of article text for one page"""
+    rng = random.Random(f"{corpus}/{number}")
+    return [
+        " ".join(rng.choice(_VOCABULARY) for _ in range(rng.randint(40, 120))) + "."
+        for _ in range(paragraphs)
+    ]
+
+
+def render_page(corpus, number, paragraphs):
+    """HTML document for one page"""
+    body = "\n".join(f"<p>{p}</p>" for p in page_text(corpus, number, paragraphs))
+    nav = "".join(f'<li><a href="/section/{i}">Section {i}</a></li>' for i in range(20))
+    return (
+        "<!DOCTYPE html><html><head>"
+        f"<title>Article {corpus}/{number}</title>"
+        "<script>window.analytics = {queue: []};</script>"
+        "<style>body { font-family: sans-serif; }</style>"
+        "</head><body>"
+        f"<nav><ul>{nav}</ul></nav>"
+        f"<article><h1>Article {number}</h1>\n{body}\n</article>"
+        "<footer>Copyright Example Media. All rights reserved.</footer>"
+        "</body></html>"
+    ).encode()
+
+
+class FakeOriginHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency_ms = 0
+    paragraphs = 8
+    requests = 0
+    _lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        with self._lock:
+            type(self).requests += 1
+
+        parts = self.path.split("?", 1)[0].strip("/").split("/")
+        if len(parts) != 3 or parts[0] != "pages" or not parts[2].endswith(".html"):
+            self.send_error(404)
+            return
+
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+        body = render_page(parts[1], parts[2][: -len(".html")], self.paragraphs)
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "max-age=300")
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_fake_origin(latency_ms=0, paragraphs=8, host="127.0.0.1", port=0):
+    """Serve the corpus from a background thread; returns the server"""
+    handler = type(
+        "Handler",
+        (FakeOriginHandler,),
+        {"latency_ms": latency_ms, "paragraphs": paragraphs},
+    )
+    server = QuietHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8002)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--paragraphs", type=int, default=8)
+    args = parser.parse_args()
+
+    server = start_fake_origin(args.latency_ms, args.paragraphs, args.host, args.port)
+    print(f"Fake origin listening on http://{args.host}:{server.server_port}/pages/")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,464 @@
+"""
+End-to-end load test of the summarization pipeline, fully offline.
+
+Starts a fake OpenAI-compatible LLM (benchmarks.fake_llm) and a fake HTTP
+origin (benchmarks.fake_origin), then the real API and workers pointed at
+them. Jobs are submitted to /submit at each target rate for a fixed time,
+a mix of URLs and texts with a share of duplicates, and /status/batch is
+polled until every job finishes. Each rate gets a fresh corpus, and each
+run a fresh summary cache namespace, so results do not depend on earlier
+runs.
+
+Prints one JSON line per rate with throughput, end-to-end latency
+percentiles, cache hit rate, mean and p95 time per stage (from
+Job.timings) and fake LLM counters, tagged with the current commit so runs
+can be compared across commits.
+
+Usage:
+    python -m benchmarks.load_pipeline --rates 5,20,50 --seconds 30 \
+        --duplicate-ratio 0.3 --url-ratio 0.5 --output results.jsonl
+
+    # Against an already running stack whose LLM_ENDPOINT points at
+    # http://127.0.0.1:<llm-port>/v1
+    python -m benchmarks.load_pipeline --api http://localhost:5000 --llm-port 8001
+
+Redis and Postgres must be running; DATABASE_URL and REDIS_URL are read as
+by the service (from .env if present).
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+import psycopg2
+import requests
+from dotenv import load_dotenv
+
+from benchmarks.fake_llm import add_arguments, settings_from_args, start_fake_llm
+from benchmarks.fake_origin import page_text, start_fake_origin
+
+load_dotenv()
+
+STAGES = (
+    "queue_wait",
+    "fetch",
+    "extract",
+    "llm",
+    "cache_get",
+    "cache_set",
+    "db_commit",
+    "total",
+)
+TERMINAL = ("completed", "failed")
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile, None for no values"""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Stack:
+    """API and worker processes started for the run"""
+
+    def __init__(self, args, llm_url):
+        self.args = args
+        self.log_dir = tempfile.mkdtemp(prefix="load_pipeline_")
+        self.env = dict(
+            os.environ,
+            LLM_ENDPOINT=llm_url,
+            LLM_ENDPOINTS="[]",
+            LLM_TOKEN="benchmark",
+            LLM_MODEL=os.environ.get("LLM_MODEL") or "fake-model",
+            SUMMARY_PROMPT_VERSION=f"bench-{uuid.uuid4().hex[:8]}",
+            WORKER_ENGINE=args.engine,
+        )
+        self.processes = []
+
+    def _spawn(self, name, command):
+        log = open(os.path.join(self.log_dir, f"{name}.log"), "w")
+        self.processes.append(
+            (name, subprocess.Popen(command, env=self.env, stdout=log, stderr=log))
+        )
+
+    def start(self):
+        args = self.args
+        self._spawn(
+            "api",
+            [
+                sys.executable,
+                "-m",
+                "flask",
+                "--app",
+                "app",
+                "run",
+                "--port",
+                str(args.api_port),
+                "--no-reload",
+                "--no-debugger",
+            ],
+        )
+        if args.engine == "asyncio":
+            self._spawn("worker", [sys.executable, "-m", "app.services.async_worker"])
+        else:
+            self._spawn(
+                "worker",
+                [
+                    sys.executable,
+                    "-m",
+                    "celery",
+                    "-A",
+                    "app.services.worker",
+                    "worker",
+                    "-Q",
+                    args.celery_queues,
+                    f"--pool={args.celery_pool}",
+                    f"--concurrency={args.celery_concurrency}",
+                    "--loglevel=warning",
+                ],
+            )
+
+    def check(self):
+        for name, process in self.processes:
+            if process.poll() is not None:
+                raise RuntimeError(
+                    f"{name} exited with {process.returncode}; see {self.log_dir}"
+                )
+
+    def stop(self):
+        for _, process in self.processes:
+            process.terminate()
+        for _, process in self.processes:
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def wait_for_api(api, stack, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if stack:
+            stack.check()
+        try:
+            if requests.get(f"{api}/cache/stats", timeout=2).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"API at {api} did not become ready")
+
+
+class Workload:
+    """Submissions for one rate: new URLs and texts plus repeats"""
+
+    def __init__(self, args, origin, corpus):
+        self.args = args
+        self.origin = origin
+        self.corpus = corpus
+        self.rng = random.Random(f"{args.seed}/{corpus}")
+        self.items = []
+
+    def next_item(self):
+        if self.items and self.rng.random() < self.args.duplicate_ratio:
+            return self.rng.choice(self.items)
+        n = len(self.items)
+        if self.rng.random() < self.args.url_ratio:
+            item = {"url": f"{self.origin}/pages/{self.corpus}/{n}.html"}
+        else:
+            paragraphs = page_text(self.corpus, f"text-{n}", self.args.paragraphs)
+            item = {"text": "\n\n".join(paragraphs)}
+        self.items.append(item)
+        return item
+
+
+class Tracker:
+    """Submitted jobs and when each was seen to finish"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.submitted = {}
+        self.pending = set()
+        self.finished = {}
+        self.submit_ms = []
+        self.rejected = 0
+
+    def add(self, job_id, status, started, submitted_at):
+        with self.lock:
+            self.submit_ms.append((submitted_at - started) * 1000)
+            self.submitted[job_id] = started
+            if status in TERMINAL:
+                self.finished[job_id] = (status, submitted_at)
+            else:
+                self.pending.add(job_id)
+
+    def reject(self):
+        with self.lock:
+            self.rejected += 1
+
+    def take_pending(self):
+        with self.lock:
+            return list(self.pending)
+
+    def finish(self, job_id, status, at):
+        with self.lock:
+            if job_id in self.pending:
+                self.pending.discard(job_id)
+                self.finished[job_id] = (status, at)
+
+
+def submit_at_rate(api, workload, tracker, rate, seconds, workers):
+    session = requests.Session()
+    interval = 1.0 / rate
+    deadline = time.monotonic() + seconds
+
+    def submit(item):
+        started = time.monotonic()
+        try:
+            resp = session.post(f"{api}/submit", json=item, timeout=30)
+        except requests.RequestException:
+            tracker.reject()
+            return
+        if resp.status_code != 200:
+            tracker.reject()
+            return
+        body = resp.json()
+        tracker.add(body["job_id"], body["status"], started, time.monotonic())
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        next_at = time.monotonic()
+        while time.monotonic() < deadline:
+            pool.submit(submit, workload.next_item())
+            next_at += interval
+            delay = next_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+
+def poll_until_done(api, tracker, done_submitting, interval, drain_timeout):
+    """Poll /status/batch until every job has finished or the drain times out"""
+    session = requests.Session()
+    drain_deadline = None
+    while True:
+        pending = tracker.take_pending()
+        if done_submitting.is_set():
+            if not pending:
+                return
+            drain_deadline = drain_deadline or time.monotonic() + drain_timeout
+            if time.monotonic() > drain_deadline:
+                return
+
+        for start in range(0, len(pending), 500):
+            chunk = pending[start : start + 500]
+            try:
+                resp = session.post(
+                    f"{api}/status/batch", json={"job_ids": chunk}, timeout=30
+                )
+                resp.raise_for_status()
+            except requests.RequestException:
+                continue
+            now = time.monotonic()
+            for entry in resp.json()["jobs"]:
+                if entry.get("status") in TERMINAL:
+                    tracker.finish(entry["job_id"], entry["status"], now)
+        time.sleep(interval)
+
+
+def job_rows(job_ids, wait=10):
+    """cached, similarity and timings of finished jobs from Postgres.
+
+    Terminal states reach Postgres in batched flushes, so rows are polled
+    for up to wait seconds until every job shows as finished.
+    """
+    job_ids = list(set(job_ids))
+    if not job_ids:
+        return []
+    deadline = time.time() + wait
+    conn = psycopg2.connect(os.environ["DATABASE_URL"])
+    try:
+        with conn.cursor() as cur:
+            while True:
+                cur.execute(
+                    "SELECT cached, similarity, timings FROM jobs "
+                    "WHERE id = ANY(%s) AND status IN ('COMPLETED', 'FAILED')",
+                    (job_ids,),
+                )
+                rows = cur.fetchall()
+                conn.commit()
+                if len(rows) == len(job_ids) or time.time() > deadline:
+                    return rows
+                time.sleep(0.2)
+    finally:
+        conn.close()
+
+
+def stage_summary(rows):
+    stages = {}
+    for stage in STAGES:
+        values = [
+            timings[stage]
+            for _, _, timings in rows
+            if timings and timings.get(stage) is not None
+        ]
+        if values:
+            stages[stage] = {
+                "mean": round(sum(values) / len(values), 1),
+                "p95": round(percentile(values, 0.95), 1),
+            }
+    return stages
+
+
+def run_rate(args, api, origin, corpus, rate, llm_settings, origin_handler):
+    workload = Workload(args, origin, corpus)
+    tracker = Tracker()
+    done_submitting = threading.Event()
+    llm_before = llm_settings.snapshot()
+    origin_before = origin_handler.requests
+
+    poller = threading.Thread(
+        target=poll_until_done,
+        args=(api, tracker, done_submitting, args.poll_interval, args.drain_timeout),
+    )
+    poller.start()
+    started = time.monotonic()
+    submit_at_rate(api, workload, tracker, rate, args.seconds, args.workers)
+    done_submitting.set()
+    poller.join()
+
+    finished = tracker.finished
+    completed = [
+        job_id for job_id, (status, _) in finished.items() if status == "completed"
+    ]
+    latencies = [
+        (at - tracker.submitted[job_id]) * 1000 for job_id, (_, at) in finished.items()
+    ]
+    last = max((at for _, at in finished.values()), default=started)
+    rows = job_rows(completed)
+    llm_after = llm_settings.snapshot()
+
+    def ms(value):
+        return None if value is None else round(value, 1)
+
+    return {
+        "commit": current_commit(),
+        "engine": args.engine,
+        "target_rate": rate,
+        "seconds": args.seconds,
+        "duplicate_ratio": args.duplicate_ratio,
+        "url_ratio": args.url_ratio,
+        "submitted": len(tracker.submitted),
+        "rejected": tracker.rejected,
+        "completed": len(completed),
+        "failed": len(finished) - len(completed),
+        "unfinished": len(tracker.submitted) - len(finished),
+        "jobs_per_sec": round(len(completed) / max(last - started, 1e-9), 2),
+        "latency_ms": {
+            "p50": ms(percentile(latencies, 0.50)),
+            "p95": ms(percentile(latencies, 0.95)),
+            "p99": ms(percentile(latencies, 0.99)),
+            "max": ms(max(latencies, default=None)),
+        },
+        "submit_ms": {
+            "p50": ms(percentile(tracker.submit_ms, 0.50)),
+            "p99": ms(percentile(tracker.submit_ms, 0.99)),
+        },
+        "cache_hit_rate": round(
+            sum(1 for cached, _, _ in rows if cached) / max(len(rows), 1), 4
+        ),
+        "similar_hits": sum(1 for _, similarity, _ in rows if similarity is not None),
+        "stages_ms": stage_summary(rows),
+        "llm": {name: llm_after[name] - llm_before[name] for name in llm_after},
+        "origin_requests": origin_handler.requests - origin_before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--api", help="Use a running API instead of starting one")
+    parser.add_argument("--api-port", type=int, default=5050)
+    parser.add_argument("--engine", choices=["celery", "asyncio"], default="celery")
+    parser.add_argument("--celery-queues", default="celery,fetch,extract,summarize")
+    parser.add_argument("--celery-pool", default="threads")
+    parser.add_argument("--celery-concurrency", type=int, default=20)
+    parser.add_argument("--llm-port", type=int, default=0)
+    parser.add_argument("--origin-port", type=int, default=0)
+    parser.add_argument("--origin-latency-ms", type=float, default=50)
+    parser.add_argument("--paragraphs", type=int, default=8)
+    parser.add_argument("--rates", default="5,20")
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.3)
+    parser.add_argument("--url-ratio", type=float, default=0.5)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--poll-interval", type=float, default=0.2)
+    parser.add_argument("--drain-timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Also append the JSON lines to this file")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    llm_settings = settings_from_args(args)
+    llm = start_fake_llm(llm_settings, port=args.llm_port)
+    origin = start_fake_origin(
+        args.origin_latency_ms, args.paragraphs, port=args.origin_port
+    )
+    llm_url = f"http://127.0.0.1:{llm.server_port}/v1"
+    origin_url = f"http://127.0.0.1:{origin.server_port}"
+
+    stack = None
+    api = args.api
+    if api is None:
+        stack = Stack(args, llm_url)
+        stack.start()
+        api = f"http://127.0.0.1:{args.api_port}"
+    else:
+        print(f"Fake LLM at {llm_url}", file=sys.stderr)
+
+    run_id = uuid.uuid4().hex[:8]
+    try:
+        wait_for_api(api, stack)
+        for i, rate in enumerate(float(r) for r in args.rates.split(",")):
+            result = run_rate(
+                args,
+                api,
+                origin_url,
+                f"{run_id}-{i}",
+                rate,
+                llm_settings,
+                origin.RequestHandlerClass,
+            )
+            line = json.dumps(result)
+            print(line, flush=True)
+            if args.output:
+                with open(args.output, "a") as f:
+                    f.write(line + "\n")
+    finally:
+        if stack:
+            stack.stop()
+        llm.shutdown()
+        origin.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Load test for /status and /result polling.
+
+Submits a few jobs, then polls /status/<job_id> and /result/<job_id> at
+increasing request rates against a running API. For each rate it reports the
+achieved polling QPS next to the Postgres transaction rate, read from
+pg_stat_database. With the Redis status store the Postgres rate should stay
+flat as polling QPS rises.
+
+Usage:
+    python -m benchmarks.load_status_polling --api http://localhost:5000 \
+        --rates 10,50,100,200 --seconds 10
+
+DATABASE_URL must point at the same database the API uses.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import json
+import os
+import time
+
+import psycopg2
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def pg_transactions(conn):
+    """Committed plus rolled back transactions in the current database"""
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT xact_commit + xact_rollback FROM pg_stat_database "
+            "WHERE datname = current_database()"
+        )
+        return cur.fetchone()[0]
+
+
+def submit_jobs(api, count):
+    """Create jobs to poll"""
+    job_ids = []
+    for i in range(count):
+        resp = requests.post(
+            f"{api}/submit",
+            json={"text": f"Polling load test document {i} {time.time()}"},
+            timeout=10,
+        )
+        resp.raise_for_status()
+        job_ids.append(resp.json()["job_id"])
+    return job_ids
+
+
+def poll_at_rate(api, job_ids, rate, seconds, workers):
+    """Poll status and result endpoints at a fixed rate; return requests sent"""
+    session = requests.Session()
+    sent = 0
+    interval = 1.0 / rate
+    deadline = time.monotonic() + seconds
+
+    def poll(i):
+        job_id = job_ids[i % len(job_ids)]
+        endpoint = "status" if i % 2 == 0 else "result"
+        session.get(f"{api}/{endpoint}/{job_id}", timeout=10)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        next_at = time.monotonic()
+        while time.monotonic() < deadline:
+            pool.submit(poll, sent)
+            sent += 1
+            next_at += interval
+            delay = next_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+    return sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--api", default="http://localhost:5000")
+    parser.add_argument("--rates", default="10,50,100,200")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--jobs", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=32)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(os.environ["DATABASE_URL"])
+    conn.autocommit = True
+
+    job_ids = submit_jobs(args.api, args.jobs)
+
+    # Warm the status store so every job has been read once
+    for job_id in job_ids:
+        requests.get(f"{args.api}/status/{job_id}", timeout=10)
+
+    for rate in [float(r) for r in args.rates.split(",")]:
+        before = pg_transactions(conn)
+        start = time.monotonic()
+        sent = poll_at_rate(args.api, job_ids, rate, args.seconds, args.workers)
+        elapsed = time.monotonic() - start
+        after = pg_transactions(conn)
+
+        print(
+            json.dumps(
+                {
+                    "target_qps": rate,
+                    "polling_qps": round(sent / elapsed, 1),
+                    "pg_tps": round((after - before) / elapsed, 1),
+                }
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
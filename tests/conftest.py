@@ -0,0 +1,68 @@
+"""
+Fixtures for tests against an in-memory Redis and a SQLite database.
+
+Redis clients are created when app modules are imported, so the fake
+server is patched in before the app is imported here.
+"""
+
+import os
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+import fakeredis.aioredis  # noqa: E402
+import redis  # noqa: E402
+import redis.asyncio  # noqa: E402
+
+DB_PATH = "/tmp/summarizer-tests.db"
+
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{DB_PATH}",
+    REDIS_URL="redis://localhost:6379/0",
+    LLM_TOKEN="test",
+    LLM_ENDPOINT="http://127.0.0.1:9/v1",
+    LLM_MODEL="test",
+    CELERY_BROKER_URL="memory://",
+    CELERY_RESULT_BACKEND="cache+memory://",
+)
+
+server = fakeredis.FakeServer()
+redis.Redis.from_url = classmethod(
+    lambda cls, *args, **kwargs: fakeredis.FakeRedis(server=server)
+)
+redis.asyncio.Redis.from_url = classmethod(
+    lambda cls, *args, **kwargs: fakeredis.aioredis.FakeRedis(server=server)
+)
+
+if os.path.exists(DB_PATH):
+    os.remove(DB_PATH)
+
+from app import create_app  # noqa: E402
+from app.services.cache_service import redis_client  # noqa: E402
+
+flask_app = create_app()
+
+
+@pytest.fixture(autouse=True)
+def clean_redis():
+    redis_client.flushall()
+    yield
+
+
+@pytest.fixture
+def app():
+    with flask_app.app_context():
+        yield flask_app
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Test client whose submissions are recorded instead of queued"""
+    import app.routes as routes
+
+    queued = []
+    monkeypatch.setattr(routes, "enqueue_job", lambda job_id, *a: queued.append(job_id))
+    monkeypatch.setattr(routes, "enqueue_jobs", lambda ids, *a: queued.extend(ids))
+    test_client = flask_app.test_client()
+    test_client.queued = queued
+    return test_client
@@ -0,0 +1,34 @@
+from app.config import Config
+from app.models import JobPriority
+from app.services import admission
+
+
+def test_stage_queue_backlog_is_refused(client, monkeypatch):
+    """Jobs taken off the dispatch queue but still in the pipeline count"""
+    monkeypatch.setattr(Config, "ADMISSION_REFRESH_MS", 0)
+    monkeypatch.setattr(Config, "ADMISSION_INTERACTIVE_SLO_SECONDS", 30)
+
+    # Ten jobs finished recently; a hundred more were started by
+    # process_job and wait in the fetch, extract and summarize queues
+    for i in range(10):
+        admission.job_started(f"done-{i}", JobPriority.INTERACTIVE)
+        admission.job_finished(f"done-{i}", 2000)
+    for i in range(100):
+        admission.job_started(f"staged-{i}", JobPriority.INTERACTIVE)
+
+    response = client.post("/submit", json={"text": "fresh content " * 20})
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert response.get_json()["estimated_wait_seconds"] > 30
+    assert client.queued == []
+
+
+def test_idle_service_admits(client, monkeypatch):
+    monkeypatch.setattr(Config, "ADMISSION_REFRESH_MS", 0)
+
+    response = client.post("/submit", json={"text": "other content " * 20})
+
+    assert response.status_code == 200
+    assert "estimated_completion" in response.get_json()
+    assert len(client.queued) == 1
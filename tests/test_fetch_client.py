@@ -0,0 +1,30 @@
+import time
+
+import pytest
+
+from app.config import Config
+from app.services import fetch_client
+from app.services.fetch_client import HostBusyError, host_slot
+from app.services.worker import stage_retry_policy
+
+
+def test_sync_fetch_is_rescheduled_instead_of_waiting(monkeypatch):
+    """A Celery fetch does not sleep through a long rate-limit wait"""
+    monkeypatch.setattr(Config, "FETCH_HOST_RATE", 0.1)
+    monkeypatch.setattr(Config, "FETCH_HOST_BURST", 1)
+    monkeypatch.setattr(Config, "FETCH_SLOT_WAIT_SECONDS", 30)
+    sleeps = []
+    monkeypatch.setattr(fetch_client.time, "sleep", sleeps.append)
+
+    with host_slot("https://example.com/a"):
+        pass
+
+    start = time.monotonic()
+    with pytest.raises(HostBusyError) as raised:
+        with host_slot("https://example.com/b"):
+            pass
+
+    assert time.monotonic() - start < 1
+    assert sleeps == []
+    assert 5 < raised.value.retry_after <= 10
+    assert stage_retry_policy.delay(0, raised.value) == raised.value.retry_after
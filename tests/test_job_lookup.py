@@ -0,0 +1,47 @@
+import uuid
+
+from app.models import Job, JobStatus, find_job, job_created_at
+from app.services.job_writer import buffer_job_state, flush_all_job_writes
+
+
+def _submit(client, text):
+    return client.post("/submit", json={"text": text}).get_json()["job_id"]
+
+
+def test_job_id_carries_created_at(client, app):
+    """Lookups can filter on the partition key taken from the id"""
+    job_id = _submit(client, "dated content " * 20)
+
+    job = find_job(job_id)
+
+    assert job is not None
+    assert job_created_at(job_id) == job.created_at
+
+
+def test_flush_updates_row_found_by_dated_id(client, app):
+    job_id = _submit(client, "flushed content " * 20)
+
+    buffer_job_state(job_id, JobStatus.COMPLETED, "Done.")
+    flush_all_job_writes()
+
+    assert find_job(job_id).status == JobStatus.COMPLETED
+
+
+def test_ids_without_created_at_match_on_id(client, app):
+    """Jobs created before ids carried created_at are still found"""
+    job_id = _submit(client, "legacy content " * 20)
+    legacy_id = str(uuid.uuid4())
+    Job.query.filter_by(id=job_id).update({"id": legacy_id})
+
+    assert job_created_at(legacy_id) is None
+    assert find_job(legacy_id) is not None
+
+
+def test_batch_jobs_are_found_by_dated_id(client, app):
+    response = client.post(
+        "/submit/batch",
+        json={"items": [{"text": f"batch item {i} " * 20} for i in range(3)]},
+    )
+    job_ids = [item["job_id"] for item in response.get_json()["jobs"]]
+
+    assert all(find_job(job_id) is not None for job_id in job_ids)
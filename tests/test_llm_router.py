@@ -0,0 +1,110 @@
+from types import SimpleNamespace
+import time
+
+import pytest
+
+from app.config import Config
+from app.services.cache_service import redis_client
+from app.services.llm_router import LLMRouter
+
+
+class FakeStream:
+    """Streamed response yielding tokens after an initial delay"""
+
+    def __init__(self, tokens, delay):
+        self.tokens = tokens
+        self.delay = delay
+        self.closed = False
+
+    def __iter__(self):
+        time.sleep(self.delay)
+        for token in self.tokens:
+            if self.closed:
+                return
+            delta = SimpleNamespace(content=token)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+    def close(self):
+        self.closed = True
+
+
+class FakeEndpoint:
+    def __init__(self, name, stream):
+        self.name = name
+        self.model = "test"
+        self.calls = 0
+        self.stream = stream
+        self.client = SimpleNamespace(
+            chat=SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        )
+
+    def create(self, **kwargs):
+        self.calls += 1
+        return self.stream
+
+
+def test_stream_hedges_on_first_token(monkeypatch):
+    """A primary with no token by the hedge delay loses to a faster hedge"""
+    monkeypatch.setattr(Config, "LLM_HEDGE_ENABLED", True)
+    monkeypatch.setattr(Config, "LLM_HEDGE_DEFAULT_DELAY", 0.05)
+    monkeypatch.setattr(Config, "LLM_HEDGE_MIN_DELAY", 0.01)
+
+    slow = FakeEndpoint("slow", FakeStream(["slow ", "answer"], delay=0.5))
+    fast = FakeEndpoint("fast", FakeStream(["fast ", "answer"], delay=0))
+    router = LLMRouter([slow, fast])
+
+    text = "".join(router.stream([{"role": "user", "content": "hi"}]))
+
+    assert text == "fast answer"
+    assert slow.calls == fast.calls == 1
+
+    # The losing stream is closed once its first token arrives
+    deadline = time.monotonic() + 2
+    while not slow.stream.closed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert slow.stream.closed
+
+
+class FakeCall:
+    """Non-streamed endpoint answering, or raising, straight away"""
+
+    def __init__(self, name, error=None):
+        self.name = name
+        self.model = "test"
+        self.calls = 0
+        self.error = error
+        self.client = SimpleNamespace(
+            chat=SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        )
+
+    def create(self, **kwargs):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return SimpleNamespace(name=self.name)
+
+
+def test_probe_taken_only_for_called_endpoint(monkeypatch):
+    """A half-open hedge that is never called keeps its probe free"""
+    monkeypatch.setattr(Config, "LLM_HEDGE_ENABLED", True)
+    primary, tripped = FakeCall("primary"), FakeCall("tripped")
+    redis_client.set("llm:tripped:tripped", 1)
+
+    response = LLMRouter([primary, tripped]).create([])
+
+    assert response.name == "primary"
+    assert tripped.calls == 0
+    assert not redis_client.exists("llm:probe:tripped")
+
+
+def test_probe_released_after_unrecorded_failure(monkeypatch):
+    """A non-retryable error records nothing, so it must free the probe"""
+    monkeypatch.setattr(Config, "LLM_HEDGE_ENABLED", False)
+    tripped = FakeCall("tripped", error=ValueError("bad request"))
+    redis_client.set("llm:tripped:tripped", 1)
+
+    with pytest.raises(ValueError):
+        LLMRouter([tripped]).create([])
+
+    assert tripped.calls == 1
+    assert not redis_client.exists("llm:probe:tripped")
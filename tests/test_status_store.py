@@ -0,0 +1,70 @@
+from app.models import JobStatus
+from app.services.cache_service import redis_client
+from app.services.status_store import get_job_status, set_job_status
+
+
+def _submit(client, text):
+    return client.post("/submit", json={"text": text}).get_json()["job_id"]
+
+
+def test_backfill_keeps_state_written_after_miss(client, monkeypatch):
+    """A worker finishing between the miss and the backfill wins"""
+    import app.routes as routes
+
+    job_id = _submit(client, "racing content " * 20)
+    redis_client.delete(f"job:{job_id}")
+
+    query = routes.query_job_status
+
+    def query_then_finish(job_ids):
+        rows = query(job_ids)
+        # finish_job writes Redis now; Postgres gets it at the next flush
+        set_job_status(job_id, status=JobStatus.COMPLETED, summary="Done.")
+        return rows
+
+    monkeypatch.setattr(routes, "query_job_status", query_then_finish)
+    response = client.get(f"/status/{job_id}")
+
+    assert response.get_json()["status"] == "completed"
+    assert get_job_status(job_id)["status"] == "completed"
+
+
+def test_backfill_of_unfinished_row_is_short_lived(client):
+    job_id = _submit(client, "waiting content " * 20)
+    redis_client.delete(f"job:{job_id}")
+
+    response = client.get(f"/status/{job_id}")
+
+    assert response.get_json()["status"] == "queued"
+    assert 0 < redis_client.ttl(f"job:{job_id}") <= 60
+
+
+def test_batch_backfill_keeps_newer_state(client, monkeypatch):
+    import app.routes as routes
+
+    job_id = _submit(client, "batch racing content " * 20)
+    redis_client.delete(f"job:{job_id}")
+
+    query = routes.query_job_status
+
+    def query_then_fail(job_ids):
+        rows = query(job_ids)
+        set_job_status(job_id, status=JobStatus.FAILED)
+        return rows
+
+    monkeypatch.setattr(routes, "query_job_status", query_then_fail)
+    response = client.post("/status/batch", json={"job_ids": [job_id]})
+
+    assert response.get_json()["jobs"][0]["status"] == "failed"
+
+
+def test_finished_status_reads_store_before_flush(client):
+    """A redelivered job is not rerun while its terminal state is unflushed"""
+    from app.services.status_store import finished_status
+
+    job_id = _submit(client, "finished content " * 20)
+    assert finished_status(job_id, JobStatus.QUEUED) is None
+
+    set_job_status(job_id, status=JobStatus.COMPLETED)
+
+    assert finished_status(job_id, JobStatus.QUEUED) == JobStatus.COMPLETED